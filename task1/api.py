@@ -0,0 +1,256 @@
+"""Headless JSON API for the grade calculator.
+
+    POST /grades        {"name": "Asha", "marks": {"English": 90, ...}, "policy": "standard"}
+    POST /grades/batch  {"students": [{"name": ..., "marks": {...}}, ...], "policy": ...}
+    GET  /stats         running cohort statistics
+    GET  /metrics       request counts and p50/p99 latency per route
+
+Grades use the shared grading policy and are logged to grade_history through the
+write-behind GradeHistory, so a request never waits on a commit. Batches are
+graded column-wise with batch.grade_batch.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import queue
+import time
+from collections import deque
+from http import HTTPStatus
+
+import numpy as np
+
+from batch import grade_batch, history_rows
+from history import DB_NAME, GradeHistory, grade_row
+from logs import setup_logging
+from policy import get_policy
+
+MAX_BODY = 16 * 2 ** 20
+# Latencies kept per route for the percentiles
+LATENCY_WINDOW = 10000
+
+
+class BadRequest(Exception):
+    pass
+
+
+class LatencyStats:
+    """Request counts and a sliding window of latencies per route"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.counts = {}
+        self.latencies = {}
+
+    def record(self, route, seconds):
+        self.counts[route] = self.counts.get(route, 0) + 1
+        self.latencies.setdefault(route, deque(maxlen=self.window)).append(seconds)
+
+    def snapshot(self):
+        routes = {}
+        for route, latencies in self.latencies.items():
+            p50, p99 = np.percentile(np.fromiter(latencies, dtype=np.float64), [50, 99]) * 1000
+            routes[route] = {"requests": self.counts[route], "p50_ms": round(p50, 3), "p99_ms": round(p99, 3)}
+        return routes
+
+
+class GradeAPI:
+    def __init__(self, history):
+        self.history = history
+        self.metrics = LatencyStats()
+        self.routes = {
+            ("POST", "/grades"): self.grade_one,
+            ("POST", "/grades/batch"): self.grade_many,
+            ("GET", "/stats"): self.stats,
+            ("GET", "/metrics"): self.metrics_report,
+        }
+
+    @staticmethod
+    def _policy(body):
+        try:
+            return get_policy(body.get("policy"))
+        except ValueError as e:
+            raise BadRequest(str(e))
+
+    @staticmethod
+    def _student(student, policy):
+        """(name, marks dict) of a submitted student, validated against the policy"""
+        if not isinstance(student, dict):
+            raise BadRequest("Each student must be an object")
+        name = student.get("name")
+        marks = student.get("marks")
+        if not isinstance(name, str) or not name.strip():
+            raise BadRequest("Please enter student name!")
+        if not isinstance(marks, dict):
+            raise BadRequest(f"Marks for {name} must be an object of subject: mark")
+        marks_dict = {}
+        for subject in policy.subjects:
+            value = marks.get(subject)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise BadRequest(f"Please enter a valid number for {subject}")
+            try:
+                policy.validate(subject, value)
+            except ValueError as e:
+                raise BadRequest(str(e))
+            marks_dict[subject] = float(value)
+        return name.strip(), marks_dict
+
+    async def grade_one(self, body):
+        policy = self._policy(body)
+        name, marks_dict = self._student(body, policy)
+        total_marks = sum(marks_dict.values())
+        average_marks = total_marks / len(marks_dict)
+        final_grade = policy.grade(average_marks)
+        row = grade_row(name, marks_dict, total_marks, average_marks, final_grade)
+        try:
+            self.history.log(row, block=False)
+        except queue.Full:
+            # The writer is far behind; wait for room off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, self.history.log, row)
+        logging.info("Student: %s, Marks: %s, Total: %s, Average: %s, Grade: %s",
+                     name, marks_dict, total_marks, average_marks, final_grade,
+                     extra={"student": name, "marks": marks_dict, "total": total_marks, "average": average_marks,
+                            "grade": final_grade})
+        return {"name": name, "marks": marks_dict, "total": total_marks, "average": average_marks,
+                "grade": final_grade}
+
+    async def grade_many(self, body):
+        policy = self._policy(body)
+        students = body.get("students")
+        if not isinstance(students, list):
+            raise BadRequest('"students" must be a list')
+
+        names, marks, rejected = [], [], []
+        for student in students:
+            try:
+                name, marks_dict = self._student(student, policy)
+            except BadRequest as e:
+                rejected.append({"name": student.get("name") if isinstance(student, dict) else None,
+                                 "error": str(e)})
+                continue
+            names.append(name)
+            marks.append(list(marks_dict.values()))
+        results, _ = grade_batch(names, np.array(marks, dtype=np.float64).reshape(-1, len(policy.subjects)), policy)
+
+        # A large batch can fill the write-behind queue, so hand it over off the event loop
+        rows = history_rows(results, subjects=policy.subjects)
+        await asyncio.get_running_loop().run_in_executor(None, self.history.log_many, rows)
+        logging.info("Batch graded %d students, rejected %d", len(rows), len(rejected))
+        return {
+            "results": [{"name": name, "total": total, "average": average, "grade": grade}
+                        for name, total, average, grade in zip(results["names"].tolist(), results["totals"].tolist(),
+                                                               results["averages"].tolist(),
+                                                               results["grades"].tolist())],
+            "rejected": rejected,
+        }
+
+    async def stats(self, body):
+        # Waits for the history lock while a batch is being written, so keep it off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self.history.statistics)
+
+    async def metrics_report(self, body):
+        return self.metrics.snapshot()
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until the client closes it"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                try:
+                    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length"}, False)
+                    break
+                if length > MAX_BODY:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                path = target.split("?", 1)[0]
+                status, payload = await self._dispatch(method, path, body)
+                await self._respond(writer, status, payload, keep_alive)
+                self.metrics.record(f"{method} {path}" if (method, path) in self.routes else "other",
+                                    time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"{method} not allowed on {path}"}
+            return HTTPStatus.NOT_FOUND, {"error": f"No route for {path}"}
+        try:
+            request = json.loads(body) if body else {}
+            if not isinstance(request, dict):
+                raise BadRequest("Request body must be a JSON object")
+            return HTTPStatus.OK, await handler(request)
+        except json.JSONDecodeError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": f"Invalid JSON: {e}"}
+        except BadRequest as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except Exception as e:
+            logging.exception("Error handling %s %s", method, path)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"An error occurred: {e}"}
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host, port, db_name=DB_NAME, ready=None):
+    """Run the API until cancelled; ready(port) is called once it is listening"""
+    with GradeHistory(db_name) as history:
+        api = GradeAPI(history)
+        server = await asyncio.start_server(api.handle, host, port, backlog=1024)
+        bound = server.sockets[0].getsockname()[1]
+        logging.info("Grade API listening on %s:%d", host, bound)
+        if ready:
+            ready(bound)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade calculator JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--db", default=DB_NAME)
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        asyncio.run(serve(args.host, args.port, args.db, ready=lambda port: print(f"Listening on port {port}",
+                                                                                   flush=True)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
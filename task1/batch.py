@@ -0,0 +1,190 @@
+import argparse
+import csv
+import sys
+from itertools import islice
+
+import numpy as np
+
+from policy import get_policy
+
+CHUNK_SIZE = 100000
+
+
+def headers(policy=None):
+    """Header row of export.csv for a grading policy (the default policy if not given)"""
+    return ["Student Name"] + (policy or get_policy()).subjects + ["Total Marks", "Average Marks", "Final Grade"]
+
+
+def grade_array(marks, policy=None):
+    """Letter grades for an array of marks"""
+    return (policy or get_policy()).grade(np.asarray(marks, dtype=np.float64))
+
+
+def parse_marks(columns):
+    """Marks as a (students, subjects) float array; unreadable cells become NaN"""
+    try:
+        return np.array(columns, dtype=np.float64).T
+    except ValueError:
+        def to_float(value):
+            try:
+                return float(value)
+            except ValueError:
+                return np.nan
+        return np.array([[to_float(value) for value in column] for column in columns], dtype=np.float64).T
+
+
+def _split_rows(lines, width):
+    """Cells of plain CSV lines as columns, or None if any line needs the csv module"""
+    text = "".join(lines)
+    if '"' in text:
+        return None
+    cells = text.replace("\r\n", "\n").rstrip("\n").replace("\n", ",").split(",")
+    if len(cells) != len(lines) * width:
+        return None
+    return [cells[i::width] for i in range(width)]
+
+
+def read_students(source, chunk_size=CHUNK_SIZE, subjects=None):
+    """Yield (names, marks) chunks from a CSV with a "Student Name" column and one column per subject.
+
+    subjects defaults to those of the default grading policy. Chunks of plain lines are split directly; quoted or ragged ones go through csv.reader.
+    """
+    header = next(csv.reader([source.readline()]))
+    try:
+        name_index = header.index("Student Name")
+        subject_indexes = [header.index(subject) for subject in subjects or get_policy().subjects]
+    except ValueError as e:
+        raise ValueError(f"Missing column in input: {e}")
+
+    while True:
+        lines = list(islice(source, chunk_size))
+        if not lines:
+            return
+        columns = _split_rows(lines, len(header))
+        if columns is None:
+            width = max(subject_indexes + [name_index]) + 1
+            rows = [row + [""] * (width - len(row)) for row in csv.reader(lines) if row]
+            columns = list(zip(*rows))
+        yield np.array(columns[name_index], dtype=object), parse_marks([columns[i] for i in subject_indexes])
+
+
+def grade_batch(names, marks, policy=None):
+    """Validate and grade a chunk of students column-wise.
+
+    Returns (results, rejected). results holds the names, marks, totals, averages and
+    grades of the valid rows as arrays; rejected is a list of (name, reason).
+    """
+    policy = policy or get_policy()
+    names = np.asarray(names, dtype=object)
+    marks = np.asarray(marks, dtype=np.float64)
+    blank = np.array([not str(name).strip() for name in names], dtype=bool)
+    unreadable = np.isnan(marks).any(axis=1)
+    out_of_range = ((marks < 0) | (marks > policy.max_mark)).any(axis=1) & ~unreadable
+    valid = ~(blank | unreadable | out_of_range)
+
+    rejected = []
+    for reason, mask in (("missing student name", blank), ("marks must be numbers", unreadable & ~blank),
+                         (f"marks must be between 0 and {policy.max_mark:g}", out_of_range & ~blank)):
+        rejected.extend((name, reason) for name in names[mask])
+
+    marks = marks[valid]
+    totals = marks.sum(axis=1)
+    averages = totals / len(policy.subjects)
+    results = {"names": names[valid], "marks": marks, "totals": totals, "averages": averages,
+               "grades": policy.grade(averages)}
+    return results, rejected
+
+
+def _format(column):
+    """Column values as CSV text, formatting each distinct value once"""
+    if column.dtype == object:
+        return np.array([_quote(value) for value in column.tolist()], dtype=object)
+    values, positions = np.unique(column, return_inverse=True)
+    # A missing mark (NaN) is left empty
+    return np.array(["" if value != value else str(value) for value in values.tolist()],
+                    dtype=object)[positions.ravel()]
+
+
+def _quote(value):
+    value = str(value)
+    if any(c in value for c in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def write_results(destination, results):
+    """Write one graded chunk as export.csv rows"""
+    if not len(results["names"]):
+        return
+    columns = [results["names"]] + list(results["marks"].T) + [results["totals"], results["averages"],
+                                                               results["grades"]]
+    destination.write("\r\n".join(map(",".join, zip(*map(_format, columns)))) + "\r\n")
+
+
+def history_rows(results, timestamp=None, subjects=None):
+    """grade_history rows for a graded chunk; subjects defaults to those of the default policy"""
+    from history import grade_row
+
+    marks = results["marks"].tolist()
+    return [grade_row(name, dict(zip(subjects or get_policy().subjects, row)), total, average, grade, timestamp)
+            for name, row, total, average, grade in zip(results["names"].tolist(), marks, results["totals"].tolist(),
+                                                        results["averages"].tolist(), results["grades"].tolist())]
+
+
+def grade_file(source, destination, chunk_size=CHUNK_SIZE, header=True, history=None, policy=None):
+    """Grade every student in source into destination; returns (graded, rejected).
+
+    With a GradeHistory, every graded student is also logged to grade_history.
+    destination may be None when only the history is wanted.
+    """
+    policy = policy or get_policy()
+    if header and destination is not None:
+        csv.writer(destination).writerow(headers(policy))
+    graded, rejected = 0, []
+    for names, marks in read_students(source, chunk_size, policy.subjects):
+        results, chunk_rejected = grade_batch(names, marks, policy)
+        if destination is not None:
+            write_results(destination, results)
+        if history is not None:
+            history.log_many(history_rows(results, subjects=policy.subjects))
+        graded += len(results["names"])
+        rejected.extend(chunk_rejected)
+    return graded, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade a cohort of students from a CSV file")
+    parser.add_argument("input", help='CSV with "Student Name" and subject columns, or - for stdin')
+    parser.add_argument("-o", "--output", default="-", help="graded CSV (default: stdout)")
+    parser.add_argument("--append", action="store_true", help="append to the output without a header row")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--policy", help="grading policy from grading_policy.json (default: its default)")
+    parser.add_argument("--history", nargs="?", const="grade_calculator_history.db",
+                        help="also log every graded student to this history database")
+    args = parser.parse_args()
+
+    history = None
+    if args.history:
+        from history import GradeHistory
+        history = GradeHistory(args.history, batch_size=5000)
+
+    source = sys.stdin if args.input == "-" else open(args.input, newline="")
+    destination = sys.stdout if args.output == "-" else open(args.output, "a" if args.append else "w", newline="")
+    try:
+        graded, rejected = grade_file(source, destination, args.chunk_size, header=not args.append, history=history,
+                                      policy=get_policy(args.policy))
+    finally:
+        if history is not None:
+            history.close()
+        if source is not sys.stdin:
+            source.close()
+        if destination is not sys.stdout:
+            destination.close()
+
+    for name, reason in rejected:
+        print(f"Rejected {name or '(no name)'}: {reason}", file=sys.stderr)
+    print(f"Graded {graded} students, rejected {len(rejected)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
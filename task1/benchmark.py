@@ -0,0 +1,515 @@
+import argparse
+import asyncio
+import csv
+import os
+import tempfile
+import time
+
+import numpy as np
+
+
+def write_cohort(path, students, seed=1):
+    """A CSV of students with random marks, in the same layout as export.csv"""
+    from policy import get_policy
+
+    subjects = get_policy().subjects
+    rng = np.random.default_rng(seed)
+    marks = rng.integers(20, 101, size=(students, len(subjects)))
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Student Name"] + subjects)
+        writer.writerows([f"Student {i}"] + row for i, row in enumerate(marks.tolist()))
+
+
+def grade_one_by_one(source, destination):
+    """The per-student path: validate, total and grade each row on its own"""
+    from batch import headers
+    from policy import get_policy
+
+    policy = get_policy()
+    reader = csv.DictReader(source)
+    writer = csv.writer(destination)
+    writer.writerow(headers(policy))
+    graded = 0
+    for row in reader:
+        try:
+            marks_dict = {}
+            for subject in policy.subjects:
+                marks = float(row[subject])
+                policy.validate(subject, marks)
+                marks_dict[subject] = marks
+        except ValueError:
+            continue
+        total_marks = sum(marks_dict.values())
+        average_marks = total_marks / len(marks_dict)
+        final_grade = policy.grade(average_marks)
+        writer.writerow([row["Student Name"]] + list(marks_dict.values()) + [total_marks, average_marks, final_grade])
+        graded += 1
+    return graded
+
+
+def bench_batch(args):
+    """Grade a synthetic cohort column-wise vs one student at a time"""
+    from batch import grade_file
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cohort = os.path.join(tmp, "cohort.csv")
+        write_cohort(cohort, args.students)
+
+        with open(cohort, newline="") as source, open(os.path.join(tmp, "batch.csv"), "w", newline="") as out:
+            start = time.perf_counter()
+            graded, _ = grade_file(source, out, args.chunk_size)
+            batched = time.perf_counter() - start
+
+        with open(cohort, newline="") as source, open(os.path.join(tmp, "loop.csv"), "w", newline="") as out:
+            start = time.perf_counter()
+            looped_count = grade_one_by_one(source, out)
+            looped = time.perf_counter() - start
+
+        same = open(os.path.join(tmp, "batch.csv")).read() == open(os.path.join(tmp, "loop.csv")).read()
+
+    # The grading itself, without CSV parsing and formatting
+    from batch import grade_batch
+    from policy import get_policy
+
+    marks = np.random.default_rng(1).integers(20, 101, size=(args.students, 5)).astype(np.float64)
+    names = np.array([f"Student {i}" for i in range(args.students)], dtype=object)
+    start = time.perf_counter()
+    grade_batch(names, marks)
+    core_batched = time.perf_counter() - start
+    start = time.perf_counter()
+    policy = get_policy()
+    for row in marks.tolist():
+        total_marks = sum(row)
+        policy.grade(total_marks / len(row))
+    core_looped = time.perf_counter() - start
+
+    print(f"grade {args.students} students: batch {batched:.2f}s ({graded / batched:,.0f}/s), "
+          f"per-student loop {looped:.2f}s ({looped_count / looped:,.0f}/s), "
+          f"{looped / batched:.1f}x faster, identical output: {same}")
+    print(f"in memory: batch {core_batched:.3f}s, per-student loop {core_looped:.2f}s, "
+          f"{core_looped / core_batched:.0f}x faster")
+
+
+# The original grade_history insert, with marks as str(dict)
+LEGACY_INSERT = """
+    INSERT INTO grade_history (student_name, subject_marks, total_marks, average_marks, final_grade, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def legacy_row(row):
+    name, marks_dict, total, average, grade, timestamp = row
+    return name, str(marks_dict), total, average, grade, timestamp
+
+
+def synthetic_grades(count, students=1000, seed=1):
+    """grade_row()s spread over a year, for a cohort of `students` names"""
+    from history import grade_row
+    from policy import get_policy
+
+    policy = get_policy()
+    subjects = policy.subjects
+    rng = np.random.default_rng(seed)
+    marks = rng.integers(20, 101, size=(count, len(subjects))).astype(np.float64)
+    totals = marks.sum(axis=1)
+    grades = policy.grade(totals / len(subjects)).tolist()
+    days = np.sort(rng.integers(0, 365, size=count))
+    return [grade_row(f"Student {rng_student}", dict(zip(subjects, row)), total, total / len(subjects), grade,
+                      f"2024-{1 + day // 31:02d}-{1 + day % 28:02d} 10:00:00")
+            for rng_student, row, total, grade, day in zip(rng.integers(0, students, size=count).tolist(),
+                                                           marks.tolist(), totals.tolist(), grades, days.tolist())]
+
+
+def bench_insert(args):
+    """grade_history insert rate: write-behind batches vs a connection and commit per grade"""
+    import sqlite3
+    from history import GradeHistory, create_schema, grade_row
+
+    rows = [grade_row(f"Student {i}", {"English": 80.0, "Mathematics": 75.0, "Science": 90.0, "Hindi": 65.0,
+                                       "SST": 70.0}, 380.0, 76.0, "B") for i in range(args.grades)]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "history.db")
+        start = time.perf_counter()
+        history = GradeHistory(db_name, batch_size=args.batch_size)
+        for row in rows:
+            history.log(row)
+        queued = time.perf_counter() - start
+        history.close()
+        elapsed = time.perf_counter() - start
+        print(f"write-behind: {args.grades} grades in {elapsed:.2f}s ({args.grades / elapsed:,.0f}/s, "
+              f"batch_size={args.batch_size}), {queued / args.grades * 1e6:.1f} us per log() call")
+
+        db_name = os.path.join(tmp, "baseline.db")
+        conn = sqlite3.connect(db_name)
+        create_schema(conn)
+        conn.close()
+        start = time.perf_counter()
+        for row in rows[:args.baseline]:
+            # The original log_grade_to_db: connect, insert, commit and close for every grade
+            conn = sqlite3.connect(db_name)
+            conn.execute(LEGACY_INSERT, legacy_row(row))
+            conn.commit()
+            conn.close()
+        elapsed = time.perf_counter() - start
+        print(f"connection per grade: {args.baseline} grades in {elapsed:.2f}s ({args.baseline / elapsed:,.0f}/s), "
+              f"{elapsed / args.baseline * 1e6:.0f} us per call")
+
+
+def bench_query(args):
+    """Per-subject and per-student queries: indexed subject_marks vs parsing str(dict) rows"""
+    import ast
+    import sqlite3
+    from history import GradeHistory
+
+    rows = synthetic_grades(args.grades)
+    term = ("2024-09-01", "2025-01-01")
+    with tempfile.TemporaryDirectory() as tmp:
+        history = GradeHistory(os.path.join(tmp, "history.db"), batch_size=5000)
+        history.log_many(rows)
+        history.flush()
+
+        legacy = sqlite3.connect(os.path.join(tmp, "legacy.db"))
+        legacy.execute("CREATE TABLE grade_history (id INTEGER PRIMARY KEY AUTOINCREMENT, student_name TEXT, "
+                       "subject_marks TEXT, total_marks REAL, average_marks REAL, final_grade TEXT, timestamp TEXT)")
+        legacy.executemany(LEGACY_INSERT, map(legacy_row, rows))
+        legacy.commit()
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            indexed_average = history.subject_average("Mathematics", *term)
+            history.student_grades("Student 42")
+        indexed = (time.perf_counter() - start) / args.repeat
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            marks = [ast.literal_eval(text)["Mathematics"] for text, timestamp in
+                     legacy.execute("SELECT subject_marks, timestamp FROM grade_history")
+                     if term[0] <= timestamp < term[1]]
+            scanned_average = sum(marks) / len(marks)
+            [(timestamp, ast.literal_eval(text)) for name, text, timestamp in
+             legacy.execute("SELECT student_name, subject_marks, timestamp FROM grade_history")
+             if name == "Student 42"]
+        scanned = (time.perf_counter() - start) / args.repeat
+        history.close()
+        legacy.close()
+
+    print(f"term Mathematics average + one student's grades over {args.grades} grades: "
+          f"indexed {indexed * 1000:.1f} ms, str(dict) scan {scanned * 1000:.0f} ms "
+          f"(averages {indexed_average:.3f} / {scanned_average:.3f})")
+
+
+def bench_stats(args):
+    """Cohort statistics: the persisted running aggregates vs recomputing them from the history"""
+    from history import GradeHistory
+    from stats import PERCENTILES
+
+    rows = synthetic_grades(args.grades)
+    with tempfile.TemporaryDirectory() as tmp:
+        history = GradeHistory(os.path.join(tmp, "history.db"), batch_size=5000)
+        start = time.perf_counter()
+        history.log_many(rows)
+        history.flush()
+        logged = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            running = history.statistics()
+        incremental = (time.perf_counter() - start) / args.repeat
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for subject in ("English", "Mathematics", "Science", "Hindi", "SST"):
+                marks = np.array(history.query("SELECT marks FROM subject_marks WHERE subject = ?", (subject,)))
+                exact = (marks.mean(), marks.std(), np.percentile(marks, PERCENTILES))
+        recomputed = (time.perf_counter() - start) / args.repeat
+        history.close()
+
+    print(f"statistics over {args.grades} grades (logged in {logged:.2f}s with stats kept up to date): "
+          f"running aggregates {incremental * 1000:.2f} ms, recomputed from history {recomputed * 1000:.0f} ms; "
+          f"SST mean/std/p50 {running['SST']['mean']:.3f}/{running['SST']['stddev']:.3f}/{running['SST']['p50']} "
+          f"vs exact {exact[0]:.3f}/{exact[1]:.3f}/{exact[2][1]}")
+
+
+def traced(func):
+    """(seconds, peak traced MiB, result) of func(); timed and traced in separate runs"""
+    import tracemalloc
+
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def bench_export(args):
+    """Regenerating an export from grade_history: streamed chunks vs loading everything and writing row by row"""
+    import ast
+    import sqlite3
+    from export import export_history
+    from history import GradeHistory
+
+    rows = synthetic_grades(args.grades)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "history.db")
+        with GradeHistory(db_name, batch_size=5000) as history:
+            history.log_many(rows)
+        conn = sqlite3.connect(db_name)
+
+        for extension in (".csv", ".parquet", ".arrow"):
+            path = os.path.join(tmp, "export" + extension)
+            try:
+                elapsed, peak, written = traced(lambda: export_history(conn, path, chunk_size=args.chunk_size))
+            except ImportError as e:
+                print(f"export{extension}: skipped ({e})")
+                continue
+            print(f"streamed export{extension}: {written} rows in {elapsed:.2f}s ({written / elapsed:,.0f}/s), "
+                  f"peak {peak:.0f} MiB, {os.path.getsize(path) / 2 ** 20:.1f} MiB on disk")
+
+        # The old way of reading the history back: every row at once, marks parsed from str(dict)
+        conn.execute("CREATE TABLE legacy (student_name TEXT, subject_marks TEXT, total_marks REAL, "
+                     "average_marks REAL, final_grade TEXT, timestamp TEXT)")
+        conn.executemany("INSERT INTO legacy VALUES (?, ?, ?, ?, ?, ?)", map(legacy_row, rows))
+        conn.commit()
+        del rows
+
+        def legacy_export():
+            with open(os.path.join(tmp, "legacy.csv"), "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["Student Name", "English", "Mathematics", "Science", "Hindi", "SST",
+                                 "Total Marks", "Average Marks", "Final Grade"])
+                for name, text, total, average, grade, _ in conn.execute("SELECT * FROM legacy").fetchall():
+                    writer.writerow([name] + list(ast.literal_eval(text).values()) + [total, average, grade])
+
+        elapsed, peak, _ = traced(legacy_export)
+        conn.close()
+        print(f"fetchall + str(dict) row by row: {args.grades} rows in {elapsed:.2f}s "
+              f"({args.grades / elapsed:,.0f}/s), peak {peak:.0f} MiB")
+
+
+def if_elif_grade(marks):
+    """calculate_grade as it was hard-coded in the GUI and console"""
+    if marks >= 90:
+        return 'A+'
+    elif marks >= 80:
+        return 'A'
+    elif marks >= 70:
+        return 'B'
+    elif marks >= 60:
+        return 'C'
+    elif marks >= 50:
+        return 'D'
+    else:
+        return 'F'
+
+
+def bench_grade(args):
+    """Grade lookups: the old if/elif chain vs the compiled policy, per mark and per array"""
+    from policy import get_policy
+
+    policy = get_policy()
+    marks = np.random.default_rng(1).uniform(0, 100, args.marks)
+    values = marks.tolist()
+
+    start = time.perf_counter()
+    chained = [if_elif_grade(value) for value in values]
+    chain = time.perf_counter() - start
+    start = time.perf_counter()
+    bisected = [policy.grade(value) for value in values]
+    scalar = time.perf_counter() - start
+    start = time.perf_counter()
+    vectorized = policy.grade(marks)
+    array = time.perf_counter() - start
+
+    same = chained == bisected == vectorized.tolist()
+    print(f"grade {args.marks} marks: if/elif {chain / args.marks * 1e9:.0f} ns, policy scalar "
+          f"{scalar / args.marks * 1e9:.0f} ns, policy array {array / args.marks * 1e9:.1f} ns per mark; "
+          f"same grades: {same}")
+
+
+async def http_request(reader, writer, method, path, payload=None):
+    """One keep-alive request; returns (status, decoded JSON body)"""
+    import json
+
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def load_test(host, port, clients, requests, batch_size):
+    from policy import get_policy
+
+    subjects = get_policy().subjects
+    rng = np.random.default_rng(1)
+    latencies, errors = [], 0
+
+    async def client(number):
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        for i in range(requests):
+            marks = dict(zip(subjects, rng.integers(0, 101, len(subjects)).tolist()))
+            start = time.perf_counter()
+            status, _ = await http_request(reader, writer, "POST", "/grades",
+                                           {"name": f"Client {number} student {i}", "marks": marks})
+            latencies.append(time.perf_counter() - start)
+            errors += status != 200
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(clients)))
+    elapsed = time.perf_counter() - start
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(f"single grades: {len(latencies)} requests from {clients} concurrent clients in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:,.0f} req/s), client p50 {p50:.2f} ms, p99 {p99:.2f} ms, errors {errors}")
+
+    reader, writer = await asyncio.open_connection(host, port)
+    students = [{"name": f"Batch student {i}", "marks": dict(zip(subjects, row))}
+                for i, row in enumerate(rng.integers(0, 101, (batch_size, len(subjects))).tolist())]
+    start = time.perf_counter()
+    status, response = await http_request(reader, writer, "POST", "/grades/batch", {"students": students})
+    elapsed = time.perf_counter() - start
+    print(f"batch: {len(response.get('results', []))} students in one request in {elapsed * 1000:.0f} ms "
+          f"(status {status})")
+    _, metrics = await http_request(reader, writer, "GET", "/metrics")
+    writer.close()
+    for route, numbers in metrics.items():
+        print(f"server {route}: {numbers['requests']} requests, p50 {numbers['p50_ms']} ms, p99 {numbers['p99_ms']} ms")
+
+
+def bench_api(args):
+    """Load-test the JSON API: a local server in a subprocess unless --port is given"""
+    import subprocess
+    import sys
+
+    if args.port:
+        asyncio.run(load_test(args.host, args.port, args.clients, args.requests, args.batch))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api.py"),
+                                   "--port", "0", "--db", os.path.join(tmp, "history.db")],
+                                  stdout=subprocess.PIPE, text=True, cwd=tmp)
+        try:
+            port = int(server.stdout.readline().split()[-1])
+            asyncio.run(load_test("127.0.0.1", port, args.clients, args.requests, args.batch))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def _log_latencies(log, records):
+    """Caller-side time of each of records log calls, in microseconds"""
+    latencies = np.empty(records)
+    for i in range(records):
+        start = time.perf_counter()
+        log(i)
+        latencies[i] = time.perf_counter() - start
+    return latencies * 1e6
+
+
+def bench_log(args):
+    """Caller-side cost of logging a calculation: the old basicConfig text log, the JSON
+    rotating/gzipped handler called synchronously, and the same handler behind the queue"""
+    import logging
+    from logs import file_handler, setup_logging, stop_logging
+    from task1 import log_calculation
+
+    marks_dict = {"English": 80.0, "Mathematics": 75.0, "Science": 90.0, "Hindi": 65.0, "SST": 70.0}
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+
+    def report(label, latencies, elapsed=None):
+        p50, p99, p999 = np.percentile(latencies, [50, 99, 99.9])
+        line = (f"{label:<22} p50 {p50:6.1f} us  p99 {p99:7.1f} us  p99.9 {p999:8.1f} us  "
+                f"max {latencies.max() / 1000:7.2f} ms")
+        print(line + (f"  (written out after {elapsed:.2f}s)" if elapsed else ""))
+
+    print(f"log {args.records} calculations, rotating every {args.max_bytes} bytes")
+    with tempfile.TemporaryDirectory() as tmp:
+        # The original setup: basicConfig text file, message built with an f-string in the caller
+        handler = logging.FileHandler(os.path.join(tmp, "legacy.log"))
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+        root.handlers[:] = [handler]
+        report("legacy text", _log_latencies(
+            lambda i: logging.info(f"Student: Student {i}, Marks: {marks_dict}, Total: 380.0, Average: 76.0, "
+                                   f"Grade: B"), args.records))
+        handler.close()
+
+        handler = file_handler(os.path.join(tmp, "sync.jsonl"), args.max_bytes)
+        root.handlers[:] = [handler]
+        report("JSON + gzip, sync", _log_latencies(
+            lambda i: log_calculation(f"Student {i}", marks_dict, 380.0, 76.0, "B"), args.records))
+        handler.close()
+
+        setup_logging(os.path.join(tmp, "queued.jsonl"), max_bytes=args.max_bytes)
+        start = time.perf_counter()
+        latencies = _log_latencies(lambda i: log_calculation(f"Student {i}", marks_dict, 380.0, 76.0, "B"),
+                                   args.records)
+        stop_logging()
+        report("JSON + gzip, queued", latencies, time.perf_counter() - start)
+        root.handlers[:] = []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade calculator benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    batch = subparsers.add_parser("batch", help="students graded per second, batch vs per-student loop")
+    batch.add_argument("--students", type=int, default=1000000)
+    batch.add_argument("--chunk-size", type=int, default=100000)
+    batch.set_defaults(func=bench_batch)
+
+    insert = subparsers.add_parser("insert", help="grade_history inserts per second")
+    insert.add_argument("--grades", type=int, default=200000)
+    insert.add_argument("--batch-size", type=int, default=500)
+    insert.add_argument("--baseline", type=int, default=2000, help="grades for the connection-per-grade run")
+    insert.set_defaults(func=bench_insert)
+
+    query = subparsers.add_parser("query", help="per-subject and per-student query latency")
+    query.add_argument("--grades", type=int, default=200000)
+    query.add_argument("--repeat", type=int, default=5)
+    query.set_defaults(func=bench_query)
+
+    stats = subparsers.add_parser("stats", help="cohort statistics from running aggregates vs a full recompute")
+    stats.add_argument("--grades", type=int, default=200000)
+    stats.add_argument("--repeat", type=int, default=5)
+    stats.set_defaults(func=bench_stats)
+
+    export = subparsers.add_parser("export", help="export regeneration rate and memory")
+    export.add_argument("--grades", type=int, default=200000)
+    export.add_argument("--chunk-size", type=int, default=10000)
+    export.set_defaults(func=bench_export)
+
+    grade = subparsers.add_parser("grade", help="grade lookup cost per mark")
+    grade.add_argument("--marks", type=int, default=1000000)
+    grade.set_defaults(func=bench_grade)
+
+    api = subparsers.add_parser("api", help="load test of the JSON API on localhost")
+    api.add_argument("--host", default="127.0.0.1")
+    api.add_argument("--port", type=int, help="test a running server instead of starting one")
+    api.add_argument("--clients", type=int, default=100, help="concurrent keep-alive connections")
+    api.add_argument("--requests", type=int, default=200, help="single-grade requests per client")
+    api.add_argument("--batch", type=int, default=10000, help="students in the batch request")
+    api.set_defaults(func=bench_api)
+
+    log = subparsers.add_parser("log", help="per-call cost of logging a calculation")
+    log.add_argument("--records", type=int, default=100000)
+    log.add_argument("--max-bytes", type=int, default=10 * 2 ** 20, help="rotate the pipeline log at this size")
+    log.set_defaults(func=bench_log)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import csv
+import os
+import sqlite3
+
+import numpy as np
+
+from batch import headers, write_results
+from policy import get_policy
+
+CHUNK_SIZE = 10000
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+
+
+def _pyarrow():
+    """pyarrow is only needed for columnar exports"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet and Arrow exports need pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+class ExportWriter:
+    """Buffered writer for exports in the export.csv layout, as CSV, Parquet or Arrow IPC.
+
+    CSV rows go straight to the (buffered) file. For Parquet and Arrow, rows are
+    collected until chunk_size are waiting and then written as one row group /
+    record batch, so only a chunk is ever held in memory. The format follows the file extension unless
+    given, and the subject columns follow the grading policy (the default one
+    unless given). close() (or leaving the with block) writes what is left.
+    """
+
+    def __init__(self, path, format=None, chunk_size=CHUNK_SIZE, policy=None):
+        self.path = path
+        self.format = format or FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+        if self.format not in FORMATS.values():
+            raise ValueError(f"Unknown export format: {self.format}")
+        self.chunk_size = chunk_size
+        self.policy = policy or get_policy()
+        self.written = 0
+        self._rows = []
+        self._writer = None
+
+        if self.format == "csv":
+            self._file = open(path, "w", newline="")
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(headers(self.policy))
+        else:
+            pa = _pyarrow()
+            self._schema = pa.schema([("Student Name", pa.string())]
+                                     + [(subject, pa.float64()) for subject in self.policy.subjects]
+                                     + [("Total Marks", pa.float64()), ("Average Marks", pa.float64()),
+                                        ("Final Grade", pa.string())])
+            if self.format == "parquet":
+                self._writer = pa.parquet.ParquetWriter(path, self._schema, compression="zstd")
+            else:
+                self._writer = pa.ipc.new_file(path, self._schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, row):
+        """Write one row: name, a mark per subject (None if missing), total, average and grade"""
+        if self.format == "csv":
+            self._csv.writerow(row)
+            self.written += 1
+            return
+        self._rows.append(row)
+        if len(self._rows) >= self.chunk_size:
+            self.flush()
+
+    def write_rows(self, rows):
+        """Write rows from any iterable, e.g. a cursor, without holding them"""
+        for row in rows:
+            self.write(row)
+
+    def write_results(self, results):
+        """Write a graded chunk (see batch.grade_batch) directly"""
+        self.flush()
+        self._write_chunk(results)
+
+    def flush(self):
+        if not self._rows:
+            return
+        columns = list(zip(*self._rows))
+        self._rows = []
+        self._write_chunk({
+            "names": np.array(columns[0], dtype=object),
+            # None becomes NaN, a missing mark
+            "marks": np.array(columns[1:1 + len(self.policy.subjects)], dtype=np.float64).T,
+            "totals": np.array(columns[-3], dtype=np.float64),
+            "averages": np.array(columns[-2], dtype=np.float64),
+            "grades": np.array(columns[-1], dtype=object),
+        })
+
+    def _write_chunk(self, results):
+        if not len(results["names"]):
+            return
+        if self.format == "csv":
+            write_results(self._file, results)
+        else:
+            pa = _pyarrow()
+            arrays = ([pa.array(results["names"].tolist(), pa.string())]
+                      + [pa.array(column, pa.float64()) for column in results["marks"].T]
+                      + [pa.array(results["totals"], pa.float64()), pa.array(results["averages"], pa.float64()),
+                         pa.array(results["grades"].tolist(), pa.string())])
+            self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+        self.written += len(results["names"])
+
+    def close(self):
+        self.flush()
+        if self.format == "csv":
+            self._file.close()
+        else:
+            self._writer.close()
+
+
+def history_chunks(conn, chunk_size=CHUNK_SIZE, subjects=None):
+    """Stream grade_history as graded chunks (like batch.grade_batch results), oldest first.
+
+    Each chunk is one keyset-paged read of grade_history plus the subject_marks of
+    the same id range, with a column per subject (those of the default policy
+    unless given); a subject with no stored mark comes out as NaN.
+    """
+    columns = {subject: i for i, subject in enumerate(subjects or get_policy().subjects)}
+    last_id = 0
+    while True:
+        rows = conn.execute("SELECT id, student_name, total_marks, average_marks, final_grade FROM grade_history "
+                            "WHERE id > ? ORDER BY id LIMIT ?", (last_id, chunk_size)).fetchall()
+        if not rows:
+            return
+        ids, names, totals, averages, grades = zip(*rows)
+        ids = np.array(ids, dtype=np.int64)
+        marks = np.full((len(ids), len(columns)), np.nan)
+        subject_marks = conn.execute("SELECT history_id, subject, marks FROM subject_marks "
+                                     "WHERE history_id > ? AND history_id <= ?", (last_id, int(ids[-1]))).fetchall()
+        if subject_marks:
+            history_ids, subjects, values = zip(*subject_marks)
+            column = np.array([columns.get(subject, -1) for subject in subjects])
+            known = column >= 0
+            marks[np.searchsorted(ids, np.array(history_ids)[known]), column[known]] = np.array(values)[known]
+        last_id = int(ids[-1])
+        yield {
+            "names": np.array(names, dtype=object),
+            "marks": marks,
+            "totals": np.array(totals, dtype=np.float64),
+            "averages": np.array(averages, dtype=np.float64),
+            "grades": np.array(grades, dtype=object),
+        }
+
+
+def export_rows(conn, subjects=None):
+    """Cursor over grade_history as export rows, oldest first, with a mark column per subject.
+
+    The marks are pivoted by primary-key lookups into subject_marks, so rows come
+    straight off the cursor without being collected; a subject with no stored
+    mark is None.
+    """
+    subjects = subjects or get_policy().subjects
+    marks = ", ".join("(SELECT marks FROM subject_marks WHERE history_id = id AND subject = ?)" for _ in subjects)
+    return conn.execute(f"SELECT student_name, {marks}, total_marks, average_marks, final_grade "
+                        f"FROM grade_history ORDER BY id", subjects)
+
+
+def export_history(conn, path, format=None, chunk_size=CHUNK_SIZE, policy=None):
+    """Regenerate an export from grade_history; returns the number of rows.
+
+    CSV is written row by row from the cursor; Parquet and Arrow a chunk at a time.
+    """
+    with ExportWriter(path, format, chunk_size, policy) as writer:
+        if writer.format == "csv":
+            writer.write_rows(export_rows(conn, writer.policy.subjects))
+        else:
+            for chunk in history_chunks(conn, chunk_size, writer.policy.subjects):
+                writer.write_results(chunk)
+    return writer.written
+
+
+def main():
+    from history import DB_NAME, create_schema
+
+    parser = argparse.ArgumentParser(description="Export the grade history")
+    parser.add_argument("path", nargs="?", default="export.csv", help=".csv, .parquet or .arrow file")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())), help="override the extension")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--policy", help="grading policy whose subjects are exported (default: its default)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    create_schema(conn)
+    written = export_history(conn, args.path, args.format, args.chunk_size, get_policy(args.policy))
+    conn.close()
+    print(f"Exported {written} grades to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
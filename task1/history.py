@@ -0,0 +1,277 @@
+import ast
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from stats import CohortStats
+
+DB_NAME = "grade_calculator_history.db"
+
+# WAL lets readers run while the writer commits, and synchronous=NORMAL only
+# fsyncs at checkpoints instead of on every commit
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Marks live one row per student and subject in subject_marks; the old
+# str(dict) column is left NULL for everything stored that way
+INSERT_GRADE = """
+    INSERT INTO grade_history (id, student_name, total_marks, average_marks, final_grade, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+INSERT_MARKS = "INSERT INTO subject_marks (history_id, subject, marks) VALUES (?, ?, ?)"
+MIGRATE_BATCH = 1000
+
+
+def create_schema(conn):
+    """Creates the grade_history and subject_marks tables if they don't exist."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS grade_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_name TEXT,
+            subject_marks TEXT,
+            total_marks REAL,
+            average_marks REAL,
+            final_grade TEXT,
+            timestamp TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS subject_marks (
+            history_id INTEGER,
+            subject TEXT,
+            marks REAL,
+            PRIMARY KEY (history_id, subject)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_grade_history_student ON grade_history(student_name)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_grade_history_timestamp ON grade_history(timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_subject_marks_subject ON subject_marks(subject, marks)")
+    conn.commit()
+    migrate_subject_marks(conn)
+
+
+def migrate_subject_marks(conn):
+    """Move marks stored as str(dict) in grade_history.subject_marks into subject_marks."""
+    last_id = 0
+    while True:
+        rows = conn.execute("SELECT id, subject_marks FROM grade_history WHERE subject_marks IS NOT NULL AND id > ? "
+                            "ORDER BY id LIMIT ?", (last_id, MIGRATE_BATCH)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        marks, migrated = [], []
+        for history_id, text in rows:
+            try:
+                marks_dict = ast.literal_eval(text)
+                marks.extend((history_id, subject, float(value)) for subject, value in marks_dict.items())
+            except (ValueError, SyntaxError, TypeError, AttributeError):
+                logging.warning("Could not migrate subject marks of grade_history row %d: %r", history_id, text)
+                continue
+            migrated.append((history_id,))
+        conn.executemany("INSERT OR REPLACE INTO subject_marks (history_id, subject, marks) VALUES (?, ?, ?)", marks)
+        conn.executemany("UPDATE grade_history SET subject_marks = NULL WHERE id = ?", migrated)
+        conn.commit()
+
+
+def connect(db_name=DB_NAME):
+    """Open a connection that can be shared between threads, with the pragmas above applied."""
+    conn = sqlite3.connect(db_name, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def grade_row(student_name, marks_dict, total_marks, average_marks, final_grade, timestamp=None):
+    """A row for GradeHistory.log(): the INSERT_GRADE columns after id, with the marks dict second."""
+    if timestamp is None:
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return (student_name, marks_dict, total_marks, average_marks, final_grade, timestamp)
+
+
+class GradeHistory:
+    """Long-lived access to the grade history database.
+
+    One connection is opened per database and kept for the life of the process.
+    Writes are write-behind: log() only queues the row, and a writer thread
+    inserts queued rows with executemany in a single transaction (group commit)
+    once batch_size rows are waiting or max_delay seconds have passed since the
+    first of them. flush() waits for everything queued so far to be committed,
+    and close() flushes and stops the writer. If a batch can't be written, it is
+    dropped and the next log(), flush() or close() raises that error once.
+
+    Cohort statistics (see stats.py) are updated and saved in the same
+    transaction as each batch, so statistics() is always current as of the last
+    commit without reading the history.
+    """
+
+    def __init__(self, db_name=DB_NAME, batch_size=500, max_delay=0.2, max_pending=100000):
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.written = 0
+        self.conn = connect(db_name)
+        self.lock = threading.Lock()
+        create_schema(self.conn)
+        self.stats = CohortStats.load(self.conn)
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def log(self, row, block=True):
+        """Queue a grade_history row.
+
+        Blocks only when the writer falls far behind; with block=False that
+        raises queue.Full instead.
+        """
+        self._raise_error()
+        if not self._thread.is_alive():
+            raise RuntimeError("The grade history writer has stopped")
+        self._queue.put(row, block)
+
+    def log_many(self, rows):
+        for row in rows:
+            self.log(row)
+
+    def flush(self):
+        """Wait until every row queued so far is committed."""
+        if self._thread.is_alive():
+            done = threading.Event()
+            self._queue.put(done)
+            # The writer can stop before it reaches the event (close() from another thread)
+            while not done.wait(0.1) and self._thread.is_alive():
+                pass
+        self._raise_error()
+
+    def query(self, sql, params=()):
+        """Run a read on the shared connection and return all rows."""
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        """Flush queued rows, stop the writer thread and close the connection."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+            self.conn.close()
+        self._raise_error()
+
+    def _raise_error(self):
+        """Raise the error of a batch that failed since the last call, once."""
+        error, self._error = self._error, None
+        if error:
+            raise error
+
+    def _run(self):
+        batch = []
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+            stopping = item is None
+            flushing = isinstance(item, threading.Event)
+
+            if isinstance(item, tuple):
+                if not batch:
+                    deadline = time.monotonic() + self.max_delay
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    # The batch is lost, but the writer carries on; the next log(), flush() or close() raises e
+                    logging.exception("Could not write %d grade history row(s)", len(batch))
+                    self._error = e
+                batch = []
+                deadline = None
+            if flushing:
+                item.set()
+
+    def _write(self, batch):
+        with self.lock:
+            # Take the write lock first so the ids handed out below can't be taken by another writer
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                sequence = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'grade_history'").fetchone()
+                first_id = (sequence[0] if sequence else 0) + 1
+                self.conn.executemany(INSERT_GRADE, [(first_id + i, name, total, average, grade, timestamp)
+                                                     for i, (name, _, total, average, grade, timestamp)
+                                                     in enumerate(batch)])
+                self.conn.executemany(INSERT_MARKS, [(first_id + i, subject, marks)
+                                                     for i, row in enumerate(batch)
+                                                     for subject, marks in row[1].items()])
+                self.stats.add_rows(batch)
+                self.stats.save(self.conn)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                self.stats = CohortStats.load(self.conn)
+                raise
+        self.written += len(batch)
+
+    def statistics(self):
+        """{series: count, mean, stddev, min, max, percentiles and grade counts} for each subject and "Average"."""
+        with self.lock:
+            return self.stats.summary()
+
+    def subject_average(self, subject, since=None, until=None):
+        """Average mark in a subject, optionally between two "%Y-%m-%d %H:%M:%S" timestamps (e.g. a term)."""
+        if since is None and until is None:
+            sql, params = "SELECT AVG(marks) FROM subject_marks WHERE subject = ?", (subject,)
+        else:
+            # CROSS JOIN keeps grade_history first, so only the term's rows are read via the timestamp index
+            sql = '''
+                SELECT AVG(marks) FROM grade_history
+                CROSS JOIN subject_marks ON subject_marks.history_id = grade_history.id AND subject_marks.subject = ?
+                WHERE timestamp >= ? AND timestamp < ?
+            '''
+            params = (subject, since or "", until or "9999")
+        return self.query(sql, params)[0][0]
+
+    def student_grades(self, student_name):
+        """Every grade recorded for a student as (timestamp, marks dict, total, average, grade), oldest first."""
+        rows = self.query('''
+            SELECT id, timestamp, total_marks, average_marks, final_grade, subject, marks FROM grade_history
+            LEFT JOIN subject_marks ON subject_marks.history_id = grade_history.id
+            WHERE student_name = ? ORDER BY id
+        ''', (student_name,))
+        grades = {}
+        for history_id, timestamp, total, average, grade, subject, marks in rows:
+            entry = grades.setdefault(history_id, (timestamp, {}, total, average, grade))
+            if subject is not None:
+                entry[1][subject] = marks
+        return list(grades.values())
+
+
+_histories = {}
+_histories_lock = threading.Lock()
+
+
+def get_history(db_name=DB_NAME):
+    """The shared GradeHistory for a database, opened on first use and closed at exit."""
+    with _histories_lock:
+        if db_name not in _histories:
+            _histories[db_name] = GradeHistory(db_name)
+            atexit.register(_histories[db_name].close)
+        return _histories[db_name]
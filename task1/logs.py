@@ -0,0 +1,111 @@
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+from datetime import datetime
+
+# JSON lines get their own file; the plain text log keeps its old name and format
+LOG_FILE = "grade_calculator.jsonl"
+TEXT_LOG_FILE = "grade_calculator.log"
+MAX_BYTES = 10 * 2 ** 20
+BACKUP_COUNT = 5
+
+# Attributes every LogRecord has; anything else came in through extra= and goes into the JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, message, extra fields and any traceback"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats each record in the caller to make it safe to send
+    to another process. Records here only cross to a thread, so message args are
+    passed through as they are and only turned into text when written. Callers
+    must not mutate an object after logging it.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def file_handler(path=None, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT, compress=True, structured=True):
+    """The rotating (optionally gzipped) JSON or text file handler the listener writes through.
+
+    path defaults to LOG_FILE for JSON and TEXT_LOG_FILE for text.
+    """
+    path = path or (LOG_FILE if structured else TEXT_LOG_FILE)
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                   encoding="utf-8", delay=True)
+    if compress:
+        handler.namer = lambda name: name + ".gz"
+        handler.rotator = _gzip_rotator
+    handler.setFormatter(JsonFormatter() if structured else
+                         logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    return handler
+
+
+_listener = None
+
+
+def setup_logging(path=None, level=logging.INFO, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT,
+                  compress=True, structured=True):
+    """Route logging through a queue to a rotating file written by a background thread.
+
+    Logging calls only put the record on a queue; a QueueListener formats it
+    (as JSON lines in LOG_FILE, or text in TEXT_LOG_FILE when structured is
+    False, unless path is given) and writes it, rotating the file at
+    max_bytes and keeping backup_count old files, gzipped when compress is set.
+    The listener is flushed and stopped at exit. Calling this again replaces the
+    previous setup.
+    """
+    global _listener
+    stop_logging()
+
+    handler = file_handler(path, max_bytes, backup_count, compress, structured)
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(LazyQueueHandler(records))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Write out queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,84 @@
+import bisect
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grading_policy.json")
+
+# Used when there is no config file
+DEFAULT_CONFIG = {
+    "default": "standard",
+    "policies": {
+        "standard": {
+            "subjects": ["English", "Mathematics", "Science", "Hindi", "SST"],
+            "max_mark": 100,
+            "grades": [[90, "A+"], [80, "A"], [70, "B"], [60, "C"], [50, "D"], [0, "F"]],
+        }
+    },
+}
+
+
+class GradingPolicy:
+    """Subjects, mark range and grade boundaries, compiled for lookups.
+
+    grades is a list of (minimum mark, grade) pairs, one of which must start at 0.
+    The minimums are kept sorted so a grade is one bisect for a single mark, or
+    one searchsorted for a whole array of marks.
+    """
+
+    def __init__(self, name, subjects, grades, max_mark=100):
+        boundaries = sorted((float(minimum), grade) for minimum, grade in grades)
+        if not boundaries or boundaries[0][0] != 0:
+            raise ValueError(f"Grading policy {name!r} needs a grade starting at 0")
+        if len({minimum for minimum, _ in boundaries}) != len(boundaries):
+            raise ValueError(f"Grading policy {name!r} has two grades with the same minimum")
+        if not subjects:
+            raise ValueError(f"Grading policy {name!r} has no subjects")
+
+        self.name = name
+        self.subjects = list(subjects)
+        self.max_mark = float(max_mark)
+        # A mark at or above thresholds[i] earns grades[i + 1]
+        self.thresholds = [minimum for minimum, _ in boundaries[1:]]
+        self.grades = np.array([grade for _, grade in boundaries])
+        self._threshold_array = np.array(self.thresholds, dtype=np.float64)
+        self._grade_list = self.grades.tolist()
+
+    def grade(self, marks):
+        """Grade of a mark, or an array of grades for an array of marks"""
+        if isinstance(marks, (int, float)) or np.ndim(marks) == 0:
+            return self._grade_list[bisect.bisect_right(self.thresholds, marks)]
+        return self.grades[np.searchsorted(self._threshold_array, marks, side="right")]
+
+    def validate(self, subject, marks):
+        """Raise ValueError unless marks is within 0..max_mark"""
+        if not (0 <= marks <= self.max_mark):
+            raise ValueError(f"Marks for {subject} must be between 0 and {self.max_mark:g}")
+
+
+@lru_cache(maxsize=8)
+def _load(path, modified):
+    """Compiled policies of a config file; cached until the file changes"""
+    if path is None:
+        config = DEFAULT_CONFIG
+    else:
+        with open(path) as f:
+            config = json.load(f)
+    policies = {name: GradingPolicy(name, spec["subjects"], spec["grades"], spec.get("max_mark", 100))
+                for name, spec in config["policies"].items()}
+    return policies, config.get("default", next(iter(policies)))
+
+
+def get_policy(name=None, path=CONFIG_PATH):
+    """A compiled grading policy from the config file (the built-in one if the file doesn't exist)"""
+    try:
+        modified = os.path.getmtime(path)
+    except OSError:
+        path, modified = None, None
+    policies, default = _load(path, modified)
+    try:
+        return policies[name or default]
+    except KeyError:
+        raise ValueError(f"Unknown grading policy: {name or default}") from None
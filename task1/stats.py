@@ -0,0 +1,209 @@
+import json
+import sqlite3
+import zlib
+
+import numpy as np
+
+from policy import get_policy
+
+# Marks are bounded to 0..max_mark of the grading policy, so each series keeps
+# counts in fixed 0.1-mark bins over that range. That is a streaming quantile
+# sketch with a known error (half a bin), and unlike P² or t-digest it updates a
+# whole batch in one bincount and merges exactly.
+BIN_WIDTH = 0.1
+AVERAGE = "Average"
+PERCENTILES = (25, 50, 75, 90)
+
+
+def histogram_bins(max_mark):
+    """Number of BIN_WIDTH bins covering 0..max_mark"""
+    return int(round(max_mark / BIN_WIDTH)) + 1
+
+
+class RunningStats:
+    """Running count, mean, variance, range, mark histogram and grade counts of one series.
+
+    Mean and variance are kept Welford-style (count, mean, sum of squared
+    deviations); a batch is folded in with the pairwise form of the same update.
+    The histogram and grades follow policy, the default grading policy unless given.
+    """
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None, histogram=None, grades=None,
+                 policy=None):
+        self.policy = policy or get_policy()
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+        self.histogram = np.zeros(histogram_bins(self.policy.max_mark), dtype=np.int64) if histogram is None else histogram
+        self.grades = dict.fromkeys(self.policy.grades.tolist(), 0) if grades is None else grades
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        count, mean = len(values), float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+        low, high = float(values.min()), float(values.max())
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+        bins = len(self.histogram)
+        self.histogram += np.bincount(np.clip(np.rint(values / BIN_WIDTH).astype(np.int64), 0, bins - 1),
+                                      minlength=bins)
+        letters, counts = np.unique(self.policy.grade(values), return_counts=True)
+        for letter, n in zip(letters.tolist(), counts.tolist()):
+            self.grades[letter] = self.grades.get(letter, 0) + n
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self):
+        return self.variance ** 0.5
+
+    def percentile(self, p):
+        """p-th percentile from the histogram, to within half a bin"""
+        if not self.count:
+            return None
+        cumulative = np.cumsum(self.histogram)
+        index = int(np.searchsorted(cumulative, p / 100 * self.count))
+        return min(max(index * BIN_WIDTH, self.minimum), self.maximum)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "stddev": self.stddev,
+            "min": self.minimum,
+            "max": self.maximum,
+            **{f"p{p}": self.percentile(p) for p in PERCENTILES},
+            "grades": dict(self.grades),
+        }
+
+
+class CohortStats:
+    """RunningStats for every subject plus the average mark, persisted in cohort_stats.
+
+    GradeHistory adds each batch it writes and saves the changed series in the
+    same transaction, so the stored aggregates always match grade_history and
+    reading them never touches the history itself. Every series is kept under
+    one grading policy, the default one unless given.
+    """
+
+    def __init__(self, series=None, policy=None):
+        self.policy = policy or get_policy()
+        self.series = series or {}
+        self._dirty = set()
+
+    def add_rows(self, rows):
+        """Fold in grade_row()s (name, marks dict, total, average, grade, timestamp)"""
+        by_subject = {}
+        for row in rows:
+            for subject, marks in row[1].items():
+                by_subject.setdefault(subject, []).append(marks)
+        by_subject[AVERAGE] = [row[3] for row in rows]
+        for name, values in by_subject.items():
+            self._series(name).add(values)
+            self._dirty.add(name)
+
+    def _series(self, name):
+        if name not in self.series:
+            self.series[name] = RunningStats(policy=self.policy)
+        return self.series[name]
+
+    def summary(self):
+        return {name: stats.summary() for name, stats in self.series.items()}
+
+    @staticmethod
+    def create_table(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cohort_stats (
+                series TEXT PRIMARY KEY,
+                count INTEGER,
+                mean REAL,
+                m2 REAL,
+                minimum REAL,
+                maximum REAL,
+                histogram BLOB,
+                grades TEXT
+            )
+        ''')
+
+    @classmethod
+    def load(cls, conn, policy=None):
+        """Stored aggregates, rebuilt from grade_history if missing, out of date or binned for another max_mark"""
+        policy = policy or get_policy()
+        cls.create_table(conn)
+        series = {}
+        for name, count, mean, m2, minimum, maximum, histogram, grades in conn.execute("SELECT * FROM cohort_stats"):
+            series[name] = RunningStats(count, mean, m2, minimum, maximum,
+                                        np.frombuffer(zlib.decompress(histogram), dtype=np.int64).copy(),
+                                        json.loads(grades), policy)
+        stored = conn.execute("SELECT COUNT(*) FROM grade_history").fetchone()[0]
+        counted = series[AVERAGE].count if AVERAGE in series else 0
+        bins = histogram_bins(policy.max_mark)
+        if counted != stored or any(len(s.histogram) != bins for s in series.values()):
+            return cls.rebuild(conn, policy=policy)
+        return cls(series, policy)
+
+    @classmethod
+    def rebuild(cls, conn, batch_size=100000, policy=None):
+        """Recompute every series by streaming grade_history and subject_marks"""
+        stats = cls(policy=policy)
+        last_id = 0
+        while True:
+            rows = conn.execute("SELECT id, average_marks FROM grade_history WHERE id > ? ORDER BY id LIMIT ?",
+                                (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            stats._series(AVERAGE).add([average for _, average in rows])
+            by_subject = {}
+            for subject, marks in conn.execute("SELECT subject, marks FROM subject_marks WHERE history_id > ? "
+                                               "AND history_id <= ?", (last_id, rows[-1][0])):
+                by_subject.setdefault(subject, []).append(marks)
+            for subject, values in by_subject.items():
+                stats._series(subject).add(values)
+            last_id = rows[-1][0]
+        stats._dirty = set(stats.series)
+        conn.execute("DELETE FROM cohort_stats")
+        stats.save(conn)
+        conn.commit()
+        return stats
+
+    def save(self, conn):
+        """Write changed series (caller commits)"""
+        conn.executemany("INSERT OR REPLACE INTO cohort_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+            (name, s.count, s.mean, s.m2, s.minimum, s.maximum, zlib.compress(s.histogram.tobytes()),
+             json.dumps(s.grades))
+            for name, s in ((name, self.series[name]) for name in self._dirty)])
+        self._dirty.clear()
+
+
+def report(summary):
+    lines = [f"{'Series':<12} {'Count':>8} {'Mean':>7} {'Std':>6} {'Min':>6} "
+             + " ".join(f"{'P' + str(p):>6}" for p in PERCENTILES) + f" {'Max':>6}  Grades"]
+    # Subjects first, the overall average last
+    for name, s in sorted(summary.items(), key=lambda item: item[0] == AVERAGE):
+        if not s["count"]:
+            continue
+        grades = " ".join(f"{grade}:{n}" for grade, n in s["grades"].items())
+        lines.append(f"{name:<12} {s['count']:>8} {s['mean']:>7.2f} {s['stddev']:>6.2f} {s['min']:>6.1f} "
+                     + " ".join(f"{s['p' + str(p)]:>6.1f}" for p in PERCENTILES) + f" {s['max']:>6.1f}  {grades}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from history import DB_NAME, create_schema
+
+    conn = sqlite3.connect(DB_NAME)
+    create_schema(conn)
+    print(report(CohortStats.load(conn).summary()))
+    conn.close()
@@ -1,10 +1,11 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
-import csv
-import os
 import sqlite3
 import logging
+from history import DB_NAME, get_history, grade_row
+from logs import setup_logging
+from policy import get_policy
 
 class GradeCalculatorGUI:
     def __init__(self, root):
@@ -13,9 +14,6 @@ class GradeCalculatorGUI:
         self.root.geometry("600x700")
         self.root.resizable(False, False)
         
-        # CSV file path
-        self.csv_file = "export.csv"
-        
         # Style configuration
         style = ttk.Style()
         style.configure("Title.TLabel", font=("Arial", 16, "bold"))
@@ -23,25 +21,10 @@ class GradeCalculatorGUI:
         
         # Variables for entry fields
         self.student_name = tk.StringVar()
-        self.subject_marks = {
-            "English": tk.StringVar(),
-            "Mathematics": tk.StringVar(),
-            "Science": tk.StringVar(),
-            "Hindi": tk.StringVar(),
-            "SST": tk.StringVar()
-        }
+        self.policy = get_policy()
+        self.subject_marks = {subject: tk.StringVar() for subject in self.policy.subjects}
         
         self.create_widgets()
-        self.ensure_csv_exists()
-        
-    def ensure_csv_exists(self):
-        """Create CSV file with headers if it doesn't exist"""
-        if not os.path.exists(self.csv_file):
-            headers = ['Student Name', 'English', 'Mathematics', 'Science', 
-                      'Hindi', 'SST', 'Total Marks', 'Average Marks', 'Final Grade']
-            with open(self.csv_file, 'w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(headers)
         
     def create_widgets(self):
         # Title
@@ -60,7 +43,7 @@ class GradeCalculatorGUI:
         marks_frame = ttk.LabelFrame(self.root, text="Subject Marks", padding="10")
         marks_frame.pack(fill="x", padx=10, pady=5)
         
-        ttk.Label(marks_frame, text="Enter marks for each subject (0-100):", style="Header.TLabel").grid(row=0, column=0, columnspan=2, pady=5)
+        ttk.Label(marks_frame, text=f"Enter marks for each subject (0-{self.policy.max_mark:g}):", style="Header.TLabel").grid(row=0, column=0, columnspan=2, pady=5)
         
         row_num = 1
         for subject, var in self.subject_marks.items():
@@ -74,6 +57,7 @@ class GradeCalculatorGUI:
         
         ttk.Button(button_frame, text="Calculate Grades", command=self.calculate_grades).pack(side="left", padx=5)
         ttk.Button(button_frame, text="Clear", command=self.clear_fields).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="Export", command=self.export_grades).pack(side="left", padx=5)
         
         # Result Display
         self.result_frame = ttk.LabelFrame(self.root, text="Results", padding="10")
@@ -84,18 +68,7 @@ class GradeCalculatorGUI:
         self.result_text.config(state="disabled")
         
     def calculate_grade(self, marks):
-        if marks >= 90:
-            return 'A+'
-        elif marks >= 80:
-            return 'A'
-        elif marks >= 70:
-            return 'B'
-        elif marks >= 60:
-            return 'C'
-        elif marks >= 50:
-            return 'D'
-        else:
-            return 'F'
+        return self.policy.grade(marks)
     
     def calculate_grades(self):
         # Validate student name
@@ -109,8 +82,7 @@ class GradeCalculatorGUI:
             marks_dict = {}
             for subject, var in self.subject_marks.items():
                 marks = float(var.get())
-                if not (0 <= marks <= 100):
-                    raise ValueError(f"Marks for {subject} must be between 0 and 100")
+                self.policy.validate(subject, marks)
                 marks_dict[subject] = marks
             
             # Calculate statistics
@@ -122,24 +94,6 @@ class GradeCalculatorGUI:
             log_calculation(name, marks_dict, total_marks, average_marks, final_grade)
             log_grade_to_db(name, marks_dict, total_marks, average_marks, final_grade)
             
-            # Prepare data for CSV
-            csv_data = [
-                name,
-                marks_dict['English'],
-                marks_dict['Mathematics'],
-                marks_dict['Science'],
-                marks_dict['Hindi'],
-                marks_dict['SST'],
-                total_marks,
-                average_marks,
-                final_grade
-            ]
-            
-            # Append to CSV file
-            with open(self.csv_file, 'a', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(csv_data)
-            
             # Generate display report
             report = f"Grade Report for {name}\n"
             report += f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
@@ -161,7 +115,7 @@ class GradeCalculatorGUI:
             report += f"{'Average:':<15} {average_marks:<10.2f}\n"
             report += f"{'Final Grade:':<15} {final_grade}\n"
             report += "=" * 50 + "\n"
-            report += "\nResults have been saved to export.csv"
+            report += "\nResults have been saved to the grade history (use Export to write a file)"
             
             # Display report
             self.result_text.config(state="normal")
@@ -169,13 +123,25 @@ class GradeCalculatorGUI:
             self.result_text.insert(tk.END, report)
             self.result_text.config(state="disabled")
             
-            messagebox.showinfo("Success", "Grades calculated and saved to export.csv")
+            messagebox.showinfo("Success", "Grades calculated and saved")
             
         except ValueError as e:
             messagebox.showerror("Error", str(e))
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
     
+    def export_grades(self):
+        path = filedialog.asksaveasfilename(
+            initialfile="export.csv", defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Parquet", "*.parquet"), ("Arrow IPC", "*.arrow")])
+        if not path:
+            return
+        try:
+            written = export_results(path)
+            messagebox.showinfo("Success", f"Exported {written} grades to {path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Export failed: {str(e)}")
+    
     def clear_fields(self):
         self.student_name.set("")
         for var in self.subject_marks.values():
@@ -188,45 +154,21 @@ class GradeCalculatorGUI:
 
 def create_db():
     """Creates a SQLite database to store the operation history."""
-    conn = sqlite3.connect("grade_calculator_history.db")
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS grade_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_name TEXT,
-            subject_marks TEXT,
-            total_marks REAL,
-            average_marks REAL,
-            final_grade TEXT,
-            timestamp TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    get_history()
 
 def log_grade_to_db(student_name, marks_dict, total_marks, average_marks, final_grade):
-    """Logs grade calculation results to SQLite database."""
-    conn = sqlite3.connect("grade_calculator_history.db")
-    cursor = conn.cursor()
-    
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    cursor.execute('''
-        INSERT INTO grade_history (student_name, subject_marks, total_marks, average_marks, final_grade, timestamp)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (student_name, str(marks_dict), total_marks, average_marks, final_grade, timestamp))
-    
-    conn.commit()
-    conn.close()
+    """Queues grade calculation results for the history database (written in batches in the background)."""
+    get_history().log(grade_row(student_name, marks_dict, total_marks, average_marks, final_grade))
 
 # Logging Functions
 
-logging.basicConfig(filename="grade_calculator.log", level=logging.INFO, 
-                    format="%(asctime)s - %(levelname)s - %(message)s")
-
 def log_calculation(student_name, marks_dict, total_marks, average_marks, final_grade):
     """Logs a grade calculation."""
-    logging.info(f"Student: {student_name}, Marks: {marks_dict}, Total: {total_marks}, Average: {average_marks}, Grade: {final_grade}")
+    # Formatted by the logging thread (see logs.py), not here
+    logging.info("Student: %s, Marks: %s, Total: %s, Average: %s, Grade: %s",
+                 student_name, marks_dict, total_marks, average_marks, final_grade,
+                 extra={"student": student_name, "marks": marks_dict, "total": total_marks,
+                        "average": average_marks, "grade": final_grade})
 
 # Console Interface
 
@@ -240,39 +182,27 @@ def console_interface():
         return
     
     marks_dict = {}
-    subjects = ["English", "Mathematics", "Science", "Hindi", "SST"]
+    policy = get_policy()
     
-    for subject in subjects:
+    for subject in policy.subjects:
         while True:
             try:
-                marks = float(input(f"Enter marks for {subject} (0-100): ").strip())
-                if 0 <= marks <= 100:
-                    marks_dict[subject] = marks
-                    break
-                else:
-                    print(f"Error: Marks for {subject} must be between 0 and 100.")
+                marks = float(input(f"Enter marks for {subject} (0-{policy.max_mark:g}): ").strip())
             except ValueError:
                 print(f"Error: Please enter a valid number for {subject}.")
+                continue
+            try:
+                policy.validate(subject, marks)
+            except ValueError as e:
+                print(f"Error: {e}.")
+                continue
+            marks_dict[subject] = marks
+            break
     
     # Calculate total, average, and grade
     total_marks = sum(marks_dict.values())
     average_marks = total_marks / len(marks_dict)
-    
-    def calculate_grade(marks):
-        if marks >= 90:
-            return 'A+'
-        elif marks >= 80:
-            return 'A'
-        elif marks >= 70:
-            return 'B'
-        elif marks >= 60:
-            return 'C'
-        elif marks >= 50:
-            return 'D'
-        else:
-            return 'F'
-    
-    final_grade = calculate_grade(average_marks)
+    final_grade = policy.grade(average_marks)
     
     # Log calculation
     log_calculation(student_name, marks_dict, total_marks, average_marks, final_grade)
@@ -287,24 +217,62 @@ def console_interface():
     print(f"Final Grade: {final_grade}")
     print("="*50)
     
-    # Optionally, save results to CSV
-    csv_data = [student_name, marks_dict['English'], marks_dict['Mathematics'], marks_dict['Science'],
-                marks_dict['Hindi'], marks_dict['SST'], total_marks, average_marks, final_grade]
-    with open("export.csv", "a", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow(csv_data)
-    
-    print("Results have been saved to export.csv.")
+    print("Results have been saved to the grade history (choose 4 - Export to write export.csv).")
+
+def batch_interface():
+    """Grade every student in a CSV file into the grade history."""
+    from batch import grade_file
+
+    path = input("Enter the path of the students CSV: ").strip()
+    try:
+        with open(path, newline="") as source:
+            graded, rejected = grade_file(source, None, history=get_history())
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return
+
+    for name, reason in rejected:
+        print(f"Skipped {name or '(no name)'}: {reason}")
+    logging.info("Batch graded %d students from %s, skipped %d", graded, path, len(rejected))
+    print(f"Graded {graded} students. Results have been saved to the grade history.")
+
+# Export Functions
+
+def export_results(path="export.csv"):
+    """Regenerates an export (.csv, .parquet or .arrow) from the grade history; returns the number of rows."""
+    from export import export_history
+
+    get_history().flush()
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        return export_history(conn, path)
+    finally:
+        conn.close()
+
+def export_interface():
+    """Console export of the grade history."""
+    path = input("Enter the export path (.csv, .parquet or .arrow) [export.csv]: ").strip() or "export.csv"
+    try:
+        written = export_results(path)
+    except (OSError, ImportError, ValueError) as e:
+        print(f"Error: {e}")
+        return
+    print(f"Exported {written} grades to {path}.")
 
 def main():
+    setup_logging()
     create_db()  # Initialize SQLite database
-    choice = input("Choose interface (1 - Console, 2 - GUI): ").strip()
+    choice = input("Choose interface (1 - Console, 2 - GUI, 3 - Batch CSV, 4 - Export): ").strip()
     if choice == '1':
         console_interface()
     elif choice == '2':
         root = tk.Tk()
         app = GradeCalculatorGUI(root)
         root.mainloop()
+    elif choice == '3':
+        batch_interface()
+    elif choice == '4':
+        export_interface()
     else:
         print("Invalid choice.")
 
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The grade calculator is a directory of scripts, not a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
@@ -0,0 +1,71 @@
+import csv
+import math
+import sqlite3
+
+import pytest
+
+from export import ExportWriter, export_history
+from history import GradeHistory, grade_row
+from policy import get_policy
+
+SUBJECTS = get_policy().subjects
+
+
+@pytest.fixture
+def history_db(tmp_path):
+    """A grade history with a full row, a row missing marks and a name that needs quoting"""
+    db_name = str(tmp_path / "history.db")
+    with GradeHistory(db_name) as history:
+        history.log(grade_row("Asha", dict.fromkeys(SUBJECTS, 80.0), 400.0, 80.0, "A"))
+        history.log(grade_row("Ravi", {SUBJECTS[0]: 55.5}, 55.5, 55.5, "D"))
+        history.log(grade_row('Lee, "Jr"', dict.fromkeys(SUBJECTS, 1e-7), 5e-7, 1e-7, "F"))
+    conn = sqlite3.connect(db_name)
+    yield conn
+    conn.close()
+
+
+def expected_rows():
+    return [
+        ["Asha"] + ["80.0"] * len(SUBJECTS) + ["400.0", "80.0", "A"],
+        ["Ravi", "55.5"] + [""] * (len(SUBJECTS) - 1) + ["55.5", "55.5", "D"],
+        ['Lee, "Jr"'] + ["1e-07"] * len(SUBJECTS) + ["5e-07", "1e-07", "F"],
+    ]
+
+
+def test_csv_export_streams_history_rows(history_db, tmp_path):
+    path = tmp_path / "export.csv"
+    assert export_history(history_db, str(path)) == 3
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["Student Name"] + SUBJECTS + ["Total Marks", "Average Marks", "Final Grade"]
+    assert rows[1:] == expected_rows()
+
+
+def test_csv_writer_counts_rows(tmp_path):
+    path = tmp_path / "export.csv"
+    with ExportWriter(str(path)) as writer:
+        writer.write_rows([["Asha"] + [80.0] * len(SUBJECTS) + [400.0, 80.0, "A"]] * 3)
+    assert writer.written == 3
+    assert len(path.read_text().splitlines()) == 4
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".arrow"])
+def test_columnar_export_round_trips(history_db, tmp_path, extension):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    path = str(tmp_path / ("export" + extension))
+    assert export_history(history_db, path, chunk_size=2) == 3
+    if extension == ".parquet":
+        table = pyarrow.parquet.read_table(path)
+    else:
+        table = pyarrow.ipc.open_file(path).read_all()
+
+    assert table.column_names == ["Student Name"] + SUBJECTS + ["Total Marks", "Average Marks", "Final Grade"]
+    assert table.column("Student Name").to_pylist() == ["Asha", "Ravi", 'Lee, "Jr"']
+    ravi = table.slice(1, 1).to_pylist()[0]
+    assert ravi[SUBJECTS[0]] == 55.5
+    # A missing mark is NaN, as in the CSV export's empty cell
+    assert all(math.isnan(ravi[subject]) for subject in SUBJECTS[1:])
+    assert table.column("Final Grade").to_pylist() == ["A", "D", "F"]
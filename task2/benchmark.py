@@ -0,0 +1,598 @@
+import argparse
+import glob
+import io
+import math
+import os
+import random
+import re
+import sqlite3
+import statistics
+import tempfile
+import time
+import timeit
+import wave
+
+from speech_corpus import SPEECH_CORPUS
+
+
+def random_expression(rng, depth=0, max_depth=3):
+    """A calculator-style expression: numbers, + - * / and the odd parenthesis"""
+    if depth >= max_depth or rng.random() < 0.3:
+        return str(rng.randint(0, 100)) if rng.random() < 0.6 else str(round(rng.uniform(0, 100), 2))
+    expression = f"{random_expression(rng, depth + 1, max_depth)} {rng.choice('+-*/')} " \
+                 f"{random_expression(rng, depth + 1, max_depth)}"
+    return f"({expression})" if rng.random() < 0.3 else expression
+
+
+def random_expressions(count, seed=1, max_depth=3):
+    rng = random.Random(seed)
+    return [random_expression(rng, max_depth=max_depth) for _ in range(count)]
+
+
+def long_expression(rng, terms):
+    """One flat run of terms: 12 * 3.5 - 40 / 7 + ..."""
+    parts = [str(rng.randint(1, 100))]
+    for _ in range(terms - 1):
+        parts.append(rng.choice("+-*/"))
+        parts.append(str(rng.randint(1, 100)) if rng.random() < 0.6 else str(round(rng.uniform(1, 100), 2)))
+    return " ".join(parts)
+
+
+def deep_expression(rng, nesting):
+    """Parentheses nested nesting levels: (12 + (3.5 * (40 - (...))))"""
+    expression = str(rng.randint(1, 100))
+    for _ in range(nesting):
+        expression = f"({rng.randint(1, 100)} {rng.choice('+-*')} {expression})"
+    return expression
+
+
+def legacy_speech_to_expression(text):
+    """The chained str.replace translation SpeechCalculator used before"""
+    text = text.lower()
+    replacements = {
+        'plus': '+', 'add': '+', 'minus': '-', 'subtract': '-', 'times': '*', 'multiplied by': '*',
+        'multiply': '*', 'divided by': '/', 'divide': '/', 'equals': '=', 'equal': '=', 'point': '.',
+        'zero': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5', 'six': '6', 'seven': '7',
+        'eight': '8', 'nine': '9'
+    }
+    for word, replacement in replacements.items():
+        text = text.replace(word, replacement)
+    return re.sub(r'[^0-9+\-*/=\.]', '', text)
+
+
+def _rate(label, count, seconds):
+    print(f"{label:<28} {count / seconds:12,.0f} expressions/s  ({seconds / count * 1e6:.2f} us each)")
+
+
+def bench_eval(args):
+    """Expressions evaluated per second: eval vs the compiled evaluator, cold and cached"""
+    from expression import compile_expression, evaluate, evaluate_many
+
+    expressions = random_expressions(args.expressions, max_depth=args.depth)
+    # Replaying a log: the same few hundred expressions over and over
+    repeated = [expressions[i % args.distinct] for i in range(args.expressions)]
+
+    def run(function, items):
+        values = []
+        start = time.perf_counter()
+        for item in items:
+            try:
+                values.append(function(item))
+            except ZeroDivisionError:
+                values.append(None)
+        return values, time.perf_counter() - start
+
+    print(f"{args.expressions} expressions, up to {args.depth} levels deep")
+    expected, seconds = run(eval, expressions)
+    _rate("eval", len(expressions), seconds)
+
+    compile_expression.cache_clear()
+    values, seconds = run(evaluate, expressions)
+    _rate("evaluate, all distinct", len(expressions), seconds)
+    mismatches = sum(value != reference for value, reference in zip(values, expected))
+
+    _, seconds = run(eval, repeated)
+    _rate(f"eval, {args.distinct} distinct", len(repeated), seconds)
+    compile_expression.cache_clear()
+    _, seconds = run(evaluate, repeated)
+    _rate(f"evaluate, {args.distinct} distinct", len(repeated), seconds)
+
+    compile_expression.cache_clear()
+    start = time.perf_counter()
+    evaluate_many(repeated, return_exceptions=True)
+    _rate(f"evaluate_many, {args.distinct} dist.", len(repeated), time.perf_counter() - start)
+
+    print(f"{mismatches} results differ from eval")
+
+
+def bench_backends(args):
+    """Short, long and deeply nested expressions through each backend, and a log replayed in bulk"""
+    from expression import BACKENDS, compile_expression, evaluate, evaluate_many
+
+    rng = random.Random(1)
+    workloads = {
+        "short": random_expressions(args.expressions, max_depth=3),
+        f"long ({args.terms} terms)": [long_expression(rng, args.terms) for _ in range(args.expressions // 100)],
+        f"deep ({args.nesting} levels)": [deep_expression(rng, args.nesting) for _ in range(args.expressions // 100)],
+    }
+
+    def timed(function, items):
+        start = time.perf_counter()
+        for item in items:
+            try:
+                function(item)
+            except ZeroDivisionError:
+                pass
+        return (time.perf_counter() - start) / len(items) * 1e6
+
+    print(f"{'us per expression':<24}" + "".join(f"{name:>22}" for name in workloads))
+    print(f"{'eval':<24}" + "".join(f"{timed(eval, items):22.2f}" for items in workloads.values()))
+    for backend in BACKENDS:
+        cold, compiled = [], []
+        for items in workloads.values():
+            compile_expression.cache_clear()
+            cold.append(timed(lambda item: evaluate(item, backend=backend), items))
+            # Already compiled, as after a cache hit
+            expressions = [compile_expression(item, backend) for item in items]
+            compiled.append(timed(lambda expression: expression(), expressions))
+        print(f"{backend + ', compile + run':<24}" + "".join(f"{us:22.2f}" for us in cold))
+        print(f"{backend + ', compiled':<24}" + "".join(f"{us:22.2f}" for us in compiled))
+
+    # Replaying a log: many expressions, few shapes
+    log = random_expressions(args.log, seed=2, max_depth=2)
+    print(f"\nreplay {len(log)} logged expressions")
+    start = time.perf_counter()
+    for expression in log:
+        try:
+            eval(expression)
+        except ZeroDivisionError:
+            pass
+    _rate("eval loop", len(log), time.perf_counter() - start)
+    for backend in ("float", "numpy"):
+        compile_expression.cache_clear()
+        start = time.perf_counter()
+        evaluate_many(log, return_exceptions=True, backend=backend)
+        _rate(f"evaluate_many, {backend}", len(log), time.perf_counter() - start)
+
+
+def bench_translate(args):
+    """Speech-to-expression accuracy on SPEECH_CORPUS and phrases translated per second"""
+    from translator import speech_to_expression
+
+    phrases = [phrase for phrase, _ in SPEECH_CORPUS] * (args.phrases // len(SPEECH_CORPUS) + 1)
+    phrases = phrases[:args.phrases]
+    for label, translate in (("str.replace chain", legacy_speech_to_expression),
+                             ("single pass", speech_to_expression)):
+        wrong = [(phrase, translate(phrase), expected) for phrase, expected in SPEECH_CORPUS
+                 if translate(phrase).replace("=", "") != expected]
+        start = time.perf_counter()
+        for phrase in phrases:
+            translate(phrase)
+        seconds = time.perf_counter() - start
+        print(f"{label:<18} {len(SPEECH_CORPUS) - len(wrong)}/{len(SPEECH_CORPUS)} correct  "
+              f"{len(phrases) / seconds:10,.0f} phrases/s ({seconds / len(phrases) * 1e6:.2f} us each)")
+        if args.verbose:
+            for phrase, got, expected in wrong:
+                print(f"    {phrase!r}: got {got!r}, expected {expected!r}")
+
+
+def wav_chunks(path, chunk_ms):
+    """(sample rate, PCM chunks of chunk_ms) of a 16-bit mono WAV fixture"""
+    with wave.open(path, "rb") as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: fixtures must be 16-bit mono WAV")
+        rate = wav.getframerate()
+        frames = max(1, rate * chunk_ms // 1000)
+        chunks = []
+        while True:
+            data = wav.readframes(frames)
+            if not data:
+                return rate, chunks
+            chunks.append(data)
+
+
+def bench_recognize(args):
+    """End-to-end recognition latency over a directory of WAV fixtures.
+
+    Each fixture is fed to the recognizer in chunks, paced like a live
+    microphone unless --no-realtime. Reports when the first partial result
+    arrived, and the lag from the end of the audio to the final text (negative
+    when the engine called the end of the utterance before trailing silence ran
+    out). A fixture.txt next to fixture.wav is the expected transcript.
+    """
+    from recognizers import get_recognizer
+    from translator import VOCABULARY, speech_to_expression
+
+    paths = sorted(glob.glob(os.path.join(args.fixtures, "*.wav")))
+    if not paths:
+        print(f"No .wav fixtures in {args.fixtures}")
+        return
+    recognizer = get_recognizer(args.recognizer, grammar=VOCABULARY if args.grammar else None)
+    print(f"{recognizer.name}, {args.chunk_ms} ms chunks, {'real time' if args.realtime else 'as fast as possible'}")
+
+    first_partials, lags, correct, checked = [], [], 0, 0
+    for path in paths:
+        rate, chunks = wav_chunks(path, args.chunk_ms)
+        duration = sum(len(chunk) for chunk in chunks) / 2 / rate
+        start = time.perf_counter()
+
+        def feed():
+            for i, chunk in enumerate(chunks):
+                if args.realtime:
+                    # A microphone hands over each chunk once it has been spoken
+                    delay = start + (i + 1) * args.chunk_ms / 1000 - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                yield chunk
+
+        first_partial = finished = None
+        texts = []
+        for result in recognizer.stream(feed(), rate):
+            now = time.perf_counter() - start
+            if result.final:
+                texts.append(result.text)
+                finished = now
+            elif first_partial is None:
+                first_partial = now
+        finished = time.perf_counter() - start if finished is None else finished
+        # Against the audio's own clock when paced, else against the moment the last chunk went in
+        lag = finished - duration if args.realtime else finished
+        text = " ".join(texts)
+        lags.append(lag)
+        if first_partial is not None:
+            first_partials.append(first_partial)
+
+        expected_path = os.path.splitext(path)[0] + ".txt"
+        verdict = ""
+        if os.path.exists(expected_path):
+            with open(expected_path) as f:
+                expected = f.read().lower().split()
+            checked += 1
+            correct += text.lower().split() == expected
+            verdict = "ok" if text.lower().split() == expected else f"expected {' '.join(expected)!r}"
+        print(f"{os.path.basename(path):<24} {duration:5.2f}s audio  first partial "
+              f"{'-' if first_partial is None else f'{first_partial:.3f}s':>7}  lag {lag:+.3f}s  "
+              f"{text!r} -> {speech_to_expression(text)!r} {verdict}")
+
+    print(f"\nlag p50 {statistics.median(lags):+.3f}s  max {max(lags):+.3f}s", end="")
+    if first_partials:
+        print(f"  first partial p50 {statistics.median(first_partials):.3f}s", end="")
+    print(f"  transcripts {correct}/{checked} correct" if checked else "")
+
+
+def synthetic_speech(rng, sample_rate, bursts, noise, loudness):
+    """(WAV file object, [(start, end) seconds of each burst]): tone bursts standing in for words over noise"""
+    import struct
+
+    samples, spans = [], []
+    t = 1.5
+    for _ in range(bursts):
+        gap, length = rng.uniform(1.2, 3.0), rng.uniform(0.4, 2.5)
+        samples += [rng.gauss(0, noise) for _ in range(int(gap * sample_rate))]
+        pitch = rng.uniform(120, 300)
+        samples += [rng.gauss(0, noise) + loudness * math.sin(2 * math.pi * pitch * i / sample_rate)
+                    * (0.6 + 0.4 * math.sin(2 * math.pi * 4 * i / sample_rate))
+                    for i in range(int(length * sample_rate))]
+        spans.append((t + gap, t + gap + length))
+        t += gap + length
+    samples += [rng.gauss(0, noise) for _ in range(sample_rate)]
+    # The first 1.5 s are room noise for calibration
+    samples = [rng.gauss(0, noise) for _ in range(int(1.5 * sample_rate))] + samples
+
+    file = io.BytesIO()
+    with wave.open(file, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(struct.pack(f"<{len(samples)}h", *(max(-32768, min(32767, int(x))) for x in samples)))
+    file.seek(0)
+    return file, spans
+
+
+def bench_capture(args):
+    """Voice activity segmentation: accuracy on known bursts, cost per chunk, and time to start listening.
+
+    Before the capture service each button press opened the microphone and spent
+    0.5 s calibrating before it listened at all; now it subscribes to a capture
+    that is already running.
+    """
+    from capture import AudioCapture, FileSource, rms
+
+    rng = random.Random(1)
+    file, spans = synthetic_speech(rng, args.sample_rate, args.bursts, args.noise, args.loudness)
+    files = [file] + sorted(glob.glob(os.path.join(args.fixtures, "*.wav"))) if args.fixtures else [file]
+    source = FileSource(*files, chunk_seconds=args.chunk_ms / 1000, realtime=False)
+    capture = AudioCapture(source, cache=None)
+    subscription = capture.subscribe()
+
+    found, feed_times, started = [], [], None
+    while True:
+        pcm = source.read()
+        if not pcm:
+            break
+        start = time.perf_counter()
+        capture.feed(pcm)
+        feed_times.append(time.perf_counter() - start)
+        if capture.speaking and started is None:
+            started = capture.speech_start
+        elif not capture.speaking and started is not None:
+            found.append((started, capture.clock))
+            started = None
+    subscription.close()
+
+    print(f"noise floor {capture.noise:.0f} RMS, threshold {capture.threshold:.0f}, "
+          f"{len(feed_times)} chunks of {args.chunk_ms} ms")
+    matched = [(span, next((f for f in found if f[0] <= span[0] + 0.1 and f[1] >= span[1]), None))
+               for span in spans]
+    hits = [(span, f) for span, f in matched if f]
+    print(f"bursts covered by an utterance   {len(hits)}/{len(spans)}   "
+          f"(utterances found in the synthetic audio: {sum(f[1] <= spans[-1][1] + 2 for f in found)})")
+    if hits:
+        lead = [span[0] - f[0] for span, f in hits]
+        tail = [f[1] - span[1] for span, f in hits]
+        print(f"utterance starts before speech  p50 {statistics.median(lead) * 1000:6.0f} ms  "
+              f"ends after it p50 {statistics.median(tail) * 1000:6.0f} ms")
+    feed_times.sort()
+    print(f"VAD + ring buffer per chunk      p50 {statistics.median(feed_times) * 1e6:6.1f} us  "
+          f"p99 {feed_times[int(len(feed_times) * 0.99)] * 1e6:6.1f} us  "
+          f"({sum(feed_times) / (len(feed_times) * args.chunk_ms / 1000):.2%} of real time)")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        capture.subscribe().close()
+    subscribe = (time.perf_counter() - start) / 1000
+    print(f"start listening: subscribe {subscribe * 1e6:.1f} us, "
+          f"was open microphone + 500 ms calibration ({500 / (subscribe * 1e3):,.0f}x)")
+    pcm = bytes(int(args.sample_rate * args.chunk_ms / 1000) * 2)
+    start = time.perf_counter()
+    for _ in range(10000):
+        rms(pcm)
+    print(f"rms of one chunk {(time.perf_counter() - start) / 10000 * 1e6:.1f} us")
+
+
+def _poll_until(jobs, done, poll_ms, limit=60):
+    """Call jobs.poll() every poll_ms, as Tk would, until done(); returns the longest gap between polls"""
+    longest = 0.0
+    last = time.perf_counter()
+    deadline = last + limit
+    while not done() and time.perf_counter() < deadline:
+        time.sleep(poll_ms / 1000)
+        jobs.poll()
+        now = time.perf_counter()
+        longest = max(longest, now - last)
+        last = now
+    return longest
+
+
+def bench_jobs(args):
+    """Round trips through the job queue, and how long the UI thread is held while speech is handled.
+
+    Before the job queue, the button callback held Tk for the whole of listening
+    and recognition; now the UI thread only submits and polls.
+    """
+    from capture import AudioCapture, FileSource
+    from expression import evaluate
+    from jobs import JobQueue, QueueFull
+    from recognizers import Recognizer, RecognitionError, get_recognizer
+
+    jobs = JobQueue(workers=2, max_pending=args.max_pending, poll_ms=args.poll_ms)
+    expressions = random_expressions(args.expressions)
+    round_trips, errors, rejected = [], [], 0
+    start = time.perf_counter()
+    for expression in expressions:
+        submitted = time.perf_counter()
+        try:
+            jobs.submit("evaluate", lambda job, e=expression: evaluate(e),
+                        on_done=lambda _, t=submitted: round_trips.append(time.perf_counter() - t),
+                        on_error=errors.append)
+        except QueueFull:
+            rejected += 1
+            _poll_until(jobs, lambda: jobs.pending < args.max_pending, args.poll_ms)
+    _poll_until(jobs, lambda: not jobs.pending, args.poll_ms)
+    elapsed = time.perf_counter() - start
+    round_trips.sort()
+    print(f"evaluate jobs   {len(round_trips) / elapsed:10,.0f}/s  round trip p50 "
+          f"{statistics.median(round_trips) * 1000:.2f} ms  p99 {round_trips[len(round_trips) * 99 // 100] * 1000:.2f} ms"
+          f"  (poll every {args.poll_ms} ms, {rejected} submits refused by the depth limit, {len(errors)} errors)")
+
+    cancelled = []
+    job = jobs.submit("sleep", lambda job: time.sleep(1), on_error=cancelled.append)
+    time.sleep(0.05)
+    start = time.perf_counter()
+    job.cancel()
+    _poll_until(jobs, lambda: cancelled, args.poll_ms)
+    print(f"cancel          reported after {(time.perf_counter() - start) * 1000:.1f} ms of a 1 s blocking job: "
+          f"{type(cancelled[0]).__name__}")
+    timed_out = []
+    start = time.perf_counter()
+    jobs.submit("sleep", lambda job: time.sleep(1), on_error=timed_out.append, timeout=0.1)
+    _poll_until(jobs, lambda: timed_out, args.poll_ms)
+    print(f"timeout 100 ms  reported after {(time.perf_counter() - start) * 1000:.1f} ms: "
+          f"{type(timed_out[0]).__name__}")
+
+    # Speech from synthetic audio in real time, one listening job after another as from the button
+    try:
+        recognizer = get_recognizer(args.recognizer)
+    except (ImportError, RecognitionError) as e:
+        print(f"\nNo recognizer available ({e}); speech jobs only collect the audio")
+
+        class AudioOnly(Recognizer):
+            def stream(self, chunks, sample_rate):
+                for _ in chunks:
+                    pass
+                yield from ()
+        recognizer = AudioOnly()
+    file, spans = synthetic_speech(random.Random(3), args.sample_rate, args.utterances, 60, 3000)
+    capture = AudioCapture(FileSource(file), cache=None).start()
+    jobs = JobQueue(workers=2, max_pending=args.max_pending, poll_ms=args.poll_ms)
+
+    def hear(job):
+        with capture.subscribe() as subscription:
+            job.on_cancel(subscription.close)
+            with job.stage("listen"):
+                chunks = subscription.utterance(timeout=10)
+            with job.stage("recognize"):
+                return recognizer.transcribe(chunks, capture.sample_rate)
+
+    stalls = []
+    for _ in range(args.utterances):
+        finished = []
+        jobs.submit("speech", hear, on_done=finished.append, on_error=finished.append, timeout=30)
+        stalls.append(_poll_until(jobs, lambda: finished, args.poll_ms))
+    capture.stop()
+    stats = jobs.stats.snapshot()
+    for stage in ("queued", "listen", "recognize", "post", "total"):
+        if f"speech {stage}" in stats:
+            timing = stats[f"speech {stage}"]
+            print(f"speech {stage:<9} p50 {timing['p50_ms']:9.1f} ms  p99 {timing['p99_ms']:9.1f} ms")
+    blocked = stats["speech listen"]["p50_ms"] + stats["speech recognize"]["p50_ms"]
+    print(f"UI thread: longest gap between polls {max(stalls) * 1000:.1f} ms; "
+          f"the button callback used to block for about {blocked:.0f} ms")
+
+
+def legacy_calculations(db_name, expressions, commit_each=False):
+    """The original calculations table and rows, one INSERT and commit per calculation if commit_each"""
+    from datetime import datetime
+
+    conn = sqlite3.connect(db_name)
+    conn.execute("CREATE TABLE IF NOT EXISTS calculations (timestamp TEXT, operation TEXT, result TEXT)")
+    start = datetime(2024, 1, 1).timestamp()
+    rows = [(datetime.fromtimestamp(start + i * 60).strftime('%Y-%m-%d %H:%M:%S'), expression, "0")
+            for i, expression in enumerate(expressions)]
+    if commit_each:
+        for row in rows:
+            conn.execute("INSERT INTO calculations VALUES (?, ?, ?)", row)
+            conn.commit()
+    else:
+        conn.executemany("INSERT INTO calculations VALUES (?, ?, ?)", rows)
+        conn.commit()
+    conn.close()
+
+
+def bench_history(args):
+    """Calculation history: inserts, migration of the old table, and replaying the last N calculations"""
+    from expression import evaluate
+    from history import CalculationHistory
+
+    expressions = random_expressions(max(args.inserts, args.rows), max_depth=2)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        legacy_calculations(os.path.join(tmp, "legacy.db"), expressions[:args.inserts], commit_each=True)
+        legacy = time.perf_counter() - start
+
+        history = CalculationHistory(os.path.join(tmp, "history.db"))
+        start = time.perf_counter()
+        for expression in expressions[:args.inserts]:
+            history.log(expression, 0)
+        queued = time.perf_counter() - start
+        history.close()
+        write_behind = time.perf_counter() - start
+        print(f"insert {args.inserts} calculations: commit each {args.inserts / legacy:10,.0f}/s   "
+              f"write-behind {args.inserts / write_behind:10,.0f}/s ({legacy / write_behind:.0f}x), "
+              f"{queued / args.inserts * 1e6:.1f} us in the caller")
+
+        db_name = os.path.join(tmp, "calculator.db")
+        legacy_calculations(db_name, expressions[:args.rows])
+        start = time.perf_counter()
+        history = CalculationHistory(db_name)
+        print(f"migrate {history.count()} rows of the old table: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        conn = sqlite3.connect(os.path.join(tmp, "legacy.db"))
+        legacy_calculations(os.path.join(tmp, "legacy.db"), expressions[args.inserts:args.rows])
+        # Load numpy and the pages of both databases before anything is timed
+        history.replay(10, backend="numpy")
+        history.between(0, limit=1)
+        conn.execute("SELECT COUNT(*) FROM calculations").fetchall()
+        for n in args.last:
+            start = time.perf_counter()
+            rows = conn.execute("SELECT timestamp, operation, result FROM calculations ORDER BY timestamp DESC LIMIT ?",
+                                (n,)).fetchall()
+            for _, expression, _ in rows:
+                try:
+                    evaluate(expression)
+                except ArithmeticError:
+                    pass
+            old = time.perf_counter() - start
+            timings = []
+            for backend in ("float", "numpy"):
+                start = time.perf_counter()
+                history.replay(n, backend=backend)
+                timings.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            history.last(n)
+            query = time.perf_counter() - start
+            print(f"replay last {n:>7}: unindexed + evaluate {old * 1000:8.1f} ms   replay {timings[0] * 1000:8.1f} ms"
+                  f"   numpy {timings[1] * 1000:8.1f} ms   (query alone {query * 1000:.1f} ms)")
+
+        since = history.query("SELECT MAX(created) FROM calculation_history")[0][0] - 3600
+        rows = history.between(since)
+        indexed = min(timeit.repeat(lambda: history.between(since), number=1, repeat=5))
+        scan = min(timeit.repeat(lambda: conn.execute("SELECT * FROM calculations WHERE timestamp >= "
+                                                      "datetime(?, 'unixepoch', 'localtime')", (since,)).fetchall(),
+                                 number=1, repeat=5))
+        print(f"last hour ({len(rows)} rows): created index {indexed * 1000:.2f} ms, text scan {scan * 1000:.2f} ms")
+        conn.close()
+        history.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speech calculator benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    evaluation = subparsers.add_parser("eval", help="evaluation throughput against eval")
+    evaluation.add_argument("--expressions", type=int, default=100000)
+    evaluation.add_argument("--depth", type=int, default=3, help="maximum nesting of generated expressions")
+    evaluation.add_argument("--distinct", type=int, default=500, help="distinct expressions in the repeated run")
+    evaluation.set_defaults(func=bench_eval)
+
+    backends = subparsers.add_parser("backends", help="short, long and deep expressions per numeric backend")
+    backends.add_argument("--expressions", type=int, default=20000)
+    backends.add_argument("--terms", type=int, default=500, help="terms in each long expression")
+    backends.add_argument("--nesting", type=int, default=90, help="parentheses in each deep expression")
+    backends.add_argument("--log", type=int, default=200000, help="expressions in the replayed log")
+    backends.set_defaults(func=bench_backends)
+
+    translate = subparsers.add_parser("translate", help="speech-to-expression accuracy and throughput")
+    translate.add_argument("--phrases", type=int, default=200000)
+    translate.add_argument("-v", "--verbose", action="store_true", help="list the phrases translated wrongly")
+    translate.set_defaults(func=bench_translate)
+
+    recognize = subparsers.add_parser("recognize", help="end-to-end recognition latency over WAV fixtures")
+    recognize.add_argument("fixtures", help="directory of 16-bit mono .wav files, each with an optional .txt")
+    recognize.add_argument("--recognizer", choices=["google", "vosk"], help="default: as the app would pick")
+    recognize.add_argument("--chunk-ms", type=int, default=100)
+    recognize.add_argument("--no-realtime", dest="realtime", action="store_false",
+                           help="feed audio as fast as the recognizer takes it")
+    recognize.add_argument("--grammar", action="store_true", help="limit vosk to the calculator's vocabulary")
+    recognize.set_defaults(func=bench_recognize)
+
+    capture = subparsers.add_parser("capture", help="voice activity segmentation of the audio capture")
+    capture.add_argument("--fixtures", help="directory of .wav files to segment after the synthetic audio")
+    capture.add_argument("--bursts", type=int, default=40)
+    capture.add_argument("--noise", type=float, default=60, help="RMS of the background noise")
+    capture.add_argument("--loudness", type=float, default=3000, help="peak amplitude of the bursts")
+    capture.add_argument("--sample-rate", type=int, default=16000)
+    capture.add_argument("--chunk-ms", type=int, default=30)
+    capture.set_defaults(func=bench_capture)
+
+    job_queue = subparsers.add_parser("jobs", help="job queue round trips, cancellation and UI thread stalls")
+    job_queue.add_argument("--expressions", type=int, default=20000)
+    job_queue.add_argument("--max-pending", type=int, default=64)
+    job_queue.add_argument("--poll-ms", type=int, default=10)
+    job_queue.add_argument("--utterances", type=int, default=4)
+    job_queue.add_argument("--recognizer", choices=["google", "vosk"], help="default: as the app would pick")
+    job_queue.add_argument("--sample-rate", type=int, default=16000)
+    job_queue.set_defaults(func=bench_jobs)
+
+    history = subparsers.add_parser("history", help="history inserts, migration and replay")
+    history.add_argument("--inserts", type=int, default=2000, help="calculations inserted one by one")
+    history.add_argument("--rows", type=int, default=200000, help="calculations in the migrated and replayed history")
+    history.add_argument("--last", type=int, nargs="+", default=[100, 10000, 100000], help="replay sizes")
+    history.set_defaults(func=bench_history)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
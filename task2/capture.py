@@ -0,0 +1,360 @@
+"""A microphone that stays open, cut into utterances as it listens.
+
+AudioCapture reads its source on a background thread for as long as the app
+runs, so pressing the button (or waiting for the next command) costs no device
+setup and no calibration pause. Every chunk goes into a ring buffer with its
+energy. An energy voice activity detector compares each chunk against the noise
+floor: speech starts after START_SECONDS above the threshold, with PRE_ROLL
+seconds from the ring buffer in front so the first syllable isn't clipped, and
+ends after PAUSE_SECONDS below it or at MAX_UTTERANCE.
+
+The noise floor is a low percentile of the energies in the ring buffer,
+recomputed every REFRESH_SECONDS so it follows the room. It is saved to
+CALIBRATION_CACHE, and a fresh enough saved value is used straight away at the
+next start instead of calibrating from the first second of audio.
+
+Consumers subscribe and get each utterance as a stream of chunks while it is
+still being spoken, which is what a streaming recognizer wants:
+
+    with capture.subscribe() as subscription:
+        text = recognizer.transcribe(subscription.utterance(timeout=5), capture.sample_rate)
+
+FileSource plays WAV files in place of the microphone ($AUDIO_SOURCE), for
+fixtures and for running without a sound card.
+
+The assistant (task3) imports this module from here rather than keeping a copy.
+"""
+import json
+import logging
+import math
+import operator
+import os
+import queue
+import sys
+import threading
+import time
+import wave
+from array import array
+from collections import deque, namedtuple
+
+from recognizers import SAMPLE_RATE, SAMPLE_WIDTH, ListenTimeout
+
+CHUNK_SECONDS = 0.03
+RING_SECONDS = 10
+PRE_ROLL = 0.3
+START_SECONDS = 0.06
+PAUSE_SECONDS = 0.8
+MAX_UTTERANCE = 15
+# Speech is this many times the RMS of the noise floor (about 10 dB), and never below MIN_THRESHOLD
+THRESHOLD_RATIO = 3.0
+MIN_THRESHOLD = 150
+# The noise floor is this percentile of the ring buffer's chunk energies; speech rarely fills 80% of it
+NOISE_PERCENTILE = 20
+CALIBRATION_SECONDS = 1
+REFRESH_SECONDS = 30
+# Kept next to this module wherever the app is started from; the calculator and the
+# assistant listen on the same microphone, so they share it
+CALIBRATION_CACHE = os.environ.get("CALIBRATION_CACHE",
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration.json"))
+# A saved noise floor older than this is measured again
+CALIBRATION_MAX_AGE = 24 * 60 * 60
+
+# Markers in a subscription's queue between the chunks of utterances
+_START, _END, _CLOSED = object(), object(), object()
+
+Chunk = namedtuple("Chunk", "time pcm energy")
+
+
+def rms(pcm):
+    """Root mean square of 16-bit little-endian samples"""
+    samples = array("h", pcm)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(map(operator.mul, samples, samples)) / len(samples))
+
+
+class MicrophoneSource:
+    """The default microphone through speech_recognition, opened once"""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS, device_index=None):
+        import speech_recognition as sr
+
+        self.name = f"microphone:{device_index if device_index is not None else 'default'}"
+        self.sample_rate = sample_rate
+        self._microphone = sr.Microphone(device_index=device_index, sample_rate=sample_rate,
+                                         chunk_size=int(sample_rate * chunk_seconds))
+        self._stream = self._microphone.__enter__().stream
+
+    def read(self):
+        return self._stream.read(self._microphone.CHUNK)
+
+    def close(self):
+        self._microphone.__exit__(None, None, None)
+
+
+class FileSource:
+    """16-bit mono WAV files (paths or file objects) played as if from a microphone.
+
+    With realtime, chunks come no faster than they would be spoken. silence
+    seconds of silence follow each file so its last utterance can end. read()
+    returns b"" when everything has been played.
+    """
+
+    def __init__(self, *files, chunk_seconds=CHUNK_SECONDS, realtime=True, silence=1.0):
+        self.name = "file"
+        self.chunk_seconds = chunk_seconds
+        self.realtime = realtime
+        self._chunks = deque()
+        self.sample_rate = None
+        for file in files:
+            with wave.open(file, "rb") as wav:
+                if wav.getnchannels() != 1 or wav.getsampwidth() != SAMPLE_WIDTH:
+                    raise ValueError(f"{file}: audio must be 16-bit mono WAV")
+                if self.sample_rate not in (None, wav.getframerate()):
+                    raise ValueError(f"{file}: every file must have the same sample rate")
+                self.sample_rate = wav.getframerate()
+                frames = max(1, int(self.sample_rate * chunk_seconds))
+                pcm = wav.readframes(wav.getnframes()) + bytes(int(self.sample_rate * silence) * SAMPLE_WIDTH)
+            step = frames * SAMPLE_WIDTH
+            self._chunks.extend(pcm[i:i + step] for i in range(0, len(pcm), step))
+        self.sample_rate = self.sample_rate or SAMPLE_RATE
+        self._next = None
+
+    def read(self):
+        if not self._chunks:
+            return b""
+        chunk = self._chunks.popleft()
+        if self.realtime:
+            now = time.monotonic()
+            self._next = max(self._next or now, now - self.chunk_seconds)
+            if self._next > now:
+                time.sleep(self._next - now)
+            self._next += len(chunk) / SAMPLE_WIDTH / self.sample_rate
+        return chunk
+
+    def close(self):
+        self._chunks.clear()
+
+
+def open_source(name=None):
+    """$AUDIO_SOURCE (WAV files separated by os.pathsep) if set, else the microphone"""
+    name = name or os.environ.get("AUDIO_SOURCE")
+    if name:
+        return FileSource(*name.split(os.pathsep))
+    return MicrophoneSource()
+
+
+class Subscription:
+    """Utterances from an AudioCapture, from the moment of subscribing until closed"""
+
+    def __init__(self, capture):
+        self._capture = capture
+        self._queue = queue.Queue()
+
+    def utterance(self, timeout=None, max_seconds=None):
+        """Chunks of the next utterance, yielded as they are captured.
+
+        Raises ListenTimeout if nobody starts speaking within timeout seconds,
+        or the capture stops first. max_seconds cuts a long utterance short.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                item = self._queue.get(timeout=None if deadline is None else max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise ListenTimeout from None
+            if item is _START:
+                return self._chunks(max_seconds)
+            if item is _CLOSED:
+                raise ListenTimeout
+
+    def _chunks(self, max_seconds):
+        limit = None if max_seconds is None else max_seconds * self._capture.sample_rate * SAMPLE_WIDTH
+        length = 0
+        while True:
+            item = self._queue.get()
+            if item is _END or item is _CLOSED:
+                return
+            yield item
+            length += len(item)
+            if limit is not None and length >= limit:
+                return
+
+    def close(self):
+        """Unsubscribe; an utterance() waiting in another thread gives up"""
+        self._capture.unsubscribe(self)
+        self._queue.put(_CLOSED)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AudioCapture:
+    """Reads a source on a background thread and hands out its utterances to subscribers"""
+
+    def __init__(self, source, ring_seconds=RING_SECONDS, pre_roll=PRE_ROLL, pause=PAUSE_SECONDS,
+                 max_utterance=MAX_UTTERANCE, refresh=REFRESH_SECONDS, cache=CALIBRATION_CACHE):
+        self.source = source
+        self.sample_rate = source.sample_rate
+        self.pause = pause
+        self.max_utterance = max_utterance
+        self.pre_roll = pre_roll
+        self.refresh = refresh
+        self.cache = cache
+        self.ring = deque()
+        self.ring_seconds = ring_seconds
+        self.noise = None
+        self.threshold = None
+        self.utterances = 0
+        self._calibrated_at = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        # Seconds of audio read, the capture's own clock, and where on it the current utterance began
+        self.clock = 0.0
+        self.speech_start = None
+        self._speech = None
+        self._above = self._below = 0.0
+        self._load_calibration()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop reading, close the source and end every subscription"""
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+        self.source.close()
+
+    def join(self, timeout=None):
+        """Wait until the source runs out (a FileSource) or the capture is stopped"""
+        self._thread.join(timeout)
+
+    def subscribe(self):
+        subscription = Subscription(self)
+        with self._lock:
+            self._subscribers.append(subscription)
+        if self._stopped.is_set():
+            subscription._queue.put(_CLOSED)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stopped.is_set()
+
+    @property
+    def speaking(self):
+        return self._speech is not None
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                pcm = self.source.read()
+                if not pcm:
+                    break
+                self.feed(pcm)
+        except Exception:
+            logging.exception("Audio capture stopped")
+        finally:
+            self._stopped.set()
+            self._end_speech()
+            self._publish(_CLOSED)
+            self._save_calibration()
+
+    def feed(self, pcm):
+        """Process one chunk of audio; the capture thread calls this for each chunk it reads"""
+        seconds = len(pcm) / SAMPLE_WIDTH / self.sample_rate
+        chunk = Chunk(self.clock, pcm, rms(pcm))
+        self.clock += seconds
+        self.ring.append(chunk)
+        while self.clock - self.ring[0].time > self.ring_seconds:
+            self.ring.popleft()
+
+        if self.threshold is None or self.clock - self._calibrated_at >= self.refresh:
+            if self.threshold is None and self.clock < CALIBRATION_SECONDS:
+                return
+            self._calibrate()
+
+        loud = chunk.energy > self.threshold
+        if self._speech is None:
+            self._above = self._above + seconds if loud else 0.0
+            if self._above >= START_SECONDS:
+                self._start_speech()
+            return
+        self._publish(pcm)
+        self._speech += seconds
+        self._below = 0.0 if loud else self._below + seconds
+        if self._below >= self.pause or self._speech >= self.max_utterance:
+            self._end_speech()
+
+    def _start_speech(self):
+        self.utterances += 1
+        start = self.clock - self._above - self.pre_roll
+        pre_roll = [chunk.pcm for chunk in self.ring if chunk.time >= start]
+        self.speech_start = max(start, self.ring[0].time)
+        self._speech = len(b"".join(pre_roll)) / SAMPLE_WIDTH / self.sample_rate
+        self._below = 0.0
+        self._publish(_START)
+        for pcm in pre_roll:
+            self._publish(pcm)
+
+    def _end_speech(self):
+        if self._speech is not None:
+            self._speech = None
+            self._above = 0.0
+            self._publish(_END)
+
+    def _publish(self, item):
+        with self._lock:
+            for subscription in self._subscribers:
+                subscription._queue.put(item)
+
+    def _calibrate(self):
+        """Noise floor from the quieter chunks in the ring buffer"""
+        energies = sorted(chunk.energy for chunk in self.ring)
+        self.noise = energies[int(len(energies) * NOISE_PERCENTILE / 100)]
+        self.threshold = max(MIN_THRESHOLD, self.noise * THRESHOLD_RATIO)
+        if self._calibrated_at is not None:
+            self._save_calibration()
+        self._calibrated_at = self.clock
+
+    def _load_calibration(self):
+        """Start from the saved noise floor of this source, if it is recent"""
+        try:
+            with open(self.cache) as f:
+                saved = json.load(f)[self.source.name]
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        if time.time() - saved["time"] < CALIBRATION_MAX_AGE:
+            self.noise = saved["noise"]
+            self.threshold = max(MIN_THRESHOLD, self.noise * THRESHOLD_RATIO)
+            self._calibrated_at = 0.0
+
+    def _save_calibration(self):
+        if self.cache is None or self.noise is None:
+            return
+        try:
+            with open(self.cache) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+        saved[self.source.name] = {"noise": self.noise, "time": time.time()}
+        try:
+            with open(self.cache, "w") as f:
+                json.dump(saved, f)
+        except OSError as e:
+            logging.warning("Could not save the microphone calibration: %s", e)
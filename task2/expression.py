@@ -0,0 +1,507 @@
+"""Safe arithmetic for the speech calculator, without eval.
+
+An expression is tokenized and compiled in a single pass by an operator
+precedence parser, a loop over the tokens with a stack of pending operators:
+constant subexpressions are worked out as they are reduced, and whatever
+depends on a variable becomes a closure, one per run of operators applied to
+the same left operand. (parse() gives the same parser's AST of tuples instead.) Compiled expressions are kept in an LRU
+cache keyed on their text, so a repeated expression costs only the closure
+calls. The grammar is the calculator's: numbers (with optional
+exponent), + - * / % ** and parentheses, with Python's precedence, plus named
+variables for templates such as "price * (1 + rate)".
+
+Numbers are evaluated by one of the BACKENDS:
+
+    float     ints and floats, like eval (the default)
+    decimal   decimal.Decimal in the current decimal context
+    fraction  fractions.Fraction, exact
+    numpy     float64; variables may be arrays and are broadcast together
+
+evaluate_many turns a list of expressions into templates ("12 + 7" and
+"3 + 4.5" are both "# + #"), so a whole log of calculations is a handful of
+compilations, and with the numpy backend a handful of vectorized evaluations.
+"""
+import math
+import operator
+import re
+from contextlib import nullcontext
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache
+
+CACHE_SIZE = 4096
+# Limits that keep a hostile display string from tying up the GUI
+MAX_LENGTH = 10000
+# Operators and parentheses left open at once; "(1 + (2 + (..." holds two a level, so about 100 levels
+MAX_DEPTH = 200
+# Largest exact power worked out, in decimal digits; Python refuses to print ints over 4300 digits
+MAX_DIGITS = 4000
+# Decimal powers are rounded to the context's precision, so for them only the exponent is limited
+MAX_EXPONENT = 10000
+
+_NUMBER = re.compile(r"(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_VALID = re.compile(rf"{_NUMBER.pattern}|\*\*|[-+*/%()]|[A-Za-z_]\w*")
+# A valid token or any other single character, which the parser reports as unexpected
+_TOKEN = re.compile(rf"\s*({_VALID.pattern}|\S)")
+
+# Left binding power of each binary operator; ** is right-associative
+BINARY = {"+": 10, "-": 10, "*": 20, "/": 20, "%": 20, "**": 40}
+UNARY = 30
+RIGHT_ASSOCIATIVE = {"**"}
+# Binding power of everything the parser keeps on its operator stack; "(" has none
+_POWER = dict(BINARY, neg=UNARY, pos=UNARY)
+_UNARY = {"-": "neg", "+": "pos"}
+# Left in a template only by a name, which can't go through the template path
+_NAME_CHARACTER = re.compile(r"[A-Za-z_]")
+# Text between numbers and the numbers, alternately
+_SPLIT = re.compile(f"({_NUMBER.pattern})")
+# Float templates shared by this many expressions are run on float64 columns
+VECTORIZE_MIN = 32
+_NUMBER_START = frozenset("0123456789.")
+_NAME_START = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_")
+
+
+class ExpressionError(ValueError):
+    """The text is not a valid arithmetic expression"""
+
+    def __init__(self, message, position=None):
+        super().__init__(message if position is None else f"{message} at position {position + 1}")
+        self.position = position
+
+
+def tokenize(expression):
+    """The tokens of an expression as strings: numbers, names and operators, whitespace dropped"""
+    if len(expression) > MAX_LENGTH:
+        raise ExpressionError(f"Expression longer than {MAX_LENGTH} characters")
+    # One findall over the whole text; positions are only worked out to report an error
+    tokens = _TOKEN.findall(expression)
+    if not all(map(_VALID.fullmatch, tokens)):
+        match = next(match for match in _TOKEN.finditer(expression) if not _VALID.fullmatch(match.group(1)))
+        raise ExpressionError(f"Unexpected {match.group(1)!r}", match.start(1))
+    return tokens
+
+
+class _Parser:
+    """Operator precedence parser building the AST of parse(); _Compiler builds compiled nodes instead"""
+
+    def __init__(self, expression):
+        if len(expression) > MAX_LENGTH:
+            raise ExpressionError(f"Expression longer than {MAX_LENGTH} characters")
+        self.text = expression
+        # Characters that aren't part of a token come through as tokens of their own and
+        # are reported where they turn up; "" marks the end
+        self.tokens = _TOKEN.findall(expression)
+        self.tokens.append("")
+
+    def parse(self):
+        operands = []
+        # Binary operators, "neg", "pos" and "(" waiting for their right side
+        operators = []
+        reduce, number, name = self.reduce, self.number, self.name
+        opened = 0
+        expect_operand = True
+        for index, token in enumerate(self.tokens):
+            if expect_operand:
+                start = token[:1]
+                # A lone "." is not a number but an unexpected character
+                if start in _NUMBER_START and token != ".":
+                    operands.append(number(token))
+                    expect_operand = False
+                    continue
+                if start in _NAME_START:
+                    operands.append(name(token))
+                    expect_operand = False
+                    continue
+                if token in _UNARY:
+                    operators.append(_UNARY[token])
+                elif token == "(":
+                    operators.append(token)
+                    opened += 1
+                elif not token:
+                    raise self.error("Incomplete expression", index)
+                else:
+                    raise self.error(f"Unexpected {token!r}", index)
+                if len(operators) > MAX_DEPTH:
+                    raise ExpressionError(f"Expression nested deeper than {MAX_DEPTH} levels")
+                continue
+
+            power = BINARY.get(token)
+            if power is not None:
+                # Apply what binds at least as tightly first; ** waits for its right side
+                right = token in RIGHT_ASSOCIATIVE
+                while operators:
+                    pending = _POWER.get(operators[-1])
+                    if pending is None or pending < power or (right and pending == power):
+                        break
+                    reduce(operators.pop(), operands)
+                operators.append(token)
+                if len(operators) > MAX_DEPTH:
+                    raise ExpressionError(f"Expression nested deeper than {MAX_DEPTH} levels")
+                expect_operand = True
+            elif token == ")" and opened:
+                while operators[-1] != "(":
+                    reduce(operators.pop(), operands)
+                operators.pop()
+                opened -= 1
+            elif opened:
+                raise self.error("Missing ')'", index)
+            elif token:
+                raise self.error(f"Unexpected {token!r}", index)
+            else:
+                while operators:
+                    reduce(operators.pop(), operands)
+                return operands[0]
+
+    def reduce(self, token, operands):
+        """Apply a pending operator to the operand(s) on top of the stack"""
+        if token in ("neg", "pos"):
+            operands[-1] = self.unary(token, operands[-1])
+        else:
+            right = operands.pop()
+            operands[-1] = self.binary(token, operands[-1], right)
+
+    def error(self, message, index):
+        """ExpressionError at the character position of token index"""
+        matches = list(_TOKEN.finditer(self.text))
+        return ExpressionError(message, matches[index].start(1) if index < len(matches) else len(self.text))
+
+    def number(self, text):
+        return ("number", text)
+
+    def name(self, text):
+        return ("name", text)
+
+    def unary(self, kind, operand):
+        return (kind, operand)
+
+    def binary(self, token, left, right):
+        return (token, left, right)
+
+
+def parse(expression):
+    """AST of an expression: ("number" | "name", text), ("neg" | "pos", operand) or (operator, left, right)"""
+    return _Parser(expression).parse()
+
+
+def _number(text):
+    """int for whole numbers so results match eval's (2 + 3 is 5, not 5.0)"""
+    return int(text) if text.isdigit() else float(text)
+
+
+def _float64(text):
+    import numpy as np
+
+    return np.float64(text)
+
+
+def _array(value):
+    import numpy as np
+
+    return np.asarray(value, dtype=np.float64)
+
+
+# For each backend: how a number in the text becomes a value, and how a variable's value is converted
+BACKENDS = {
+    "float": (_number, None),
+    "decimal": (Decimal, Decimal),
+    "fraction": (Fraction, Fraction),
+    "numpy": (_float64, _array),
+}
+# Decimal arithmetic depends on the context at the time, so it can't be done ahead
+_NO_FOLDING = {"decimal"}
+_LOG10_2 = math.log10(2)
+
+
+def _digits(value):
+    """A lower bound on the decimal digits of an int, or of a Fraction's numerator or denominator"""
+    if isinstance(value, Fraction):
+        return max(_digits(value.numerator), _digits(value.denominator))
+    return (abs(value).bit_length() - 1) * _LOG10_2
+
+
+def _power(base, exponent):
+    # Exact types would work out every digit of a huge power (floats just overflow), so
+    # the size of the result is estimated from the operands before it is computed
+    if isinstance(base, (int, Fraction)) and isinstance(exponent, (int, Fraction)):
+        # int ** negative int is a float; a fractional exponent gives a float too
+        exact = exponent.denominator == 1 and (exponent >= 0 or isinstance(base, Fraction)
+                                               or isinstance(exponent, Fraction))
+        if exact and abs(exponent) * _digits(base) > MAX_DIGITS:
+            raise ExpressionError(f"Result would have more than {MAX_DIGITS} digits")
+    elif isinstance(base, Decimal) and isinstance(exponent, Decimal) and abs(exponent) > MAX_EXPONENT \
+            and abs(base) > 1:
+        raise ExpressionError(f"Exponent larger than {MAX_EXPONENT}")
+    return base ** exponent
+
+
+OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "%": operator.mod,
+    "**": _power,
+}
+
+
+class _Compiler(_Parser):
+    """The parser compiling as it goes, with no AST in between.
+
+    Each node comes out as its value when it is constant, or as a function of
+    the variables (the only callables, as no number type is one). Constants are
+    folded on the spot unless the backend can't fold.
+    """
+
+    def __init__(self, expression, number, fold):
+        super().__init__(expression)
+        self.convert = number
+        self.fold = fold
+        self.used = set()
+
+    def number(self, text):
+        try:
+            return self.convert(text)
+        except ValueError:
+            # int() and Fraction() refuse numbers of over 4300 digits
+            raise ExpressionError("Number has too many digits") from None
+
+    def name(self, text):
+        self.used.add(text)
+        return operator.itemgetter(text)
+
+    def unary(self, kind, operand):
+        if kind == "pos":
+            return operand
+        if not callable(operand):
+            if self.fold:
+                return -operand
+            return lambda variables: -operand
+        return lambda variables: -operand(variables)
+
+    def binary(self, token, left, right):
+        op = OPERATORS[token]
+        variable = callable(right)
+        if self.fold and not variable and not callable(left):
+            try:
+                return op(left, right)
+            except (ArithmeticError, ExpressionError):
+                # Raise when evaluated, so the compiled expression can still be cached
+                pass
+        # A run such as "x + 1 - y * 2 + ..." is one closure applying its operations in
+        # turn, not a closure per operator nested as deep as the run is long. The run on
+        # the left is only ever used here, so it is extended in place.
+        operations = getattr(left, "operations", None)
+        if operations is not None:
+            operations.append((op, variable, right))
+            return left
+        operations = [(op, variable, right)]
+        first = left if callable(left) else (lambda variables: left)
+
+        def run(variables):
+            value = first(variables)
+            for op, variable, operand in operations:
+                value = op(value, operand(variables) if variable else operand)
+            return value
+        run.operations = operations
+        return run
+
+
+def _errstate(backend):
+    """With numpy, division by zero gives inf or nan per element instead of a warning"""
+    if backend != "numpy":
+        return nullcontext()
+    import numpy as np
+
+    return np.errstate(divide="ignore", invalid="ignore", over="ignore")
+
+
+class Expression:
+    """A parsed and compiled expression; call it with its variables to evaluate"""
+
+    __slots__ = ("text", "backend", "variables", "_function", "_convert")
+
+    def __init__(self, text, backend="float"):
+        try:
+            number, self._convert = BACKENDS[backend]
+        except KeyError:
+            raise ValueError(f"Unknown backend {backend!r}; choose from {', '.join(BACKENDS)}") from None
+        self.text = text
+        self.backend = backend
+        compiler = _Compiler(text, number, backend not in _NO_FOLDING)
+        with _errstate(backend):
+            function = compiler.parse()
+        self.variables = frozenset(compiler.used)
+        self._function = function if callable(function) else (lambda variables: function)
+
+    def __call__(self, variables=None):
+        if not self.variables:
+            return self._function(None)
+        variables = variables or {}
+        missing = self.variables.difference(variables)
+        if missing:
+            raise ExpressionError(f"No value for {', '.join(sorted(missing))}")
+        if self._convert is not None:
+            variables = {name: self._convert(variables[name]) for name in self.variables}
+        with _errstate(self.backend):
+            return self._function(variables)
+
+    def __repr__(self):
+        return f"Expression({self.text!r}, backend={self.backend!r})"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_expression(expression, backend="float"):
+    """Compiled Expression for the text; cached, so a repeated expression is only parsed once"""
+    return Expression(expression, backend)
+
+
+def evaluate(expression, variables=None, backend="float"):
+    """Value of an arithmetic expression, given a mapping of its variables.
+
+    Raises ExpressionError for text that isn't one (or a missing variable) and
+    ZeroDivisionError (or OverflowError) from the arithmetic itself.
+    """
+    return compile_expression(expression, backend)(variables)
+
+
+def evaluate_many(expressions, return_exceptions=False, backend="float"):
+    """Values of many expressions, in order.
+
+    Each distinct expression is evaluated once. The expressions are grouped by
+    template, their text with the numbers taken out ("12 + 7" and "3 + 4.5" are
+    both "# + #"), and a template shared by several of them is compiled once and
+    run on the numbers of each. For the float backend a template shared by
+    VECTORIZE_MIN or more runs on float64 columns of their numbers when that
+    gives exactly what float would (see _float_columns). The numpy backend runs
+    every template that way, so 1/0 comes out as inf instead of raising. With
+    return_exceptions, an expression that fails gives
+    its exception in place of a value; otherwise the first failure is raised.
+    """
+    if backend == "numpy":
+        return _evaluate_templates(expressions, return_exceptions)
+    distinct = list(dict.fromkeys(expressions))
+    values = [None] * len(distinct)
+    number = BACKENDS[backend][0]
+    for key, (positions, rows) in _group_templates(distinct).items():
+        template = None
+        if len(positions) > 1 and not _NAME_CHARACTER.search(key):
+            try:
+                template = compile_expression(_template_text(key), backend)
+            except ExpressionError:
+                pass
+        vectorized = None
+        if template is not None and backend == "float" and len(positions) >= VECTORIZE_MIN:
+            vectorized = _float_columns(key, rows)
+        for j, (position, row) in enumerate(zip(positions, rows)):
+            if vectorized is not None and vectorized[j] is not None:
+                values[position] = vectorized[j]
+                continue
+            if template is not None:
+                try:
+                    values[position] = template._function({f"_{i}": number(text) for i, text in enumerate(row)})
+                    continue
+                except (ValueError, ArithmeticError):
+                    # Report the failure as evaluating the expression itself does
+                    pass
+            try:
+                values[position] = compile_expression(distinct[position], backend)()
+            except (ExpressionError, ArithmeticError) as e:
+                values[position] = e
+    if not return_exceptions:
+        for value in values:
+            if isinstance(value, (ExpressionError, ArithmeticError)):
+                raise value
+    values = dict(zip(distinct, values))
+    return [values[expression] for expression in expressions]
+
+
+def _group_templates(expressions):
+    """{template: (positions in expressions, the numbers in each as text)}"""
+    groups = {}
+    for i, expression in enumerate(expressions):
+        parts = _SPLIT.split(expression)
+        key = "#".join(parts[::2])
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = ([], [])
+        group[0].append(i)
+        group[1].append(parts[1::2])
+    return groups
+
+
+def _float_columns(key, rows):
+    """Values of a template for rows of numbers, worked out in float64, or None for a row that can't be.
+
+    Those are the values the float backend gives as long as no int is rounded
+    on the way. Every sum, difference, product and remainder of the numbers of
+    a row is below the product of their magnitudes plus one, so a row where
+    that reaches 2 ** 53 is left out, as are ** templates. Any division by zero
+    or invalid operation, where float raises, makes the whole template None.
+    """
+    if "**" in key:
+        return None
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    compiled = compile_expression(_template_text(key), "numpy")
+    columns = np.array(rows, dtype=np.float64).reshape(len(rows), -1).T
+    with np.errstate(over="ignore"):
+        exact = (np.abs(columns) + 1).prod(axis=0) < 2.0 ** 53
+    if np.count_nonzero(exact) < VECTORIZE_MIN:
+        return None
+    try:
+        with np.errstate(divide="raise", invalid="raise", over="ignore", under="ignore"):
+            results = compiled._function({f"_{i}": column for i, column in enumerate(columns)})
+    except FloatingPointError:
+        return None
+    # ints in, ints out, unless something is divided
+    divides = "/" in key
+    values = []
+    for value, row, ok in zip(np.broadcast_to(results, len(rows)).tolist(), rows, exact.tolist()):
+        if not ok:
+            value = None
+        elif not divides and "".join(row).isdigit():
+            value = int(value)
+        elif not value:
+            # -(3 - 3) is the int 0 to float but -0.0 in float64, which a product keeps
+            value = None
+        values.append(value)
+    return values
+
+
+def _template_text(key):
+    """An expression with a variable _0, _1, ... in place of each # of a template"""
+    parts = key.split("#")
+    # Spaces keep placeholders apart, so "1.2.3" still fails to parse instead of becoming a name
+    return "".join(part + f" _{i} " for i, part in enumerate(parts[:-1])) + parts[-1]
+
+
+def _evaluate_templates(expressions, return_exceptions):
+    import numpy as np
+
+    results = [None] * len(expressions)
+    for key, (positions, rows) in _group_templates(expressions).items():
+        try:
+            if _NAME_CHARACTER.search(key):
+                # Names of the expression's own would mix with the placeholders
+                raise ExpressionError("Unexpected name")
+            compiled = compile_expression(_template_text(key), "numpy")
+            columns = np.array(rows, dtype=np.float64).reshape(len(rows), -1).T
+            values = compiled({f"_{i}": column for i, column in enumerate(columns)})
+            values = np.broadcast_to(values, len(positions)).tolist()
+        except ExpressionError as e:
+            # Report each expression's own error rather than the template's
+            values = []
+            for position in positions:
+                try:
+                    compile_expression(expressions[position])(None)
+                    error = e
+                except (ExpressionError, ArithmeticError) as own:
+                    error = own
+                if not return_exceptions:
+                    raise error
+                values.append(error)
+        for position, value in zip(positions, values):
+            results[position] = value
+    return results
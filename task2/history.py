@@ -0,0 +1,237 @@
+"""The calculator's history of calculations, in calculator.db.
+
+    calculation_history(id INTEGER PRIMARY KEY, created INTEGER, expression TEXT,
+                        result TEXT, backend TEXT)
+
+created is Unix time in seconds, indexed, so a time range is an index range and
+the last N calculations are the last N ids. The original table,
+calculations(timestamp TEXT, operation TEXT, result TEXT) with no key or index,
+is migrated into it the first time a database is opened and then dropped.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from expression import evaluate_many
+
+DB_NAME = "calculator.db"
+SCHEMA_VERSION = 1
+
+# In WAL mode a replay or the count in the title bar never waits for a commit to
+# finish. With synchronous=NORMAL a power cut can lose the last few calculations
+# but the file stays intact, and a commit costs no fsync.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+INSERT_CALCULATION = "INSERT INTO calculation_history (created, expression, result, backend) VALUES (?, ?, ?, ?)"
+COLUMNS = "id, created, expression, result, backend"
+# Rows a replay reads at a time; the lock is let go in between, so calculations are still logged
+REPLAY_BATCH = 10000
+
+
+def create_schema(conn):
+    """Creates calculation_history if it doesn't exist and migrates the old calculations table into it."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS calculation_history (
+            id INTEGER PRIMARY KEY,
+            created INTEGER NOT NULL,
+            expression TEXT NOT NULL,
+            result TEXT,
+            backend TEXT NOT NULL DEFAULT 'float'
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_calculation_history_created ON calculation_history(created)")
+    conn.commit()
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        migrate_calculations(conn)
+
+
+def migrate_calculations(conn):
+    """Copy the rows of the old calculations table, in order, with timestamps as Unix time, then drop it."""
+    with conn:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'calculations'").fetchone():
+            # The old timestamps are local time ("%Y-%m-%d %H:%M:%S"); 'utc' converts them
+            copied = conn.execute('''
+                INSERT INTO calculation_history (created, expression, result)
+                SELECT COALESCE(CAST(strftime('%s', timestamp, 'utc') AS INTEGER), 0), operation, result
+                FROM calculations WHERE operation IS NOT NULL ORDER BY rowid
+            ''').rowcount
+            conn.execute("DROP TABLE calculations")
+            logging.info(f"Migrated {copied} calculations to calculation_history")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def connect(db_name=DB_NAME):
+    """Open calculator.db for the writer thread and the Tk thread to share (they take turns under a lock)."""
+    conn = sqlite3.connect(db_name, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class CalculationHistory:
+    """The calculator's history, open for as long as the app runs.
+
+    log() returns straight away. A writer thread picks up each calculation, waits
+    up to max_delay seconds (or until batch_size have arrived) for any that
+    follow, and inserts them all in one transaction. flush() returns once
+    everything logged before it is in the database, and close() also stops the
+    writer. Reads only see calculations that have been written.
+    """
+
+    def __init__(self, db_name=DB_NAME, batch_size=200, max_delay=0.5, max_pending=100000):
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.written = 0
+        self.conn = connect(db_name)
+        self.lock = threading.Lock()
+        create_schema(self.conn)
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def log(self, expression, result, backend="float", created=None):
+        """Queue a calculation; created defaults to now."""
+        if self._error:
+            raise self._error
+        self._queue.put((int(time.time()) if created is None else created, expression, str(result), backend))
+
+    def flush(self):
+        """Wait until every calculation queued so far is committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+        if self._error:
+            raise self._error
+
+    def query(self, sql, params=()):
+        """Run a read on the shared connection and return all rows."""
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        """Flush queued calculations, stop the writer thread and close the connection."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self.conn.close()
+        if self._error:
+            raise self._error
+
+    def _run(self):
+        stop = False
+        while not stop:
+            rows, flushes = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.max_delay
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    flushes.append(item)
+                else:
+                    rows.append(item)
+                # close() and flush() want the rows now; otherwise give later calculations a chance to join
+                if stop or flushes or len(rows) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            # Once a write has failed the rest are dropped; log(), flush() and close() raise the error
+            if rows and self._error is None:
+                try:
+                    self._write(rows)
+                except Exception as e:
+                    logging.error(f"Could not save {len(rows)} calculations: {e!r}")
+                    self._error = e
+            for done in flushes:
+                done.set()
+
+    def _write(self, rows):
+        with self.lock, self.conn:
+            self.conn.executemany(INSERT_CALCULATION, rows)
+        self.written += len(rows)
+
+    def count(self):
+        return self.query("SELECT COUNT(*) FROM calculation_history")[0][0]
+
+    def last(self, n):
+        """The last n calculations as (id, created, expression, result, backend), oldest first."""
+        rows = self.query(f"SELECT {COLUMNS} FROM calculation_history ORDER BY id DESC LIMIT ?", (n,))
+        rows.reverse()
+        return rows
+
+    def between(self, since=None, until=None, limit=None):
+        """Calculations with since <= created < until (Unix times), oldest first."""
+        return self.query(f"SELECT {COLUMNS} FROM calculation_history WHERE created >= ? AND created < ? "
+                          f"ORDER BY created, id LIMIT ?",
+                          (since or 0, until if until is not None else 2 ** 62, -1 if limit is None else limit))
+
+    def replay(self, n=None, since=None, until=None, backend=None):
+        """Re-evaluate history in bulk: (row, value) for the last n calculations, or those in a time range.
+
+        Rows are read REPLAY_BATCH at a time, oldest first. Then the expressions
+        of each backend go through one evaluate_many call, each in the backend
+        it was calculated in unless backend is given, so float calculations that
+        share a template run on float64 columns. A failure gives its exception
+        as the value.
+        """
+        if n is not None:
+            if n <= 0:
+                return []
+            first = self.query("SELECT id FROM calculation_history ORDER BY id DESC LIMIT 1 OFFSET ?", (n - 1,))
+            rows = self._pages("id >= ?", (first[0][0] if first else 0,), n)
+        else:
+            rows = self._pages("created >= ? AND created < ?",
+                               (since or 0, until if until is not None else 2 ** 62), by_created=True)
+        backends = {backend} if backend else {row[4] for row in rows}
+        if len(backends) == 1:
+            values = evaluate_many([row[2] for row in rows], return_exceptions=True, backend=backends.pop())
+            return list(zip(rows, values))
+        groups = {}
+        for i, row in enumerate(rows):
+            groups.setdefault(row[4], []).append(i)
+        values = [None] * len(rows)
+        for group_backend, positions in groups.items():
+            results = evaluate_many([rows[i][2] for i in positions], return_exceptions=True, backend=group_backend)
+            for i, value in zip(positions, results):
+                values[i] = value
+        return list(zip(rows, values))
+
+    def _pages(self, where, params, limit=None, by_created=False):
+        """Rows matching where, oldest first, read a page of REPLAY_BATCH at a time.
+
+        Pages follow on by id, or by (created, id) with by_created, so each is
+        one index range; at most limit rows are read.
+        """
+        order = "created, id" if by_created else "id"
+        # created >= ? bounds the index range; the row value alone would not
+        after = "created >= ? AND (created, id) > (?, ?)" if by_created else "id > ?"
+        key = (-1, -1, 0) if by_created else (0,)
+        rows = []
+        while limit is None or len(rows) < limit:
+            size = REPLAY_BATCH if limit is None else min(REPLAY_BATCH, limit - len(rows))
+            page = self.query(f"SELECT {COLUMNS} FROM calculation_history WHERE {where} AND {after} "
+                              f"ORDER BY {order} LIMIT ?", params + key + (size,))
+            rows.extend(page)
+            if len(page) < size:
+                break
+            key = (page[-1][1], page[-1][1], page[-1][0]) if by_created else (page[-1][0],)
+        return rows
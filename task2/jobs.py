@@ -0,0 +1,252 @@
+"""Background jobs, so the calculator's window never waits on the microphone.
+
+A job is a function run on a worker thread. What it returns (or raises) comes
+back on the Tk thread: poll(), rescheduled every POLL_MS with root.after,
+hands finished jobs to their on_done or on_error callbacks. Tk is only touched
+from its own thread, and worker threads only ever put results on a queue.
+
+poll() also enforces each job's timeout and delivers cancellations at once,
+even while the worker is still blocked inside a recognizer; whatever the job
+returns later is thrown away. A job can't be stopped mid-call, so a job checks
+job.cancelled between its stages (job.stage() does) and registers on_cancel
+callbacks to unblock itself, such as closing its audio subscription.
+
+Each job times its stages with job.stage(name). The queue records them, with
+the time spent queued ("queued") and waiting for the Tk thread ("post"), in
+JobQueue.stats.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+
+POLL_MS = 10
+MAX_PENDING = 4
+# Stage timings kept for the percentiles
+LATENCY_WINDOW = 1000
+
+
+class JobError(Exception):
+    pass
+
+
+class QueueFull(JobError):
+    """Too many jobs are already waiting or running"""
+
+
+class Cancelled(JobError):
+    pass
+
+
+class JobTimeout(JobError):
+    pass
+
+
+class Job:
+    """A unit of work on a worker thread; function(job) does the work"""
+
+    def __init__(self, name, function, on_done, on_error, timeout):
+        self.name = name
+        self.function = function
+        self.on_done = on_done
+        self.on_error = on_error
+        self.timeout = timeout
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        # Seconds spent in each stage
+        self.timings = {}
+        self.submitted = time.perf_counter()
+        self.finished = None
+        self.error = None
+        self.delivered = False
+        self._cancelled = threading.Event()
+        self._on_cancel = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self, error=None):
+        """Stop the job at its next stage and report error (Cancelled by default) instead of its result"""
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self.error = error or Cancelled(f"{self.name} cancelled")
+            self._cancelled.set()
+            callbacks, self._on_cancel = self._on_cancel, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logging.exception(f"Error cancelling job {self.name}")
+
+    def on_cancel(self, callback):
+        """Call callback() when the job is cancelled (right away if it already is), from any thread"""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._on_cancel.append(callback)
+                return
+        callback()
+
+    def check(self):
+        """Raise the cancellation error if the job has been cancelled or timed out"""
+        if self._cancelled.is_set():
+            raise self.error
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage of the job, checking for cancellation before and after"""
+        self.check()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+        self.check()
+
+
+class LatencyStats:
+    """A sliding window of timings per stage"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.counts = {}
+        self.timings = {}
+
+    def record(self, stage, seconds):
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+        self.timings.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+
+    def snapshot(self):
+        """{stage: {"count", "p50_ms", "p99_ms"}}"""
+        stages = {}
+        for stage, timings in self.timings.items():
+            ordered = sorted(timings)
+            stages[stage] = {"count": self.counts[stage],
+                             "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+                             "p99_ms": round(ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)] * 1000, 3)}
+        return stages
+
+
+class JobQueue:
+    """Worker threads for jobs, with results delivered on the Tk thread.
+
+    With a Tk root, poll() keeps itself scheduled with root.after; without one
+    the owner must call poll() itself. At most max_pending jobs may be queued
+    or running at once; submit() raises QueueFull beyond that.
+    """
+
+    def __init__(self, root=None, workers=1, max_pending=MAX_PENDING, poll_ms=POLL_MS):
+        self.root = root
+        self.max_pending = max_pending
+        self.poll_ms = poll_ms
+        self.stats = LatencyStats()
+        self._jobs = queue.Queue()
+        # Callables to run on the Tk thread
+        self._results = queue.Queue()
+        self._active = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._workers = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+        if root is not None:
+            root.after(poll_ms, self._schedule)
+
+    @property
+    def pending(self):
+        return len(self._active)
+
+    def submit(self, name, function, on_done=None, on_error=None, timeout=None):
+        """Queue function(job) to run on a worker; returns the Job"""
+        job = Job(name, function, on_done, on_error, timeout)
+        with self._lock:
+            if self._closed:
+                raise JobError("The job queue has been shut down")
+            if len(self._active) >= self.max_pending:
+                raise QueueFull(f"{len(self._active)} jobs already pending")
+            self._active.append(job)
+        self._jobs.put(job)
+        return job
+
+    def post(self, callback, *args):
+        """Run callback(*args) on the Tk thread at the next poll; safe from any thread"""
+        self._results.put(partial(callback, *args))
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            job.timings["queued"] = time.perf_counter() - job.submitted
+            try:
+                job.check()
+                result, error = job.function(job), None
+                job.check()
+            except Exception as e:
+                result, error = None, e
+            job.finished = time.perf_counter()
+            self._results.put(partial(self._finish, job, result, error))
+
+    def _finish(self, job, result, error):
+        if job.delivered or job.cancelled:
+            # Cancelled or timed out while it ran; poll() reports that instead
+            return
+        job.timings["post"] = time.perf_counter() - job.finished
+        self._deliver(job, result, error)
+
+    def poll(self):
+        """Deliver finished jobs, cancellations and timeouts; call on the Tk thread"""
+        now = time.monotonic()
+        for job in list(self._active):
+            if not job.cancelled and job.deadline is not None and now > job.deadline:
+                job.cancel(JobTimeout(f"{job.name} took longer than {job.timeout} s"))
+            if job.cancelled:
+                self._results.put(partial(self._deliver, job, None, job.error))
+        # Only what is there now, so a worker posting nonstop can't keep Tk from drawing
+        for _ in range(self._results.qsize()):
+            try:
+                callback = self._results.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                callback()
+            except Exception:
+                logging.exception("Error in job callback")
+
+    def _schedule(self):
+        self.poll()
+        if not self._closed:
+            self.root.after(self.poll_ms, self._schedule)
+
+    def _deliver(self, job, result, error):
+        if job.delivered:
+            return
+        job.delivered = True
+        with self._lock:
+            self._active.remove(job)
+        # A copy, as a cancelled job's worker may still be timing a stage
+        timings = dict(job.timings, total=time.perf_counter() - job.submitted)
+        for stage, seconds in timings.items():
+            self.stats.record(f"{job.name} {stage}", seconds)
+        logging.info(f"Job {job.name} {'failed: ' + repr(error) if error else 'done'} ("
+                     + ", ".join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in timings.items()) + ")")
+        callback, value = (job.on_error, error) if error is not None else (job.on_done, result)
+        if callback is not None:
+            callback(value)
+        elif error is not None:
+            logging.error(f"Job {job.name} failed: {error!r}")
+
+    def shutdown(self):
+        """Cancel every job and stop the workers; results not yet delivered are dropped"""
+        with self._lock:
+            self._closed = True
+            active = list(self._active)
+        for job in active:
+            job.cancel()
+        for _ in self._workers:
+            self._jobs.put(None)
@@ -0,0 +1,175 @@
+"""Speech recognizers behind one interface, for the calculator and the assistant.
+
+    google  speech_recognition's recognize_google: one network request per
+            utterance, after speech_recognition has heard pause_threshold of silence
+    vosk    offline and CPU-only (pip install vosk, plus a model from
+            https://alphacephei.com/vosk/models unpacked to $VOSK_MODEL or ./model).
+            Audio is decoded while it arrives, partial text comes back as the
+            user speaks and the utterance ends when the model hears it end.
+
+get_recognizer() picks $SPEECH_RECOGNIZER, or vosk when it is installed with a
+model, or google. Audio is 16-bit mono PCM bytes throughout.
+
+The assistant (task3) imports this module from here rather than keeping a copy.
+"""
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from functools import lru_cache
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+VOSK_MODEL = os.environ.get("VOSK_MODEL", "model")
+
+# A hypothesis for the audio so far (final False) or the text of a finished utterance
+Result = namedtuple("Result", "text final")
+
+
+class RecognitionError(Exception):
+    """The recognizer can't be used: package or model missing, or the service is down"""
+
+
+class ListenTimeout(Exception):
+    """Nobody started speaking before the timeout"""
+
+
+class Recognizer(ABC):
+    """Base for the backends: each one streams chunks of audio to text"""
+
+    name = None
+
+    @abstractmethod
+    def stream(self, chunks, sample_rate=SAMPLE_RATE):
+        """Yield Results as chunks of PCM arrive: partial text, then the final text of each utterance"""
+
+    def recognize(self, pcm, sample_rate=SAMPLE_RATE):
+        """Text of a recorded utterance, "" if nothing was understood"""
+        return " ".join(result.text for result in self.stream([pcm], sample_rate) if result.final)
+
+    def transcribe(self, chunks, sample_rate=SAMPLE_RATE, on_partial=None):
+        """Text of an utterance streamed as chunks, e.g. from capture.Subscription.utterance().
+
+        on_partial(text) is called with each partial result as the audio arrives.
+        """
+        texts = []
+        for result in self.stream(chunks, sample_rate):
+            if result.final:
+                texts.append(result.text)
+            elif on_partial:
+                on_partial(result.text)
+        return " ".join(texts)
+
+
+class GoogleRecognizer(Recognizer):
+    """Google's web speech API through speech_recognition.
+
+    settings are speech_recognition.Recognizer attributes (energy_threshold,
+    pause_threshold, ...); Google takes no grammar.
+    """
+
+    name = "google"
+
+    def __init__(self, language="en-US", grammar=None, **settings):
+        import speech_recognition as sr
+
+        self._sr = sr
+        self.language = language
+        self.recognizer = sr.Recognizer()
+        for setting, value in settings.items():
+            setattr(self.recognizer, setting, value)
+
+    def stream(self, chunks, sample_rate=SAMPLE_RATE):
+        # No partial results: the whole utterance is one request once the audio ends
+        yield Result(self.recognize(b"".join(chunks), sample_rate), True)
+
+    def recognize(self, pcm, sample_rate=SAMPLE_RATE):
+        audio = self._sr.AudioData(pcm, sample_rate, SAMPLE_WIDTH)
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language).lower()
+        except self._sr.UnknownValueError:
+            return ""
+        except self._sr.RequestError as e:
+            raise RecognitionError(f"Speech service unavailable: {e}") from e
+
+
+@lru_cache(maxsize=2)
+def _vosk_model(path):
+    """Models take seconds to load, so each is loaded once"""
+    import vosk
+
+    return vosk.Model(path)
+
+
+class VoskRecognizer(Recognizer):
+    """Offline streaming recognition with Vosk.
+
+    grammar, a list of words or phrases, restricts what the model may hear; a
+    small vocabulary such as the calculator's decodes faster and more accurately.
+    settings only apply to the google backend and are ignored.
+    """
+
+    name = "vosk"
+
+    def __init__(self, model_path=VOSK_MODEL, grammar=None, **settings):
+        try:
+            import vosk
+        except ImportError:
+            raise RecognitionError("Offline recognition needs vosk (pip install vosk)") from None
+        if not os.path.isdir(model_path):
+            raise RecognitionError(f"No Vosk model at {model_path!r}; download one from "
+                                   f"https://alphacephei.com/vosk/models and set VOSK_MODEL")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = _vosk_model(os.path.abspath(model_path))
+        # "[unk]" lets the model say it heard something outside the grammar instead of forcing a match
+        self.grammar = json.dumps(sorted(grammar) + ["[unk]"]) if grammar else None
+
+    def stream(self, chunks, sample_rate=SAMPLE_RATE):
+        if self.grammar:
+            recognizer = self._vosk.KaldiRecognizer(self.model, sample_rate, self.grammar)
+        else:
+            recognizer = self._vosk.KaldiRecognizer(self.model, sample_rate)
+        partial = ""
+        for chunk in chunks:
+            if recognizer.AcceptWaveform(chunk):
+                partial = ""
+                text = self._text(recognizer.Result(), "text")
+                if text:
+                    yield Result(text, True)
+            else:
+                text = self._text(recognizer.PartialResult(), "partial")
+                if text != partial:
+                    partial = text
+                    yield Result(text, False)
+        text = self._text(recognizer.FinalResult(), "text")
+        if text:
+            yield Result(text, True)
+
+    @staticmethod
+    def _text(result, key):
+        return " ".join(word for word in json.loads(result)[key].split() if word != "[unk]")
+
+
+RECOGNIZERS = {"google": GoogleRecognizer, "vosk": VoskRecognizer}
+
+
+def get_recognizer(name=None, grammar=None, **settings):
+    """The named recognizer (or $SPEECH_RECOGNIZER), else vosk if it can be used, else google.
+
+    grammar is the vocabulary for engines that can be restricted to one;
+    settings are passed to the google backend's speech_recognition.Recognizer.
+    """
+    name = name or os.environ.get("SPEECH_RECOGNIZER")
+    if name:
+        try:
+            backend = RECOGNIZERS[name]
+        except KeyError:
+            raise ValueError(f"Unknown recognizer {name!r}; choose from {', '.join(RECOGNIZERS)}") from None
+        return backend(grammar=grammar, **settings)
+    try:
+        return VoskRecognizer(grammar=grammar)
+    except RecognitionError as e:
+        logging.info("Using Google speech recognition: %s", e)
+        return GoogleRecognizer(**settings)
@@ -0,0 +1,47 @@
+"""Phrases as a recognizer hands them over, for the translator's benchmark and tests."""
+
+# Recognizer output and the expression it should become
+SPEECH_CORPUS = [
+    ("five plus three", "5+3"),
+    ("5 + 3", "5+3"),
+    ("ten divided by two", "10/2"),
+    ("two multiplied by three", "2*3"),
+    ("multiply six by seven", "6*7"),
+    ("divide 10 by four", "10/4"),
+    ("add two and three", "2+3"),
+    ("eight times nine", "8*9"),
+    ("nine minus four", "9-4"),
+    ("eighteen plus ninety", "18+90"),
+    ("seventy seven minus seven", "77-7"),
+    ("twenty three times four", "23*4"),
+    ("twenty-three plus seven", "23+7"),
+    ("one hundred and five minus six", "105-6"),
+    ("twenty three thousand divided by four", "23000/4"),
+    ("one million two hundred thousand three hundred and forty five", "1200345"),
+    ("two crore fifty lakh", "25000000"),
+    ("a hundred times 2", "100*2"),
+    ("three point one four times two", "3.14*2"),
+    ("point five plus one", "0.5+1"),
+    ("3 point 5 times 2", "3.5*2"),
+    ("one two three plus four", "123+4"),
+    ("nineteen eighty four minus 1947", "1984-1947"),
+    ("what is 12 plus 7", "12+7"),
+    ("12 plus 7 equals", "12+7"),
+    ("23,000 divided by 4", "23000/4"),
+    ("5 x 3", "5*3"),
+    ("fifty five into ten", "55*10"),
+    ("100 mod 7", "100%7"),
+    ("2 to the power of 10", "2**10"),
+    ("two raised to the power of eight", "2**8"),
+    ("seven squared plus one", "7**2+1"),
+    ("three cubed", "3**3"),
+    ("open bracket two plus three close bracket times four", "(2+3)*4"),
+    ("negative five plus two", "-5+2"),
+    ("someone said one plus one", "1+1"),
+    ("eleven take away eleven", "11-11"),
+    ("forty over eight", "40/8"),
+    ("sixty divide by three", "60/3"),
+    ("fifteen add 5", "15+5"),
+    ("zero point zero five times 200", "0.05*200"),
+    ("ninety nine plus one", "99+1"),
+]
@@ -1,28 +1,33 @@
-import speech_recognition as sr
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
 import logging
-from datetime import datetime
-import re
 import time
+from expression import evaluate
+from history import DB_NAME, CalculationHistory
+from jobs import Cancelled, JobQueue, JobTimeout, QueueFull
+from capture import AudioCapture, open_source
+from recognizers import ListenTimeout, get_recognizer
+from translator import VOCABULARY, speech_to_expression
 
 class SpeechCalculator:
     def __init__(self):
         self.setup_logging()
         self.setup_database()
         self.setup_gui()
+        # Speech and evaluation run on workers so the window keeps responding
+        self.jobs = JobQueue(self.root, workers=2, max_pending=4)
+        self.speech_job = None
         self.setup_recognizer()
         
     def setup_recognizer(self):
-        self.recognizer = sr.Recognizer()
+        # Offline streaming recognition limited to the calculator's words when Vosk is set up, else Google
+        self.recognizer = get_recognizer(grammar=VOCABULARY, energy_threshold=4000,
+                                         dynamic_energy_threshold=True, pause_threshold=1)
+        # The microphone stays open and calibrated, so listening starts the moment the button is pressed
         try:
-            with sr.Microphone() as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)
-                self.recognizer.energy_threshold = 4000
-                self.recognizer.dynamic_energy_threshold = True
-                self.recognizer.pause_threshold = 1
+            self.capture = AudioCapture(open_source()).start()
         except Exception as e:
+            self.capture = None
             logging.error(f"Microphone setup error: {str(e)}")
             messagebox.showerror("Error", "Microphone not found")
 
@@ -34,13 +39,8 @@ class SpeechCalculator:
         )
 
     def setup_database(self):
-        self.conn = sqlite3.connect('calculator.db')
-        self.cursor = self.conn.cursor()
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS calculations
-            (timestamp TEXT, operation TEXT, result TEXT)
-        ''')
-        self.conn.commit()
+        # Calculations are committed in batches by a writer thread, not one commit per "="
+        self.history = CalculationHistory(DB_NAME)
 
     def setup_gui(self):
         self.root = tk.Tk()
@@ -67,6 +67,11 @@ class SpeechCalculator:
         #exit button
         ttk.Button(self.root, text="Exit", command=self.exit_app, style='Accent.TButton').grid(row=3, column=4, padx=2, pady=2)
 
+        # Number mode: floats like before, or exact decimal / fraction arithmetic
+        self.backend = tk.StringVar(value="float")
+        ttk.Combobox(self.root, textvariable=self.backend, values=("float", "decimal", "fraction"),
+                     state="readonly", width=8).grid(row=4, column=4, padx=2, pady=2)
+
         buttons = [
             '7', '8', '9', '/',
             '4', '5', '6', '*',
@@ -96,7 +101,10 @@ class SpeechCalculator:
             self.root.after(duration, lambda: self.status_label.config(text="Ready"))
     def exit_app(self):
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
-            self.conn.close()
+            self.jobs.shutdown()
+            if self.capture is not None:
+                self.capture.stop()
+            self.history.close()
             self.root.quit()
             self.root.destroy()
 
@@ -106,78 +114,81 @@ class SpeechCalculator:
             self.display.delete(len(current)-1, tk.END)
 
     def listen(self):
+        if self.speech_job is not None:
+            # Pressed again while listening: stop
+            self.speech_job.cancel()
+            return
+        if self.capture is None:
+            messagebox.showerror("Error", "Microphone not found")
+            return
         try:
-            with sr.Microphone() as source:
-                self.update_status("Listening...")
-                self.display.delete(0, tk.END)
-                self.display.insert(0, "Listening...")
-                
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                print("Starting to listen...")
-                
-                try:
-                    audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=5)
-                    self.update_status("Processing...")
-                    print("Processing speech...")
-                    
-                    text = self.recognizer.recognize_google(audio)
-                    print(f"Recognized: {text}")
-                    
-                    text = self.convert_speech_to_expression(text)
-                    self.display.delete(0, tk.END)
-                    self.display.insert(0, text)
-                    
-                    # Automatically calculate after recognition
-                    self.root.after(1000, self.calculate)  # Calculate after 1 second
-                    
-                    self.update_status("Success!", 2000)
-                    
-                except sr.WaitTimeoutError:
-                    self.update_status("No speech detected", 2000)
-                    self.display.delete(0, tk.END)
-                except sr.UnknownValueError:
-                    self.update_status("Could not understand audio", 2000)
-                    self.display.delete(0, tk.END)
-                    
-        except Exception as e:
-            logging.error(f"Speech recognition error: {str(e)}")
+            self.speech_job = self.jobs.submit("speech", self.hear, on_done=self.heard,
+                                               on_error=self.hearing_failed, timeout=20)
+        except QueueFull:
+            self.update_status("Busy, try again", 2000)
+            return
+        self.update_status("Listening...")
+        self.speech_btn.config(text="⏹")
+        self.display.delete(0, tk.END)
+        self.display.insert(0, "Listening...")
+        print("Starting to listen...")
+
+    def hear(self, job):
+        """Listen for an utterance and recognize it; runs on a worker thread"""
+        with self.capture.subscribe() as subscription:
+            job.on_cancel(subscription.close)
+            # Until speech starts
+            with job.stage("listen"):
+                chunks = subscription.utterance(timeout=5, max_seconds=5)
+            # While it is spoken, and the recognizer's answer after
+            with job.stage("recognize"):
+                text = self.recognizer.transcribe(chunks, self.capture.sample_rate,
+                                                  on_partial=lambda text: self.jobs.post(self.show_partial, job, text))
+        with job.stage("translate"):
+            return text, self.convert_speech_to_expression(text)
+
+    def heard(self, result):
+        self.speech_done()
+        text, expression = result
+        if not text:
+            self.update_status("Could not understand audio", 2000)
+            self.display.delete(0, tk.END)
+            return
+        print(f"Recognized: {text}")
+        self.display.delete(0, tk.END)
+        self.display.insert(0, expression)
+
+        # Automatically calculate after recognition
+        self.root.after(1000, self.calculate)  # Calculate after 1 second
+
+        self.update_status("Success!", 2000)
+
+    def hearing_failed(self, error):
+        self.speech_done()
+        self.display.delete(0, tk.END)
+        if isinstance(error, ListenTimeout):
+            self.update_status("No speech detected", 2000)
+        elif isinstance(error, Cancelled):
+            self.update_status("Ready")
+        elif isinstance(error, JobTimeout):
+            self.update_status("Speech recognition timed out", 2000)
+        else:
+            logging.error(f"Speech recognition error: {str(error)}")
             self.update_status("Microphone error", 2000)
+            messagebox.showerror("Error", f"Speech recognition error: {str(error)}")
+
+    def speech_done(self):
+        self.speech_job = None
+        self.speech_btn.config(text="🎤")
+
+    def show_partial(self, job, text):
+        """Show what a streaming recognizer has heard so far"""
+        if job is self.speech_job:
             self.display.delete(0, tk.END)
-            messagebox.showerror("Error", f"Speech recognition error: {str(e)}")
+            self.display.insert(0, self.convert_speech_to_expression(text))
 
     def convert_speech_to_expression(self, text):
-        text = text.lower()
-        
-        replacements = {
-            'plus': '+',
-            'add': '+',
-            'minus': '-',
-            'subtract': '-',
-            'times': '*',
-            'multiplied by': '*',
-            'multiply': '*',
-            'divided by': '/',
-            'divide': '/',
-            'equals': '=',
-            'equal': '=',
-            'point': '.',
-            'zero': '0',
-            'one': '1',
-            'two': '2',
-            'three': '3',
-            'four': '4',
-            'five': '5',
-            'six': '6',
-            'seven': '7',
-            'eight': '8',
-            'nine': '9'
-        }
-        
-        for word, replacement in replacements.items():
-            text = text.replace(word, replacement)
-        
-        text = re.sub(r'[^0-9+\-*/=\.]', '', text)
-        return text
+        return speech_to_expression(text)
 
     def click(self, key):
         if key == '=':
@@ -188,41 +199,44 @@ class SpeechCalculator:
             self.display.insert(0, current + key)
 
     def calculate(self):
+        expression = self.display.get().replace('=', '')
+        backend = self.backend.get()
         try:
-            expression = self.display.get().replace('=', '')
-            
-            # Check for division by zero
-            if '/0' in expression:
-                messagebox.showerror("Error", "Division by zero!")
-                self.display.delete(0, tk.END)
-                self.display.insert(0, "ERROR")
-                return
-                
-            result = eval(expression)
-            
-            logging.info(f"Calculation: {expression} = {result}")
-            
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            self.cursor.execute(
-                "INSERT INTO calculations VALUES (?, ?, ?)",
-                (timestamp, expression, str(result))
-            )
-            self.conn.commit()
-            
-            self.display.delete(0, tk.END)
-            self.display.insert(0, str(result))
-            
-        except Exception as e:
+            self.jobs.submit("evaluate", lambda job: evaluate(expression, backend=backend),
+                             on_done=lambda result: self.calculated(expression, result, backend),
+                             on_error=self.calculation_failed, timeout=5)
+        except QueueFull:
+            self.update_status("Busy, try again", 2000)
+
+    def calculated(self, expression, result, backend):
+        try:
+            text = str(result)
+        except ValueError as e:
+            # An exact result too long for Python to turn into text
+            self.calculation_failed(e)
+            return
+        logging.info(f"Calculation: {expression} = {text}")
+        self.history.log(expression, text, backend)
+
+        self.display.delete(0, tk.END)
+        self.display.insert(0, text)
+
+    def calculation_failed(self, error):
+        if isinstance(error, ZeroDivisionError):
+            messagebox.showerror("Error", "Division by zero!")
             self.display.delete(0, tk.END)
-            self.display.insert(0, "Error")
-            logging.error(f"Calculation error: {str(e)}")
-            messagebox.showerror("Error", f"Invalid calculation: {str(e)}")
+            self.display.insert(0, "ERROR")
+            return
+        self.display.delete(0, tk.END)
+        self.display.insert(0, "Error")
+        logging.error(f"Calculation error: {str(error)}")
+        messagebox.showerror("Error", f"Invalid calculation: {str(error)}")
 
     def run(self):
         self.root.mainloop()
 
     def __del__(self):
-        self.conn.close()
+        self.history.close()
 
 if __name__ == "__main__":
     calculator = SpeechCalculator()
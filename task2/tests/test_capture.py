@@ -0,0 +1,121 @@
+import io
+import random
+import wave
+
+import pytest
+
+from benchmark import synthetic_speech
+from capture import PAUSE_SECONDS, PRE_ROLL, AudioCapture, FileSource
+from recognizers import SAMPLE_RATE, SAMPLE_WIDTH, ListenTimeout
+
+CHUNK_SECONDS = 0.03
+
+
+def speech(bursts=3, seed=1):
+    """A WAV of tone bursts over room noise and the (start, end) seconds of each burst"""
+    return synthetic_speech(random.Random(seed), SAMPLE_RATE, bursts, noise=60, loudness=3000)
+
+
+def silence(seconds):
+    file = io.BytesIO()
+    with wave.open(file, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(bytes(int(seconds * SAMPLE_RATE) * SAMPLE_WIDTH))
+    file.seek(0)
+    return file
+
+
+def segment(capture, source):
+    """Feed the whole source through the detector and return the (start, end) of each utterance"""
+    found, started = [], None
+    while True:
+        pcm = source.read()
+        if not pcm:
+            return found
+        capture.feed(pcm)
+        if capture.speaking and started is None:
+            started = capture.speech_start
+        elif not capture.speaking and started is not None:
+            found.append((started, capture.clock))
+            started = None
+
+
+def test_file_source_reads_whole_chunks():
+    source = FileSource(silence(1), chunk_seconds=CHUNK_SECONDS, realtime=False, silence=0)
+    chunks = iter(source.read, b"")
+    assert all(len(chunk) == int(SAMPLE_RATE * CHUNK_SECONDS) * SAMPLE_WIDTH for chunk in list(chunks)[:-1])
+    assert source.read() == b""
+
+
+def test_file_source_rejects_stereo():
+    file = io.BytesIO()
+    with wave.open(file, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(bytes(400))
+    file.seek(0)
+    with pytest.raises(ValueError):
+        FileSource(file)
+
+
+def test_each_burst_is_one_utterance():
+    file, spans = speech()
+    source = FileSource(file, chunk_seconds=CHUNK_SECONDS, realtime=False)
+    capture = AudioCapture(source, cache=None)
+    found = segment(capture, source)
+
+    assert capture.threshold > capture.noise
+    assert len(found) == len(spans)
+    for (start, end), (found_start, found_end) in zip(spans, found):
+        # The pre-roll reaches back before the first loud chunk, and the pause runs on after the last
+        assert start - PRE_ROLL - CHUNK_SECONDS <= found_start <= start
+        assert end + PAUSE_SECONDS - CHUNK_SECONDS <= found_end <= end + PAUSE_SECONDS + 2 * CHUNK_SECONDS
+
+
+def test_silence_is_never_speech():
+    source = FileSource(silence(5), chunk_seconds=CHUNK_SECONDS, realtime=False)
+    capture = AudioCapture(source, cache=None)
+    assert segment(capture, source) == []
+    assert capture.utterances == 0
+
+
+def test_subscribers_get_each_utterance_as_chunks():
+    file, spans = speech(bursts=2)
+    capture = AudioCapture(FileSource(file, chunk_seconds=CHUNK_SECONDS, realtime=False), cache=None)
+    with capture.subscribe() as subscription:
+        capture.start()
+        lengths = [len(b"".join(subscription.utterance(timeout=5))) / SAMPLE_WIDTH / SAMPLE_RATE for _ in spans]
+        # The source has run out, so nobody else will speak
+        with pytest.raises(ListenTimeout):
+            subscription.utterance(timeout=5)
+    capture.join(5)
+
+    for (start, end), length in zip(spans, lengths):
+        assert end - start + PAUSE_SECONDS <= length <= end - start + PAUSE_SECONDS + PRE_ROLL + 3 * CHUNK_SECONDS
+
+
+def test_max_seconds_cuts_an_utterance_short():
+    file, _ = speech(bursts=1)
+    capture = AudioCapture(FileSource(file, chunk_seconds=CHUNK_SECONDS, realtime=False), cache=None)
+    with capture.subscribe() as subscription:
+        capture.start()
+        pcm = b"".join(subscription.utterance(timeout=5, max_seconds=0.2))
+    capture.stop()
+    assert 0.2 <= len(pcm) / SAMPLE_WIDTH / SAMPLE_RATE < 0.2 + CHUNK_SECONDS
+
+
+def test_calibration_is_saved_and_reused(tmp_path):
+    cache = str(tmp_path / "calibration.json")
+    file, _ = speech(bursts=1)
+    source = FileSource(file, chunk_seconds=CHUNK_SECONDS, realtime=False)
+    capture = AudioCapture(source, cache=cache).start()
+    capture.join(5)
+    assert capture.noise is not None
+
+    # The next start listens straight away instead of calibrating on its first second
+    restarted = AudioCapture(FileSource(silence(1), realtime=False), cache=cache)
+    assert restarted.noise == capture.noise
+    assert restarted.threshold == capture.threshold
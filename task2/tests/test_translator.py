@@ -0,0 +1,41 @@
+import pytest
+
+from expression import evaluate
+from speech_corpus import SPEECH_CORPUS
+from translator import VOCABULARY, speech_to_expression
+
+
+@pytest.mark.parametrize("phrase, expected", SPEECH_CORPUS)
+def test_corpus(phrase, expected):
+    assert speech_to_expression(phrase) == expected
+
+
+@pytest.mark.parametrize("phrase, expected", SPEECH_CORPUS)
+def test_corpus_expressions_evaluate(phrase, expected):
+    evaluate(speech_to_expression(phrase))
+
+
+@pytest.mark.parametrize("phrase, expected", [
+    ("", ""),
+    ("hello there", ""),
+    ("FIVE PLUS THREE", "5+3"),
+    ("one thousand and five", "1005"),
+    ("a hundred", "100"),
+    ("1,000 plus 1", "1000+1"),
+    ("twenty-three minus seven", "23-7"),
+    # "one" inside another word is not a number
+    ("anyone plus someone", "+"),
+    # "multiply" must not eat half of "multiplied by"
+    ("four multiplied by two", "4*2"),
+])
+def test_phrases(phrase, expected):
+    assert speech_to_expression(phrase) == expected
+
+
+def test_numbers_with_dropped_words_between_stay_apart():
+    assert speech_to_expression("five apples three") == "5 3"
+
+
+def test_vocabulary_covers_the_corpus_words():
+    words = {word for phrase, _ in SPEECH_CORPUS for word in phrase.replace("-", " ").split() if word.isalpha()}
+    assert words - VOCABULARY <= {"what", "is", "someone", "said", "equals"}
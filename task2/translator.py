@@ -0,0 +1,176 @@
+"""Turn recognized speech into an expression for the calculator.
+
+The text is split into words once with a single regex and read left to right in
+one pass. Operator phrases ("multiplied by", "to the power of") are looked up
+in a trie of words, longest phrase first, so "multiply" never eats half of
+"multiplied by" and "one" is never found inside "someone". Spelled-out numbers
+are read as a whole ("twenty three thousand and five" is 23005, "three point
+one four" is 3.14) and digits the recognizer already wrote pass through.
+Number words said one after another are digits ("one two" is 12), which is
+how people dictate long numbers. Anything else is dropped.
+"""
+import re
+
+UNITS = {"zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+         "nine": 9}
+TEENS = {"ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16,
+         "seventeen": 17, "eighteen": 18, "nineteen": 19}
+TENS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80,
+        "ninety": 90}
+SCALES = {"thousand": 10 ** 3, "lakh": 10 ** 5, "million": 10 ** 6, "crore": 10 ** 7, "billion": 10 ** 9}
+
+PHRASES = {
+    "+": ["plus", "add", "added to", "+"],
+    "-": ["minus", "subtract", "take away", "negative", "-"],
+    "*": ["times", "multiply", "multiply by", "multiplied by", "into", "x", "*", "×"],
+    "/": ["divide", "divide by", "divided by", "over", "/", "÷"],
+    "%": ["mod", "modulo", "modulus", "%"],
+    "**": ["to the power", "to the power of", "raised to", "raised to the power of", "power", "^", "**"],
+    "**2": ["squared"],
+    "**3": ["cubed"],
+    "(": ["open bracket", "open parenthesis", "open paren", "left bracket", "("],
+    ")": ["close bracket", "close parenthesis", "close paren", "right bracket", ")"],
+}
+
+# "multiply six by seven": a verb before its first operand, its operator said at the connective
+PREFIX_VERBS = {"multiply", "divide", "add"}
+CONNECTIVES = {"by", "and", "to"}
+
+# Words, numbers (with any thousands commas) and operator symbols, in one scan; a hyphen
+# between letters ("twenty-three") joins words rather than meaning minus, so it is skipped
+_WORD = re.compile(r"[a-z]+|\d[\d,]*(?:\.\d+)?|\.\d+|\*\*|[+*/%^()×÷]|(?<![a-z])-|-(?![a-z])")
+
+
+def _build_trie(phrases):
+    """Nested dicts keyed by word; the None key holds the symbol a phrase ending there stands for"""
+    trie = {}
+    for symbol, spoken in phrases.items():
+        for phrase in spoken:
+            node = trie
+            for word in phrase.split():
+                node = node.setdefault(word, {})
+            node[None] = symbol
+    return trie
+
+
+_TRIE = _build_trie(PHRASES)
+# Every word the translator understands, for recognizers that can be limited to a vocabulary
+VOCABULARY = frozenset(
+    [*UNITS, *TEENS, *TENS, *SCALES, "hundred", "and", "a", "point", "dot", *PREFIX_VERBS, *CONNECTIVES]
+    + [word for spoken in PHRASES.values() for phrase in spoken for word in phrase.split() if word.isalpha()])
+_NUMBER_WORDS = {**UNITS, **TEENS, **TENS}
+# Words that can start a spelled-out number, and characters that start a written one
+_NUMBER_START = set(_NUMBER_WORDS) | {"a", "point", "dot"}
+_DIGIT_START = set("0123456789.")
+
+
+def _match_phrase(words, i):
+    """(symbol, index after the phrase) for the longest operator phrase starting at words[i]"""
+    node = _TRIE.get(words[i])
+    if node is None:
+        return None, i
+    match = None, i
+    j = i + 1
+    while True:
+        if None in node:
+            match = node[None], j
+        if j == len(words) or words[j] not in node:
+            return match
+        node = node[words[j]]
+        j += 1
+
+
+def _read_number(words, i):
+    """(digits, index after the number) for a spelled-out number starting at words[i], else (None, i)"""
+    word = words[i]
+    total = current = 0
+    # What the previous word was, which decides what may follow it
+    last = None
+    j = i
+    if word == "a" and j + 1 < len(words) and (words[j + 1] == "hundred" or words[j + 1] in SCALES):
+        current, last, j = 1, "unit", j + 1
+    while j < len(words):
+        word = words[j]
+        value = _NUMBER_WORDS.get(word)
+        if value is not None:
+            if word in UNITS:
+                allowed = last in (None, "hundred", "scale", "and") or (last == "tens" and current % 10 == 0)
+                kind = "unit"
+            else:
+                allowed = last in (None, "hundred", "scale", "and")
+                kind = "teen" if word in TEENS else "tens"
+            if not allowed:
+                break
+            current += value
+            last = kind
+        elif word == "hundred" and last in ("unit", "teen", "tens") and current < 100:
+            current *= 100
+            last = "hundred"
+        elif word in SCALES and last in ("unit", "teen", "tens", "hundred"):
+            total += current * SCALES[word]
+            current = 0
+            last = "scale"
+        elif word == "and" and last in ("hundred", "scale") and j + 1 < len(words) \
+                and words[j + 1] in _NUMBER_WORDS:
+            last = "and"
+        else:
+            break
+        j += 1
+    decimals, j = _read_decimals(words, j)
+    if last is None and not decimals:
+        return None, i
+    return str(total + current) + decimals, j
+
+
+def _read_decimals(words, j):
+    """(".14", index after) for "point one four" at words[j], else ("", j)"""
+    if j < len(words) and words[j] in ("point", "dot"):
+        k = j + 1
+        while k < len(words) and (words[k] in UNITS or words[k].isdigit()):
+            k += 1
+        if k > j + 1:
+            return "." + "".join(str(UNITS.get(word, word)) for word in words[j + 1:k]), k
+    return "", j
+
+
+def speech_to_expression(text):
+    """The calculator expression for a recognized phrase, e.g. "twenty three times four" -> "23*4" """
+    words = _WORD.findall(text.lower())
+    output = []
+    previous_number = False
+    # The operator of "multiply six by seven", held until its "by"
+    pending = None
+    i = 0
+    end = len(words)
+    while i < end:
+        word = words[i]
+        if word[0] in _DIGIT_START:
+            decimals, i = _read_decimals(words, i + 1)
+            number = word.replace(",", "") + decimals
+        elif word in _NUMBER_START:
+            number, i = _read_number(words, i)
+        else:
+            number = None
+        if number is None:
+            symbol, after = _match_phrase(words, i) if word in _TRIE else (None, i)
+            if symbol is not None:
+                if after == i + 1 and word in PREFIX_VERBS and not (previous_number or output[-1:] == [")"]):
+                    pending = symbol
+                else:
+                    output.append(symbol)
+            elif pending is not None and previous_number and word in CONNECTIVES:
+                output.append(pending)
+                pending = None
+            previous_number = False
+            i = max(after, i + 1)
+            continue
+        if previous_number:
+            # Numbers said one after another are dictated digits
+            output[-1] += number
+        else:
+            if output and output[-1][-1].isdigit():
+                # Two numbers with only dropped words between: keep them apart, so it doesn't evaluate
+                output.append(" ")
+            output.append(number)
+        previous_number = True
+    return "".join(output)
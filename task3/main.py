@@ -3,13 +3,20 @@ from tkinter import scrolledtext
 import sqlite3
 import logging
 import threading
-import speech_recognition as sr
+import os
+import sys
 import pyttsx3
 from datetime import datetime
 from weather import get_weather
 from reminders import set_reminder, check_reminders
 import google.generativeai as genai  # Import Google Gemini API
 
+# The microphone capture and recognizer backends live with the speech calculator in
+# ../task2. Appended, so a module here always wins over one there of the same name.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "task2"))
+from capture import AudioCapture, open_source
+from recognizers import ListenTimeout, RecognitionError, get_recognizer
+
 # Initialize logging
 logging.basicConfig(filename='assistant.log', level=logging.INFO, format='%(asctime)s - %(message)s')
 
@@ -66,10 +73,21 @@ class VirtualAssistantApp:
         # Greet the user
         self.greet_user()
 
+        # Offline streaming recognizer if Vosk is set up, Google otherwise
+        self.recognizer = get_recognizer()
+        # One microphone for the life of the app, calibrated in the background
+        try:
+            self.capture = AudioCapture(open_source()).start()
+        except Exception as e:
+            self.capture = None
+            logging.error(f"Microphone setup error: {str(e)}")
+            self.display_output("Microphone not found. Voice commands are unavailable.")
+
         # Start voice command listener in a separate thread
-        self.listening = True
+        self.listening = self.capture is not None
         self.voice_thread = threading.Thread(target=self.voice_command_listener, daemon=True)
-        self.voice_thread.start()
+        if self.listening:
+            self.voice_thread.start()
 
     # Greet the user
     def greet_user(self):
@@ -140,7 +158,7 @@ class VirtualAssistantApp:
         elif command == "exit":
             self.display_output("Goodbye!")
             self.speak("Goodbye!")
-            self.root.quit()
+            self.shutdown()
 
         else:
             error_message = "Invalid command. Please try again."
@@ -150,6 +168,13 @@ class VirtualAssistantApp:
         # Check for due reminders
         check_reminders()
 
+    # Stop listening and close the microphone
+    def shutdown(self):
+        self.listening = False
+        if self.capture is not None:
+            self.capture.stop()
+        self.root.quit()
+
     # Display output in the text area
     def display_output(self, message):
         self.output_area.config(state='normal')
@@ -167,46 +192,52 @@ class VirtualAssistantApp:
 
     # Get voice input
     def get_voice_input(self):
-        recognizer = sr.Recognizer()
-        with sr.Microphone() as source:
+        if self.capture is None:
+            return None
+        # Subscribing only now, so the assistant doesn't hear its own prompt
+        with self.capture.subscribe() as subscription:
             try:
                 self.display_output("Listening...")
                 # self.speak("Listening...")
-                audio = recognizer.listen(source, timeout=5)  # Listen for 5 seconds
-                text = recognizer.recognize_google(audio).lower()
+                text = self.listen(subscription, timeout=5)  # Listen for 5 seconds
+                if not text:
+                    self.display_output("Sorry, I did not understand that.")
+                    self.speak("Sorry, I did not understand that.")
+                    return None
                 self.display_output(f"You said: {text}")
                 return text
-            except sr.UnknownValueError:
-                self.display_output("Sorry, I did not understand that.")
-                self.speak("Sorry, I did not understand that.")
-            except sr.RequestError:
+            except RecognitionError:
                 self.display_output("Sorry, my speech service is down.")
                 self.speak("Sorry, my speech service is down.")
-            except sr.WaitTimeoutError:
+            except ListenTimeout:
                 self.display_output("No speech detected.")
                 self.speak("No speech detected.")
         return None
 
+    def listen(self, subscription, timeout):
+        """Text of the next utterance heard by a subscription"""
+        return self.recognizer.transcribe(subscription.utterance(timeout=timeout), self.capture.sample_rate)
+
     # Voice command listener
     def voice_command_listener(self):
-        recognizer = sr.Recognizer()
-        while self.listening:
-            with sr.Microphone() as source:
+        while self.listening and self.capture is not None and self.capture.running:
+            with self.capture.subscribe() as subscription:
                 try:
                     self.display_output("Listening for a command...")
                     # self.speak("Listening for a command...")
-                    audio = recognizer.listen(source, timeout=3)  # Listen for 3 seconds
-                    command = recognizer.recognize_google(audio).lower()
-                    self.display_output(f"Voice command: {command}")
-                    self.process_command(command)
-                except sr.UnknownValueError:
-                    self.display_output("Sorry, I did not understand that.")
-                    self.speak("Sorry, I did not understand that.")
-                except sr.RequestError:
+                    command = self.listen(subscription, timeout=3)  # Listen for 3 seconds
+                except RecognitionError:
                     self.display_output("Sorry, my speech service is down.")
                     self.speak("Sorry, my speech service is down.")
-                except sr.WaitTimeoutError:
+                    continue
+                except ListenTimeout:
                     continue  # Continue listening if no speech is detected
+            if not command:
+                self.display_output("Sorry, I did not understand that.")
+                self.speak("Sorry, I did not understand that.")
+                continue
+            self.display_output(f"Voice command: {command}")
+            self.process_command(command)
 
 # Run the application
 if __name__ == "__main__":
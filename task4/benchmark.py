@@ -0,0 +1,267 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from fixture_server import FixtureServer
+
+
+def bench_crawl(args):
+    """Crawl the local fixture site and report articles per second"""
+    from crawler import Crawler
+    from frontier import Frontier
+
+    frontier = Frontier(sqlite3.connect(":memory:", check_same_thread=False))
+    with FixtureServer(articles=args.articles, latency=args.latency) as server:
+        for run in ("first", "repeat"):
+            crawler = Crawler(max_workers=args.workers, per_host=args.per_host, frontier=frontier, recheck=args.recheck,
+                              parse_workers=args.parse_workers)
+            start = time.perf_counter()
+            count = sum(1 for _ in crawler.crawl({"Technology": [server.url]}))
+            elapsed = time.perf_counter() - start
+            print(f"crawl ({run}): {count} new articles in {elapsed:.2f}s ({count / elapsed:.1f} articles/s, "
+                  f"workers={args.workers}, per_host={args.per_host}, latency={args.latency}s)")
+            print(crawler.metrics.report())
+
+
+# Filler vocabulary for synthetic bodies; keywords are mixed in sparsely
+FILLER = ("the a of and to in report said year people new time world government company "
+          "week city team game season market price share growth data service plan").split()
+CATEGORIES = ("Technology", "Business", "Sports", "Entertainment")
+KEYWORDS = ("AI", "Machine Learning", "Cybersecurity", "Blockchain", "Stock Market", "Economy", "Investing",
+            "Startups", "Football", "Cricket", "Tennis", "Olympics", "Movies", "Music", "Celebrities", "Hollywood")
+
+
+def synthetic_articles(count, words=300, seed=1):
+    rng = random.Random(seed)
+    for i in range(count):
+        body = rng.choices(FILLER, k=words)
+        for _ in range(rng.randint(0, 3)):
+            body[rng.randrange(words)] = rng.choice(KEYWORDS).lower()
+        yield {
+            "url": f"https://example.com/article/{i}",
+            "title": f"Synthetic article {i}",
+            "author": f"Reporter {i % 10}",
+            "published_date": "2024-01-01 10:00:00",
+            "content": " ".join(body),
+            "source": "https://example.com",
+            "category": CATEGORIES[i % len(CATEGORIES)],
+        }
+
+
+def build_database(db_name, count):
+    from store import NewsWriter
+
+    # Synthetic bodies are random, so skip the near-duplicate check
+    with NewsWriter(db_name, batch_size=1000, detect_duplicates=False) as writer:
+        for article in synthetic_articles(count):
+            writer.put(article)
+
+
+def bench_ingest(args):
+    """Insert synthetic articles with the batched writer and with commit-per-article"""
+    import bodies
+    from dedup import simhash
+    from store import NewsWriter, create_schema
+
+    # The parse stage computes these before articles reach the writer
+    articles = [dict(a, simhash=simhash(a["content"]), body=bodies.compress(a["content"]))
+                for a in synthetic_articles(args.articles)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "bench.db")
+        start = time.perf_counter()
+        with NewsWriter(db_name, batch_size=args.batch_size) as writer:
+            for article in articles:
+                writer.put(article)
+        elapsed = time.perf_counter() - start
+        print(f"batched writer: {args.articles} articles in {elapsed:.2f}s "
+              f"({args.articles / elapsed:.0f} articles/s, batch_size={args.batch_size}), "
+              f"bodies {sum(len(a['body']) for a in articles) / sum(len(a['content']) for a in articles):.0%} "
+              f"of their uncompressed size")
+
+        db_name = os.path.join(tmp, "baseline.db")
+        conn = sqlite3.connect(db_name)
+        create_schema(conn)
+        start = time.perf_counter()
+        for a in synthetic_articles(args.baseline):
+            conn.execute("INSERT INTO news (title, author, published_date, content, source, category, url) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (a["title"], a["author"], a["published_date"], a["content"], a["source"], a["category"], a["url"]))
+            conn.commit()
+        elapsed = time.perf_counter() - start
+        conn.close()
+        print(f"commit per article: {args.baseline} articles in {elapsed:.2f}s ({args.baseline / elapsed:.0f} articles/s)")
+
+
+def category_articles(conn, category):
+    """(title, body) of every article in a category, as the original recommend loop read them"""
+    import bodies
+
+    for title, body in conn.execute("SELECT title, body FROM news JOIN news_body ON news_body.news_id = news.id "
+                                    "WHERE category=?", (category,)):
+        yield title, bodies.decompress(body)
+
+
+def bench_recommend(args):
+    """Compare the original per-keyword scan of every body with the FTS query"""
+    import search
+
+    preferences = dict(zip(CATEGORIES, (KEYWORDS[i:i + 4] for i in range(0, len(KEYWORDS), 4))))
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "bench.db")
+        build_database(db_name, args.articles)
+        conn = sqlite3.connect(db_name)
+
+        start = time.perf_counter()
+        for category, keywords in preferences.items():
+            recommended = []
+            for title, content in category_articles(conn, category):
+                for keyword in keywords:
+                    if keyword.lower() in content.lower():
+                        recommended.append(title)
+                        break
+        scan = (time.perf_counter() - start) / len(preferences)
+
+        start = time.perf_counter()
+        for category, keywords in preferences.items():
+            search.recommend(conn, category, keywords)
+        fts = (time.perf_counter() - start) / len(preferences)
+        conn.close()
+
+    print(f"recommend over {args.articles} articles: scan {scan * 1000:.1f} ms, fts {fts * 1000:.1f} ms per category")
+
+
+def bench_match(args):
+    """Whole-word keyword counts: one regex scan per keyword vs one automaton pass per body"""
+    import re
+    from matcher import KeywordMatcher
+
+    bodies = [a["content"] for a in synthetic_articles(args.articles, words=args.words)]
+
+    patterns = [re.compile(r"\b%s\b" % re.escape(keyword.lower())) for keyword in KEYWORDS]
+    start = time.perf_counter()
+    for content in bodies:
+        {keyword: len(pattern.findall(content.lower())) for keyword, pattern in zip(KEYWORDS, patterns)}
+    loop = time.perf_counter() - start
+
+    matcher = KeywordMatcher(KEYWORDS)
+    start = time.perf_counter()
+    for content in bodies:
+        matcher.scan(content)
+    automaton = time.perf_counter() - start
+
+    print(f"match {len(KEYWORDS)} keywords over {args.articles} bodies: per-keyword {loop:.2f}s, "
+          f"aho-corasick {automaton:.2f}s")
+
+
+def bench_rank(args):
+    """TF-IDF top-k against the original keyword loop on the same corpus"""
+    from ranking import TfidfRanker
+
+    preferences = dict(zip(CATEGORIES, (KEYWORDS[i:i + 4] for i in range(0, len(KEYWORDS), 4))))
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "bench.db")
+        build_database(db_name, args.articles)
+        conn = sqlite3.connect(db_name)
+        conn.executemany("INSERT INTO clicks (news_id, clicked_at) VALUES (?, '2024-01-01 10:00:00')",
+                         [(news_id,) for news_id in range(1, args.articles, max(1, args.articles // 200))])
+        conn.commit()
+
+        start = time.perf_counter()
+        for category, keywords in preferences.items():
+            recommended = []
+            for title, content in category_articles(conn, category):
+                for keyword in keywords:
+                    if keyword.lower() in content.lower():
+                        recommended.append(title)
+                        break
+        loop = (time.perf_counter() - start) / len(preferences)
+
+        ranker = TfidfRanker(phrases=KEYWORDS)
+        start = time.perf_counter()
+        ranker.refresh(conn)
+        ranker.top_k({0: 1.0})
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for category, keywords in preferences.items():
+                ranker.recommend(conn, category, keywords, k=20)
+        ranked = (time.perf_counter() - start) / (args.repeat * len(preferences))
+        conn.close()
+
+    print(f"rank over {args.articles} articles: keyword loop {loop * 1000:.1f} ms, "
+          f"tf-idf top-20 {ranked * 1000:.1f} ms per category (initial index build {build:.2f}s)")
+
+
+def bench_dedup(args):
+    """Near-duplicate lookups: banded index vs comparing against every fingerprint"""
+    from dedup import DuplicateIndex, MAX_DISTANCE, distance
+    from store import create_schema
+
+    rng = random.Random(1)
+    conn = sqlite3.connect(":memory:")
+    create_schema(conn)
+    index = DuplicateIndex(conn)
+    index.add(conn, [(news_id, rng.getrandbits(64)) for news_id in range(args.articles)])
+    queries = [rng.getrandbits(64) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    for fingerprint in queries:
+        index.find(fingerprint)
+    banded = (time.perf_counter() - start) / len(queries)
+
+    start = time.perf_counter()
+    for fingerprint in queries[:100]:
+        any(distance(fingerprint, other) <= MAX_DISTANCE for other in index.fingerprints.values())
+    linear = (time.perf_counter() - start) / 100
+
+    print(f"dedup lookup among {args.articles} fingerprints: banded {banded * 1e6:.1f} us, linear {linear * 1e3:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="News recommender benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    crawl = subparsers.add_parser("crawl", help="articles/second against the local fixture site")
+    crawl.add_argument("--articles", type=int, default=200)
+    crawl.add_argument("--latency", type=float, default=0.05, help="simulated server latency per request")
+    crawl.add_argument("--workers", type=int, default=16)
+    crawl.add_argument("--per-host", type=int, default=8)
+    crawl.add_argument("--parse-workers", type=int, default=None, help="parse processes (default: one per CPU)")
+    crawl.add_argument("--recheck", action="store_true", help="revalidate known articles on the repeat crawl")
+    crawl.set_defaults(func=bench_crawl)
+
+    ingest = subparsers.add_parser("ingest", help="insert rate of the batched writer vs commit-per-article")
+    ingest.add_argument("--articles", type=int, default=100000)
+    ingest.add_argument("--batch-size", type=int, default=500)
+    ingest.add_argument("--baseline", type=int, default=2000, help="articles for the commit-per-article run")
+    ingest.set_defaults(func=bench_ingest)
+
+    recommend = subparsers.add_parser("recommend", help="full-text index recommendations vs the keyword loop")
+    recommend.add_argument("--articles", type=int, default=100000)
+    recommend.set_defaults(func=bench_recommend)
+
+    match = subparsers.add_parser("match", help="keyword counting over synthetic article bodies")
+    match.add_argument("--articles", type=int, default=20000)
+    match.add_argument("--words", type=int, default=800)
+    match.set_defaults(func=bench_match)
+
+    rank = subparsers.add_parser("rank", help="tf-idf recommendations vs the keyword loop")
+    rank.add_argument("--articles", type=int, default=100000)
+    rank.add_argument("--repeat", type=int, default=10)
+    rank.set_defaults(func=bench_rank)
+
+    dedup = subparsers.add_parser("dedup", help="near-duplicate lookup time")
+    dedup.add_argument("--articles", type=int, default=500000)
+    dedup.add_argument("--queries", type=int, default=10000)
+    dedup.set_defaults(func=bench_dedup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
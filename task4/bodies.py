@@ -0,0 +1,50 @@
+import zlib
+
+# Article bodies live zlib-compressed in news_body, one row per news id, and are
+# only decompressed when an article is opened or (re)indexed. news.content is
+# left NULL for everything stored this way.
+COMPRESSION_LEVEL = 6
+MIGRATE_BATCH = 1000
+
+
+def compress(text):
+    return zlib.compress((text or "").encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def decompress(body):
+    return zlib.decompress(body).decode("utf-8") if body else ""
+
+
+def create_table(conn):
+    """Create news_body, moving any uncompressed news.content into it"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS news_body (
+            news_id INTEGER PRIMARY KEY,
+            body BLOB
+        )
+    """)
+    moved = 0
+    while True:
+        rows = conn.execute("SELECT id, content FROM news WHERE content IS NOT NULL LIMIT ?",
+                            (MIGRATE_BATCH,)).fetchall()
+        if not rows:
+            break
+        conn.executemany("INSERT OR REPLACE INTO news_body (news_id, body) VALUES (?, ?)",
+                         [(news_id, compress(content)) for news_id, content in rows])
+        conn.executemany("UPDATE news SET content = NULL WHERE id = ?", [(news_id,) for news_id, _ in rows])
+        moved += len(rows)
+    conn.commit()
+    if moved:
+        # Give the space of the uncompressed text back to the filesystem
+        conn.execute("VACUUM")
+
+
+def load(conn, news_ids):
+    """{news_id: body text} for the given articles"""
+    news_ids = list(news_ids)
+    texts = {}
+    for start in range(0, len(news_ids), 500):
+        chunk = news_ids[start:start + 500]
+        texts.update((news_id, decompress(body)) for news_id, body in conn.execute(
+            f"SELECT news_id, body FROM news_body WHERE news_id IN ({', '.join('?' * len(chunk))})", chunk))
+    return texts
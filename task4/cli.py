@@ -0,0 +1,113 @@
+"""Headless entry point for the news recommender.
+
+    python cli.py scrape                      # crawl every source once
+    python cli.py recommend Technology -k 10  # print recommendations
+    python cli.py recommend Technology --fts  # from the full-text index, without loading TF-IDF
+    python cli.py daemon --config crawl.json  # crawl each source on its own schedule
+
+A daemon config is JSON with optional "sources" (category -> homepage URLs, like
+NEWS_SOURCES), "intervals" (homepage URL -> minutes) and "default_interval".
+"""
+import argparse
+import heapq
+import json
+import logging
+import signal
+import threading
+import time
+
+import recommender
+
+
+def load_schedule(config_path, default_interval):
+    """Sources and per-homepage crawl intervals in seconds"""
+    config = {}
+    if config_path:
+        with open(config_path) as f:
+            config = json.load(f)
+    sources = config.get("sources", recommender.NEWS_SOURCES)
+    default_interval = config.get("default_interval", default_interval)
+    intervals = {**recommender.CRAWL_INTERVALS, **config.get("intervals", {})}
+    return sources, {url: intervals.get(url, default_interval) * 60
+                     for urls in sources.values() for url in urls}
+
+
+def run_daemon(db_name, sources, intervals, stop, crawler_options=None):
+    """Crawl each homepage whenever its interval is up until `stop` is set.
+
+    Homepages that fall due together are crawled in one pass. Crawls are
+    incremental: the frontier skips unchanged homepages (304 or same links) and
+    articles already stored, so each pass only downloads what is new.
+    """
+    categories = {url: category for category, urls in sources.items() for url in urls}
+    due = [(0.0, url) for url in categories]
+    heapq.heapify(due)
+    while due and not stop.is_set():
+        stop.wait(max(due[0][0] - time.monotonic(), 0))
+        if stop.is_set():
+            break
+
+        now = time.monotonic()
+        batch = {}
+        while due and due[0][0] <= now:
+            _, url = heapq.heappop(due)
+            batch.setdefault(categories[url], []).append(url)
+        logging.info(f"Crawling {sum(map(len, batch.values()))} source(s)")
+        try:
+            scraped, crawler = recommender.scrape(batch, db_name, on_error=logging.warning, **(crawler_options or {}))
+            logging.info(f"Stored {scraped} new or changed article(s)\n{crawler.metrics.report()}")
+        except Exception as e:
+            logging.exception(f"Crawl failed: {e}")
+
+        finished = time.monotonic()
+        for urls in batch.values():
+            for url in urls:
+                heapq.heappush(due, (finished + intervals[url], url))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless news scraper and recommender")
+    parser.add_argument("--db", default=recommender.DB_NAME, help="SQLite database file")
+    parser.add_argument("--log", help="log file (default: stderr)")
+    parser.add_argument("--workers", type=int, default=16, help="download threads")
+    parser.add_argument("--parse-workers", type=int, default=None, help="parser processes")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scrape = commands.add_parser("scrape", help="crawl all sources once")
+    scrape.add_argument("--recheck", action="store_true", help="re-download articles crawled before")
+
+    recommend = commands.add_parser("recommend", help="print the best articles in a category")
+    recommend.add_argument("category", choices=list(recommender.USER_PREFERENCES))
+    recommend.add_argument("-k", type=int, default=recommender.RECOMMENDATIONS)
+    recommend.add_argument("--fts", action="store_true",
+                           help="query the full-text index instead of building the TF-IDF index first")
+
+    daemon = commands.add_parser("daemon", help="crawl on a schedule until interrupted")
+    daemon.add_argument("--config", help="JSON file with sources and per-source intervals")
+    daemon.add_argument("--interval", type=float, default=recommender.DEFAULT_CRAWL_INTERVAL,
+                        help="minutes between crawls of a source without its own interval")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(filename=args.log, level=logging.INFO, format='%(asctime)s - %(message)s')
+    crawler_options = {"max_workers": args.workers, "parse_workers": args.parse_workers}
+    recommender.setup_database(args.db)
+
+    if args.command == "scrape":
+        scraped, crawler = recommender.scrape(recommender.NEWS_SOURCES, args.db, on_error=logging.warning,
+                                              recheck=args.recheck, **crawler_options)
+        logging.info(f"Stored {scraped} new or changed article(s)\n{crawler.metrics.report()}")
+    elif args.command == "recommend":
+        for news_id, title, score in recommender.recommend(args.category, args.db, k=args.k, fts=args.fts):
+            print(f"{score:.3f}\t{news_id}\t{title}")
+    else:
+        sources, intervals = load_schedule(args.config, args.interval)
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+        logging.info(f"Scheduling {len(intervals)} source(s)")
+        run_daemon(args.db, sources, intervals, stop, crawler_options)
+        logging.info("Stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from newspaper import Article
+from bs4 import BeautifulSoup
+
+from bodies import compress
+from dedup import simhash
+from frontier import normalize_url, content_hash
+
+USER_AGENT = "Mozilla/5.0 (compatible; NewsRecommender/1.0)"
+
+# HTTP statuses worth retrying with backoff
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# Parse stage. These run in worker processes, so they only take and return plain data.
+
+def parse_homepage(url, html):
+    """Normalized article links on a source homepage"""
+    start = time.perf_counter()
+    soup = BeautifulSoup(html, "html.parser")
+    # A dict keeps the first occurrence of each link, in page order
+    links = {}
+    for link in soup.find_all("a", href=True):
+        article_url = link["href"]
+        if article_url.startswith("http"):
+            links[normalize_url(article_url)] = None
+    links = list(links)
+    return {"links": links, "content_hash": content_hash(*links)}, time.perf_counter() - start
+
+
+def parse_article(url, html):
+    """Fields of a downloaded article, plus its content hash, SimHash and compressed body"""
+    start = time.perf_counter()
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+    return {
+        "title": article.title,
+        "author": ", ".join(article.authors),
+        "published_date": str(article.publish_date),
+        "content": article.text,
+        "content_hash": content_hash(article.title, article.text),
+        "simhash": simhash(article.text),
+        "body": compress(article.text),
+    }, time.perf_counter() - start
+
+
+PARSERS = {"homepage": parse_homepage, "article": parse_article}
+
+
+class PipelineMetrics:
+    """Per-stage counters and queue depths for a crawl"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.depths = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            count, busy = self.stages.get(stage, (0, 0.0))
+            self.stages[stage] = (count + 1, busy + seconds)
+
+    def depth(self, name, value):
+        with self._lock:
+            _, peak = self.depths.get(name, (0, 0))
+            self.depths[name] = (value, max(peak, value))
+
+    def snapshot(self):
+        """{stage: (items, items/s, busy seconds)} and {queue: (depth, peak depth)}"""
+        with self._lock:
+            elapsed = max(time.perf_counter() - self.started, 1e-9)
+            stages = {stage: (count, count / elapsed, busy) for stage, (count, busy) in self.stages.items()}
+            return stages, dict(self.depths)
+
+    def report(self):
+        stages, depths = self.snapshot()
+        lines = [f"{stage}: {count} items, {rate:.1f}/s, {busy:.1f}s busy"
+                 for stage, (count, rate, busy) in stages.items()]
+        lines += [f"{name} queue: {depth} (peak {peak})" for name, (depth, peak) in depths.items()]
+        return "\n".join(lines)
+
+
+class Crawler:
+    """Download and parse articles from the news sources as a two-stage pipeline.
+
+    Pages are downloaded on a thread pool and parsed on a process pool, so network
+    waits and CPU-bound parsing overlap. Both hand-offs are bounded: at most
+    max_downloads pages are in flight, and a downloader waits for one of
+    max_parsing parse slots before submitting, which holds back downloading
+    whenever parsing falls behind.
+    """
+
+    def __init__(self, max_workers=16, per_host=4, timeout=10, retries=3, backoff=0.5, frontier=None, recheck=False,
+                 parse_workers=None, max_downloads=64, max_parsing=32, mp_context=None):
+        self.frontier = frontier
+        self.recheck = recheck
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.parse_workers = parse_workers
+        self.max_downloads = max_downloads
+        self.mp_context = mp_context
+        self.metrics = PipelineMetrics()
+
+        self._local = threading.local()
+        self._host_limits = {}
+        self._host_lock = threading.Lock()
+        self._parse_slots = threading.BoundedSemaphore(max_parsing)
+        self._parsing = 0
+
+    def _session(self):
+        """One keep-alive session per worker thread"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.per_host)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            self._local.session = session
+        return session
+
+    def _host_limit(self, url):
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+    def fetch(self, url):
+        """GET a page, retrying connection errors and 429/5xx with exponential backoff.
+
+        Known URLs are requested conditionally, so an unchanged page comes back as a 304.
+        """
+        headers = self.frontier.conditional_headers(url) if self.frontier is not None else {}
+        for attempt in range(self.retries + 1):
+            try:
+                with self._host_limit(url):
+                    response = self._session().get(url, headers=headers, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+                error = requests.exceptions.HTTPError(f"{response.status_code} for {url}", response=response)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+
+            if attempt < self.retries:
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+        raise error
+
+    def _download(self, job, parsers, events):
+        """Download stage: fetch a page and hand it to the parse stage"""
+        kind, url = job[0], job[1]
+        try:
+            start = time.perf_counter()
+            response = self.fetch(url)
+            self.metrics.record("download", time.perf_counter() - start)
+            if response.status_code == 304:
+                events.put((job, None, None, None))
+                return
+            validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+            self._parse_slots.acquire()
+            self._track_parsing(1)
+            try:
+                future = parsers.submit(PARSERS[kind], url, response.text)
+            except Exception:
+                self._track_parsing(-1)
+                self._parse_slots.release()
+                raise
+        except Exception as e:
+            events.put((job, None, None, e))
+            return
+
+        def parsed(future):
+            self._track_parsing(-1)
+            self._parse_slots.release()
+            try:
+                result, seconds = future.result()
+                self.metrics.record("parse", seconds)
+                events.put((job, validators, result, None))
+            except Exception as e:
+                events.put((job, None, None, e))
+
+        future.add_done_callback(parsed)
+
+    def _track_parsing(self, change):
+        with self._host_lock:
+            self._parsing += change
+            self.metrics.depth("parse", self._parsing)
+
+    def _unchanged(self, url, digest):
+        return self.frontier is not None and self.frontier.is_unchanged(url, digest)
+
+    def _wanted(self, article_url, seen):
+        """Skip links already queued in this crawl and, unless rechecking, links crawled before"""
+        if article_url in seen:
+            return False
+        seen.add(article_url)
+        return self.recheck or self.frontier is None or article_url not in self.frontier
+
+    def crawl(self, sources, on_error=print):
+        """Yield parsed articles as soon as each one is through the pipeline.
+
+        sources maps a category to a list of homepage URLs, like NEWS_SOURCES.
+        Homepage validators are recorded in the frontier here; article validators
+        travel with each article so the writer can store both together.
+        """
+        self.metrics = PipelineMetrics()
+        events = queue.Queue()
+        backlog = deque(("homepage", url, url, category) for category, urls in sources.items() for url in urls)
+        seen = set()
+        downloading = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as downloads, \
+                ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=self.mp_context) as parsers:
+            while backlog or downloading:
+                while backlog and downloading < self.max_downloads:
+                    downloads.submit(self._download, backlog.popleft(), parsers, events)
+                    downloading += 1
+                self.metrics.depth("backlog", len(backlog))
+                self.metrics.depth("download", downloading)
+
+                job, validators, result, error = events.get()
+                downloading -= 1
+                kind, url, source, category = job
+                if error is not None:
+                    if kind == "homepage":
+                        on_error(f"Failed to fetch {url}: {error}")
+                    else:
+                        on_error(f"Skipping {url} - {error}")
+                    continue
+                if result is None or self._unchanged(url, result["content_hash"]):
+                    continue
+
+                if kind == "homepage":
+                    if self.frontier is not None:
+                        self.frontier.record(url, validators["etag"], validators["last_modified"],
+                                             result["content_hash"])
+                    backlog.extend(("article", article_url, source, category)
+                                   for article_url in result["links"] if self._wanted(article_url, seen))
+                else:
+                    self.metrics.record("output", 0.0)
+                    yield {"url": url, "source": source, "category": category, **validators, **result}
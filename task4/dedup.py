@@ -0,0 +1,167 @@
+import hashlib
+import threading
+
+import bodies
+from matcher import tokenize
+
+# Words per shingle, and the fewest shingles worth fingerprinting
+SHINGLE_SIZE = 3
+MIN_SHINGLES = 10
+# Fingerprints this many bits apart or fewer are the same story. With 4 bands of
+# 16 bits, two such fingerprints always agree on at least one whole band.
+MAX_DISTANCE = 3
+BANDS = 4
+BAND_BITS = 64 // BANDS
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def simhash(text):
+    """64-bit SimHash of a text's word shingles, or None if it is too short to compare"""
+    words = tokenize(text or "")
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    import numpy as np  # only needed once there is something to fingerprint
+
+    hashes = np.array([int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+                       for shingle in shingles], dtype="<u8")
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0) * 2 > len(shingles)
+    return int(np.packbits(votes, bitorder="little").view("<u8")[0])
+
+
+def distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def to_signed(fingerprint):
+    """SQLite integers are signed 64-bit"""
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+def bands(fingerprint):
+    return [(fingerprint >> (band * BAND_BITS)) & ((1 << BAND_BITS) - 1) for band in range(BANDS)]
+
+
+class DuplicateIndex:
+    """LSH index of article fingerprints for near-duplicate lookups.
+
+    Fingerprints are stored in news.db and kept in memory as one hash table per
+    band, so a lookup only compares against articles sharing a band with the new
+    one. Articles found to be duplicates are recorded in news_duplicates against
+    their canonical news row instead of being stored again.
+
+    Use get_index() for the process's long-lived index of a database, which only
+    reads the rows stored since it last looked. It is shared by the writers of
+    that database, which store one batch at a time.
+    """
+
+    def __init__(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS news_simhash (
+                news_id INTEGER PRIMARY KEY,
+                simhash INTEGER
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS news_duplicates (
+                url TEXT PRIMARY KEY,
+                canonical_id INTEGER,
+                title TEXT,
+                source TEXT,
+                simhash INTEGER
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_duplicates_canonical ON news_duplicates(canonical_id)")
+
+        self.fingerprints = {}
+        self._bands = [{} for _ in range(BANDS)]
+        self.last_id = 0
+        self.refresh(conn)
+
+    def refresh(self, conn):
+        """Pick up articles stored since the last refresh, by this process or another one.
+
+        Articles stored without a fingerprint (before this index existed, or by a
+        writer with duplicate detection off) are fingerprinted now.
+        """
+        # Rows stored after this are left for the next refresh, so none is missed
+        last_id = conn.execute("SELECT MAX(id) FROM news").fetchone()[0] or 0
+        rows = conn.execute("SELECT news_id, simhash FROM news_simhash WHERE news_id > ? AND news_id <= ?",
+                            (self.last_id, last_id))
+        for news_id, fingerprint in rows:
+            if news_id in self.fingerprints:
+                self.remove(news_id)
+            if fingerprint is not None:
+                self._remember(news_id, fingerprint % (1 << 64))
+
+        unindexed = conn.execute("""
+            SELECT id, body FROM news LEFT JOIN news_body ON news_body.news_id = news.id
+            WHERE id > ? AND id <= ? AND id NOT IN (SELECT news_id FROM news_simhash)
+        """, (self.last_id, last_id)).fetchall()
+        self.add(conn, [(news_id, simhash(bodies.decompress(body))) for news_id, body in unindexed])
+        conn.commit()
+        self.last_id = last_id
+
+    def _remember(self, news_id, fingerprint):
+        self.fingerprints[news_id] = fingerprint
+        for table, value in zip(self._bands, bands(fingerprint)):
+            table.setdefault(value, []).append(news_id)
+
+    def find(self, fingerprint):
+        """Id of the closest stored article within MAX_DISTANCE bits, or None"""
+        if fingerprint is None:
+            return None
+        best = None
+        for table, value in zip(self._bands, bands(fingerprint)):
+            for news_id in table.get(value, ()):
+                d = distance(fingerprint, self.fingerprints[news_id])
+                if d <= MAX_DISTANCE and (best is None or (d, news_id) < best):
+                    best = (d, news_id)
+        return best[1] if best else None
+
+    def add(self, conn, rows):
+        """Index (news_id, fingerprint) rows (caller commits).
+
+        A None fingerprint is stored as NULL so the article isn't fingerprinted again,
+        but it never matches anything.
+        """
+        rows = list(rows)
+        for news_id, fingerprint in rows:
+            if news_id in self.fingerprints:
+                self.remove(news_id)
+            if fingerprint is not None:
+                self._remember(news_id, fingerprint)
+        conn.executemany("INSERT OR REPLACE INTO news_simhash (news_id, simhash) VALUES (?, ?)",
+                         [(news_id, None if fingerprint is None else to_signed(fingerprint))
+                          for news_id, fingerprint in rows])
+
+    def remove(self, news_id):
+        fingerprint = self.fingerprints.pop(news_id)
+        for table, value in zip(self._bands, bands(fingerprint)):
+            table[value].remove(news_id)
+
+    def record_duplicates(self, conn, rows):
+        """Store (url, canonical_id, title, source, fingerprint) rows for articles that weren't kept"""
+        conn.executemany(
+            "INSERT OR REPLACE INTO news_duplicates (url, canonical_id, title, source, simhash) VALUES (?, ?, ?, ?, ?)",
+            [(url, canonical_id, title, source, to_signed(fingerprint))
+             for url, canonical_id, title, source, fingerprint in rows])
+
+
+def get_index(conn, db_name):
+    """The process's DuplicateIndex for a database, built on first use and refreshed on every later one"""
+    with _indexes_lock:
+        if db_name in _indexes:
+            _indexes[db_name].refresh(conn)
+        else:
+            _indexes[db_name] = DuplicateIndex(conn)
+        return _indexes[db_name]
+
+
+def discard_index(db_name):
+    """Forget a database's index, e.g. after a failed write left it out of step with news_simhash"""
+    with _indexes_lock:
+        _indexes.pop(db_name, None)
@@ -0,0 +1,89 @@
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the news sites so crawls can be benchmarked offline
+
+WORDS = ("market economy startups investing football cricket tennis olympics movies music "
+         "celebrities hollywood ai machine learning cybersecurity blockchain the a of and to in").split()
+
+
+def article_html(number):
+    """Build a deterministic article page for the given number"""
+    words = [WORDS[(number * 7 + i * 13) % len(WORDS)] for i in range(400)]
+    paragraphs = "".join(f"<p>{' '.join(words[i:i + 40]).capitalize()}.</p>" for i in range(0, len(words), 40))
+    return (
+        "<html><head>"
+        f"<title>Fixture article {number}</title>"
+        f'<meta name="author" content="Reporter {number % 10}">'
+        f'<meta property="article:published_time" content="2024-01-{number % 28 + 1:02d}T10:00:00Z">'
+        "</head><body><article>"
+        f"<h1>Fixture article {number}</h1>{paragraphs}"
+        "</article></body></html>"
+    )
+
+
+class FixtureServer:
+    """Serve a homepage linking to `articles` pages, with optional per-request latency"""
+
+    def __init__(self, articles=100, latency=0.0, host="127.0.0.1", port=0):
+        self.articles = articles
+        self.latency = latency
+
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if fixture.latency:
+                    time.sleep(fixture.latency)
+                if self.path == "/":
+                    links = "".join(f'<a href="{fixture.url}/article/{i}">Article {i}</a>'
+                                    for i in range(fixture.articles))
+                    body = f"<html><body>{links}</body></html>"
+                elif self.path.startswith("/article/"):
+                    body = article_html(int(self.path.rsplit("/", 1)[1]))
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                etag = f'"{zlib.crc32(data):08x}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    with FixtureServer() as server:
+        print(f"Serving fixture news site on {server.url}")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,89 @@
+import hashlib
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "cmpid", "ocid"}
+
+
+def normalize_url(url):
+    """Canonical form of a link so the same page is only fetched once"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not (scheme == "http" and parts.port == 80) and not (scheme == "https" and parts.port == 443):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS]
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
+
+
+def content_hash(*parts):
+    """Stable hash of page content, used to spot unchanged pages"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class Frontier:
+    """Persistent record of every URL seen, with the validators from its last fetch.
+
+    The table lives in news.db. Entries are loaded into memory up front so crawler
+    threads can read them without touching the connection. record() only updates
+    memory; the writer persists recorded entries with save() inside its own
+    transaction.
+    """
+
+    def __init__(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                fetched_at TEXT
+            )
+        """)
+        conn.commit()
+        self.entries = {url: (etag, last_modified, digest) for url, etag, last_modified, digest
+                        in conn.execute("SELECT url, etag, last_modified, content_hash FROM frontier")}
+        self._unsaved = []
+        self._lock = threading.Lock()
+
+    def __contains__(self, url):
+        return url in self.entries
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since headers for a previously fetched URL"""
+        headers = {}
+        etag, last_modified, _ = self.entries.get(url, (None, None, None))
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def is_unchanged(self, url, digest):
+        return url in self.entries and self.entries[url][2] == digest
+
+    def record(self, url, etag, last_modified, digest):
+        """Remember the validators of a fetched page until the next save()"""
+        with self._lock:
+            self.entries[url] = (etag, last_modified, digest)
+            self._unsaved.append((url, etag, last_modified, digest, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+    def save(self, conn):
+        """Write recorded entries to the frontier table (caller commits)"""
+        with self._lock:
+            rows, self._unsaved = self._unsaved, []
+        conn.executemany(
+            "INSERT OR REPLACE INTO frontier (url, etag, last_modified, content_hash, fetched_at) VALUES (?, ?, ?, ?, ?)",
+            rows)
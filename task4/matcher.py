@@ -0,0 +1,78 @@
+import re
+from collections import deque
+
+WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Case-folded words of a text; matching works on these, so hits are always whole words"""
+    return WORD_RE.findall(text.casefold())
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over words that counts every keyword in one pass.
+
+    Keywords may be phrases ("Machine Learning"); they are matched as whole,
+    consecutive words, ignoring case. Only words that occur in some keyword can
+    move the automaton, so one compiled regex picks those out of the body in C
+    and the automaton steps over just them.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for index, keyword in enumerate(self.keywords):
+            self._add(tokenize(keyword), index)
+        self._link()
+
+        vocabulary = sorted({word for state in self._goto for word in state}, key=len, reverse=True)
+        self._vocabulary_re = re.compile(r"\b(?:%s)\b" % "|".join(map(re.escape, vocabulary))) if vocabulary else None
+
+    def _add(self, words, index):
+        state = 0
+        for word in words:
+            if word not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][word] = len(self._goto) - 1
+            state = self._goto[state][word]
+        if words:
+            self._out[state].append(index)
+
+    def _link(self):
+        """Breadth-first pass setting failure links and merging outputs along them"""
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for word, child in self._goto[state].items():
+                pending.append(child)
+                fail = self._fail[state]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(word, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def scan(self, text):
+        """Return {keyword: number of occurrences} for the keywords found in text"""
+        counts = [0] * len(self.keywords)
+        if self._vocabulary_re is None:
+            return {}
+        goto, fail, out = self._goto, self._fail, self._out
+        folded = text.casefold()
+        state = 0
+        last_end = 0
+        for match in self._vocabulary_re.finditer(folded):
+            # Any other word in between breaks a phrase in progress
+            if state and WORD_RE.search(folded, last_end, match.start()):
+                state = 0
+            last_end = match.end()
+            word = match.group()
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            for index in out[state]:
+                counts[index] += 1
+        return {keyword: count for keyword, count in zip(self.keywords, counts) if count}
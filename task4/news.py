@@ -1,191 +1,229 @@
-import requests
-import sqlite3
+import logging
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
-from newspaper import Article
-from bs4 import BeautifulSoup
-import nltk
-
-nltk.download("punkt")  # Needed for text processing in newspaper3k
-
-# News sources
-NEWS_SOURCES = {
-    "Technology": ["https://www.theverge.com", "https://techcrunch.com"],
-    "Business": ["https://www.bbc.com/news/business", "https://www.cnn.com/business"],
-    "Sports": ["https://www.espn.com", "https://www.bbc.com/sport"],
-    "Entertainment": ["https://www.billboard.com", "https://variety.com"]
-}
-
-# Keywords for recommendations
-USER_PREFERENCES = {
-    "Technology": ["AI", "Machine Learning", "Cybersecurity", "Blockchain"],
-    "Business": ["Stock Market", "Economy", "Investing", "Startups"],
-    "Sports": ["Football", "Cricket", "Tennis", "Olympics"],
-    "Entertainment": ["Movies", "Music", "Celebrities", "Hollywood"]
-}
-
-# Database setup
-DB_NAME = "news.db"
-
-def setup_database():
-    """Create the news table if it doesn't exist"""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS news (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT,
-            author TEXT,
-            published_date TEXT,
-            content TEXT,
-            source TEXT,
-            category TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def scrape_news():
-    """Scrape news and store them in the database"""
-    setup_database()
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    for category, urls in NEWS_SOURCES.items():
-        for url in urls:
-            try:
-                response = requests.get(url)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.text, "html.parser")
-
-                for link in soup.find_all("a", href=True):
-                    article_url = link["href"]
-                    if article_url.startswith("http"):
-                        try:
-                            article = Article(article_url)
-                            article.download()
-                            article.parse()
-
-                            cursor.execute("INSERT INTO news (title, author, published_date, content, source, category) VALUES (?, ?, ?, ?, ?, ?)",
-                                           (article.title, ", ".join(article.authors), str(article.publish_date), article.text, url, category))
-                            conn.commit()
-
-                        except Exception as e:
-                            print(f"Skipping {article_url} - {e}")
-
-            except requests.exceptions.RequestException as e:
-                print(f"Failed to fetch {url}: {e}")
-
-    conn.close()
-    load_news()
-    messagebox.showinfo("Success", "News Scraping Completed ✅")
-
-def load_news():
-    """Load news from database into the GUI"""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, title, category FROM news ORDER BY id DESC LIMIT 10")
-    rows = cursor.fetchall()
-    conn.close()
-
-    news_listbox.delete(*news_listbox.get_children())  # Clear previous data
-    for row in rows:
-        news_listbox.insert("", "end", values=row)
-
-def show_full_article(event):
-    """Display full news article when a title is clicked"""
-    selected_item = news_listbox.selection()
-    if selected_item:
-        item = news_listbox.item(selected_item)
-        news_id = item["values"][0]
-
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT title, author, published_date, content FROM news WHERE id=?", (news_id,))
-        article = cursor.fetchone()
-        conn.close()
-
-        if article:
-            title, author, date, content = article
-            article_text.delete("1.0", tk.END)  # Clear previous content
-            article_text.insert(tk.END, f"Title: {title}\n")
-            article_text.insert(tk.END, f"Author: {author}\n")
-            article_text.insert(tk.END, f"Published Date: {date}\n\n")
-            article_text.insert(tk.END, content)
-
-def recommend_news():
-    """Recommend news articles based on selected category"""
-    selected_category = category_var.get()
-    if not selected_category:
-        messagebox.showwarning("Warning", "Please select a category!")
-        return
-
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT title, content FROM news WHERE category=?", (selected_category,))
-    articles = cursor.fetchall()
-    conn.close()
-
-    recommended_articles = []
-    for title, content in articles:
-        for keyword in USER_PREFERENCES[selected_category]:
-            if keyword.lower() in content.lower():
-                recommended_articles.append(title)
-                break  # Stop checking after the first match
-
-    recommendations_listbox.delete(*recommendations_listbox.get_children())  # Clear previous recommendations
-    for title in recommended_articles:
-        recommendations_listbox.insert("", "end", values=[title])
-
-# Tkinter GUI
-root = tk.Tk()
-root.title("Personalized News Recommender")
-root.geometry("1000x600")
-
-# Scrape Button
-scrape_button = tk.Button(root, text="Scrape News", command=scrape_news, font=("Arial", 12), bg="lightblue")
-scrape_button.pack(pady=10)
-
-# News Table
-columns = ("ID", "Title", "Category")
-news_listbox = ttk.Treeview(root, columns=columns, show="headings")
-
-news_listbox.heading("ID", text="ID")
-news_listbox.column("ID", width=50)
-news_listbox.heading("Title", text="Title")
-news_listbox.column("Title", width=500)
-news_listbox.heading("Category", text="Category")
-news_listbox.column("Category", width=150)
-
-news_listbox.pack(fill="both", expand=True)
-news_listbox.bind("<Double-1>", show_full_article)  # Double-click to view article
-
-# Full Article View
-article_text = scrolledtext.ScrolledText(root, wrap=tk.WORD, height=10)
-article_text.pack(fill="both", expand=True, padx=10, pady=10)
-
-# Recommendations Section
-frame = tk.Frame(root)
-frame.pack(fill="both", expand=True, padx=10, pady=10)
-
-category_var = tk.StringVar()
-category_label = tk.Label(frame, text="Select Category:", font=("Arial", 12))
-category_label.grid(row=0, column=0, padx=5, pady=5)
-
-category_dropdown = ttk.Combobox(frame, textvariable=category_var, values=list(NEWS_SOURCES.keys()), font=("Arial", 12))
-category_dropdown.grid(row=0, column=1, padx=5, pady=5)
-
-recommend_button = tk.Button(frame, text="Get Recommendations", command=recommend_news, font=("Arial", 12), bg="lightgreen")
-recommend_button.grid(row=0, column=2, padx=5, pady=5)
-
-# Recommended News Table
-recommendations_listbox = ttk.Treeview(root, columns=["Recommended Articles"], show="headings")
-recommendations_listbox.heading("Recommended Articles", text="Recommended Articles")
-recommendations_listbox.column("Recommended Articles", width=800)
-recommendations_listbox.pack(fill="both", expand=True, padx=10, pady=10)
-
-# Load News on Start
-setup_database()
-load_news()
-
-root.mainloop()
+
+import recommender
+from recommender import NEWS_SOURCES
+
+# How often the GUI picks up progress from the scrape thread
+SCRAPE_POLL_MS = 500
+
+# The news table is filled a page at a time by id (keyset pagination) as the user
+# scrolls, keeping at most MAX_LOADED_ROWS rows in the widget
+PAGE_SIZE = 100
+MAX_LOADED_ROWS = 1000
+
+
+# GUI Application
+class NewsRecommenderApp:
+    def __init__(self, root, db_name=recommender.DB_NAME):
+        self.root = root
+        self.db_name = db_name
+        self.scrape_events = queue.Queue()
+        self.trimmed_newer = False
+        self.exhausted = False
+
+        self.root.title("Personalized News Recommender")
+        self.root.geometry("1000x600")
+
+        # Scrape Button
+        self.scrape_button = tk.Button(root, text="Scrape News", command=self.scrape_news, font=("Arial", 12),
+                                       bg="lightblue")
+        self.scrape_button.pack(pady=10)
+
+        # News Table
+        news_frame = tk.Frame(root)
+        news_frame.pack(fill="both", expand=True)
+
+        columns = ("ID", "Title", "Category")
+        self.news_scrollbar = ttk.Scrollbar(news_frame, orient="vertical")
+        self.news_listbox = ttk.Treeview(news_frame, columns=columns, show="headings",
+                                         yscrollcommand=self.on_news_scroll)
+        self.news_scrollbar.config(command=self.news_listbox.yview)
+        self.news_scrollbar.pack(side="right", fill="y")
+
+        self.news_listbox.heading("ID", text="ID")
+        self.news_listbox.column("ID", width=50)
+        self.news_listbox.heading("Title", text="Title")
+        self.news_listbox.column("Title", width=500)
+        self.news_listbox.heading("Category", text="Category")
+        self.news_listbox.column("Category", width=150)
+
+        self.news_listbox.pack(fill="both", expand=True)
+        self.news_listbox.bind("<Double-1>", self.show_full_article)  # Double-click to view article
+
+        # Full Article View
+        self.article_text = scrolledtext.ScrolledText(root, wrap=tk.WORD, height=10)
+        self.article_text.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # Recommendations Section
+        frame = tk.Frame(root)
+        frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        self.category_var = tk.StringVar()
+        category_label = tk.Label(frame, text="Select Category:", font=("Arial", 12))
+        category_label.grid(row=0, column=0, padx=5, pady=5)
+
+        category_dropdown = ttk.Combobox(frame, textvariable=self.category_var, values=list(NEWS_SOURCES.keys()),
+                                         font=("Arial", 12))
+        category_dropdown.grid(row=0, column=1, padx=5, pady=5)
+
+        recommend_button = tk.Button(frame, text="Get Recommendations", command=self.recommend_news,
+                                     font=("Arial", 12), bg="lightgreen")
+        recommend_button.grid(row=0, column=2, padx=5, pady=5)
+
+        # Recommended News Table
+        self.recommendations_listbox = ttk.Treeview(root, columns=["Recommended Articles"], show="headings")
+        self.recommendations_listbox.heading("Recommended Articles", text="Recommended Articles")
+        self.recommendations_listbox.column("Recommended Articles", width=800)
+        self.recommendations_listbox.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # Load News on Start
+        recommender.setup_database(self.db_name)
+        self.load_news()
+
+    def scrape_news(self):
+        """Start scraping in a background thread so the window stays responsive"""
+        self.scrape_button.config(state="disabled", text="Scraping...")
+        threading.Thread(target=self.scrape_worker, daemon=True).start()
+        self.root.after(SCRAPE_POLL_MS, self.poll_scrape)
+
+    def scrape_worker(self):
+        """Crawl all sources into the database, reporting progress (or the error) to the Tk thread"""
+        try:
+            scraped, crawler = recommender.scrape(
+                NEWS_SOURCES, self.db_name, on_progress=lambda count: self.scrape_events.put(("progress", count)),
+                on_error=logging.warning)
+            logging.info(f"Stored {scraped} new or changed article(s)\n{crawler.metrics.report()}")
+        except Exception as e:
+            self.scrape_events.put(("error", e))
+        else:
+            self.scrape_events.put(("done", scraped))
+
+    def poll_scrape(self):
+        """Apply progress from the scrape thread on the Tk thread"""
+        done, error = False, None
+        while not self.scrape_events.empty():
+            event, value = self.scrape_events.get_nowait()
+            if event == "error":
+                error = value
+            else:
+                self.scrape_button.config(text=f"Scraping... ({value})")
+            done = done or event in ("done", "error")
+
+        # Only pull new rows in while the table shows the newest articles
+        if not self.trimmed_newer:
+            self.load_newer_news()
+        if done:
+            self.scrape_button.config(state="normal", text="Scrape News")
+            if error is not None:
+                messagebox.showerror("Error", f"News scraping failed: {error}")
+            else:
+                messagebox.showinfo("Success", "News Scraping Completed ✅")
+        else:
+            self.root.after(SCRAPE_POLL_MS, self.poll_scrape)
+
+    def fetch_news_page(self, before=None, after=None):
+        return recommender.news_page(before, after, limit=PAGE_SIZE, db_name=self.db_name)
+
+    def loaded_news_id(self, item):
+        return int(self.news_listbox.set(item, "ID"))
+
+    def load_news(self):
+        """Load the newest page of news into the GUI"""
+        self.news_listbox.delete(*self.news_listbox.get_children())  # Clear previous data
+        for row in self.fetch_news_page():
+            self.news_listbox.insert("", "end", values=row)
+        self.trimmed_newer = self.exhausted = False
+
+    def load_older_news(self):
+        """Append the next page when the user scrolls to the bottom, dropping rows from the top"""
+        items = self.news_listbox.get_children()
+        if not items or self.exhausted:
+            return
+        rows = self.fetch_news_page(before=self.loaded_news_id(items[-1]))
+        self.exhausted = len(rows) < PAGE_SIZE
+        if not rows:
+            return
+
+        top = self.news_listbox.yview()[0] * len(items)
+        for row in rows:
+            self.news_listbox.insert("", "end", values=row)
+        excess = len(items) + len(rows) - MAX_LOADED_ROWS
+        if excess > 0:
+            self.news_listbox.delete(*items[:excess])
+            self.trimmed_newer = True
+            top -= excess
+        self.news_listbox.yview_moveto(max(top, 0) / len(self.news_listbox.get_children()))
+
+    def load_newer_news(self):
+        """Prepend newer rows when the user scrolls back up (or new ones were scraped), dropping rows from the bottom"""
+        items = self.news_listbox.get_children()
+        if not items:
+            self.load_news()
+            return
+        rows = self.fetch_news_page(after=self.loaded_news_id(items[0]))
+        if len(rows) < PAGE_SIZE:
+            self.trimmed_newer = False
+        if not rows:
+            return
+
+        top = self.news_listbox.yview()[0] * len(items)
+        for index, row in enumerate(rows):
+            self.news_listbox.insert("", index, values=row)
+        excess = len(items) + len(rows) - MAX_LOADED_ROWS
+        if excess > 0:
+            self.news_listbox.delete(*items[-excess:])
+            self.exhausted = False
+        # Keep the rows the user was looking at in view
+        if top > 0 or self.trimmed_newer:
+            self.news_listbox.yview_moveto((top + len(rows)) / len(self.news_listbox.get_children()))
+
+    def on_news_scroll(self, first, last):
+        """Scrollbar callback that loads neighbouring pages near either end"""
+        self.news_scrollbar.set(first, last)
+        if float(last) >= 0.98 and not self.exhausted:
+            self.root.after_idle(self.load_older_news)
+        elif float(first) <= 0.02 and self.trimmed_newer:
+            self.root.after_idle(self.load_newer_news)
+
+    def show_full_article(self, event):
+        """Display full news article when a title is clicked"""
+        selected_item = self.news_listbox.selection()
+        if selected_item:
+            item = self.news_listbox.item(selected_item)
+            news_id = item["values"][0]
+
+            article = recommender.load_article(news_id, self.db_name)
+            recommender.record_click(news_id, self.db_name)
+
+            if article:
+                title, author, date, content = article
+                self.article_text.delete("1.0", tk.END)  # Clear previous content
+                self.article_text.insert(tk.END, f"Title: {title}\n")
+                self.article_text.insert(tk.END, f"Author: {author}\n")
+                self.article_text.insert(tk.END, f"Published Date: {date}\n\n")
+                self.article_text.insert(tk.END, content)
+
+    def recommend_news(self):
+        """Recommend news articles based on selected category"""
+        selected_category = self.category_var.get()
+        if not selected_category:
+            messagebox.showwarning("Warning", "Please select a category!")
+            return
+
+        recommended_articles = recommender.recommend(selected_category, self.db_name)
+
+        self.recommendations_listbox.delete(*self.recommendations_listbox.get_children())  # Clear previous recommendations
+        for _, title, _ in recommended_articles:
+            self.recommendations_listbox.insert("", "end", values=[title])
+
+
+# Run the application
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    root = tk.Tk()
+    app = NewsRecommenderApp(root)
+    root.mainloop()
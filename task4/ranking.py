@@ -0,0 +1,167 @@
+import math
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+import bodies
+from matcher import KeywordMatcher, tokenize
+
+# How much the articles a user opened count next to the category keywords
+CLICK_WEIGHT = 0.5
+# Recent clicks considered, and the strongest terms kept from them
+MAX_CLICKS = 50
+MAX_CLICK_TERMS = 100
+
+
+class TfidfRanker:
+    """Vector-space ranking of stored articles against a user's preferences.
+
+    Term counts (sublinear tf) are kept in a sparse column-major matrix, one row
+    per article, so scoring a query only touches the postings of its own terms.
+    Vocabulary and document frequencies grow as refresh() pulls in articles newer
+    than the last one seen; idf weights are applied at query time, so adding
+    articles never rewrites existing rows.
+
+    Multi-word keyword phrases ("Machine Learning") are terms of their own as
+    well as their words, so an article using the phrase outranks one that only
+    mentions "machine" and "learning" apart. A KeywordMatcher counts them in the
+    same pass that indexes the text, queries included.
+    """
+
+    def __init__(self, phrases=()):
+        # Phrase terms contain a space, which no single-word term can
+        phrases = {keyword: " ".join(tokenize(keyword)) for keyword in phrases if len(tokenize(keyword)) > 1}
+        self._phrases = phrases
+        self._matcher = KeywordMatcher(phrases) if phrases else None
+        self.vocabulary = {}
+        self.doc_freq = np.zeros(0, dtype=np.int64)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.category_codes = {}
+        self.categories = np.zeros(0, dtype=np.int32)
+        self.last_id = 0
+
+        self._chunks = []
+        self._matrix = sparse.csc_matrix((0, 0), dtype=np.float32)
+        self._norms = np.zeros(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _count(self, text, grow):
+        terms = Counter(tokenize(text))
+        # Only a text with every word of some phrase is worth the matcher's pass
+        if self._matcher is not None and any(all(word in terms for word in phrase.split())
+                                             for phrase in self._phrases.values()):
+            terms.update({self._phrases[keyword]: count for keyword, count in self._matcher.scan(text).items()})
+        counts = {}
+        for term, count in terms.items():
+            column = self.vocabulary.get(term)
+            if column is None and grow:
+                column = self.vocabulary[term] = len(self.vocabulary)
+            if column is not None:
+                counts[column] = 1.0 + math.log(count)
+        return counts
+
+    def add(self, rows):
+        """Index (id, category, text) rows; ids must be increasing"""
+        indptr, indices, data, ids, categories = [0], [], [], [], []
+        for news_id, category, text in rows:
+            counts = self._count(text or "", grow=True)
+            indices.extend(counts)
+            data.extend(counts.values())
+            indptr.append(len(indices))
+            ids.append(news_id)
+            categories.append(self.category_codes.setdefault(category, len(self.category_codes)))
+        if not ids:
+            return
+
+        vocabulary_size = len(self.vocabulary)
+        self._chunks.append(sparse.csr_matrix(
+            (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(ids), vocabulary_size)))
+        self.doc_freq = np.pad(self.doc_freq, (0, vocabulary_size - len(self.doc_freq)))
+        self.doc_freq += np.bincount(indices, minlength=vocabulary_size)
+        self.ids = np.concatenate([self.ids, ids])
+        self.categories = np.concatenate([self.categories, np.array(categories, dtype=np.int32)])
+        self.last_id = ids[-1]
+
+    def refresh(self, conn, batch_size=5000):
+        """Index articles stored since the last refresh"""
+        while True:
+            rows = conn.execute("""
+                SELECT id, category, title, body FROM news LEFT JOIN news_body ON news_body.news_id = news.id
+                WHERE id > ? ORDER BY id LIMIT ?
+            """, (self.last_id, batch_size)).fetchall()
+            self.add((news_id, category, f"{title} {bodies.decompress(body)}")
+                     for news_id, category, title, body in rows)
+            if len(rows) < batch_size:
+                break
+
+    @property
+    def idf(self):
+        return (np.log((1.0 + len(self.ids)) / (1.0 + self.doc_freq)) + 1.0).astype(np.float32)
+
+    def _consolidate(self):
+        """Fold pending rows into the scoring matrix and recompute document norms"""
+        if not self._chunks:
+            return
+        shape = (len(self.ids), len(self.vocabulary))
+        blocks = [self._matrix] + self._chunks
+        blocks = [block if block.shape[1] == shape[1] else
+                  sparse.csr_matrix((block.data, block.indices, block.indptr), shape=(block.shape[0], shape[1]))
+                  for block in (b.tocsr() for b in blocks)]
+        self._matrix = sparse.vstack(blocks, format="csc", dtype=np.float32)
+        self._chunks = []
+        idf = self.idf
+        self._norms = np.sqrt(self._matrix.multiply(self._matrix) @ (idf * idf)).astype(np.float32)
+
+    def query_vector(self, texts, weights=None):
+        """Term weights for a query built from several texts, as {column: weight}"""
+        query = Counter()
+        for i, text in enumerate(texts):
+            weight = 1.0 if weights is None else weights[i]
+            for column, tf in self._count(text, grow=False).items():
+                query[column] += weight * tf
+        return query
+
+    def top_k(self, query, k=20, category=None, exclude=()):
+        """Ids and cosine scores of the k articles closest to a query vector"""
+        self._consolidate()
+        if not query or not len(self.ids):
+            return []
+        columns = np.fromiter(query.keys(), dtype=np.int64)
+        idf = self.idf[columns]
+        weights = np.fromiter(query.values(), dtype=np.float32) * idf
+
+        scores = self._matrix[:, columns] @ (weights * idf)
+        scores /= np.maximum(self._norms, 1e-9) * np.linalg.norm(weights)
+        if category is not None:
+            scores[self.categories != self.category_codes.get(category, -1)] = 0
+        if exclude:
+            scores[np.isin(self.ids, list(exclude))] = 0
+
+        k = min(k, int(np.count_nonzero(scores > 0)))
+        if not k:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return list(zip(self.ids[best].tolist(), scores[best].tolist()))
+
+    def recommend(self, conn, category, keywords, k=20):
+        """Rank a category against its keywords plus the articles recently opened in it"""
+        self.refresh(conn)
+        clicked = conn.execute("""
+            SELECT news.id, news.title, news_body.body FROM clicks
+            JOIN news ON news.id = clicks.news_id
+            LEFT JOIN news_body ON news_body.news_id = news.id
+            WHERE news.category = ?
+            ORDER BY clicks.clicked_at DESC LIMIT ?
+        """, (category, MAX_CLICKS)).fetchall()
+        clicked = [(news_id, f"{title} {bodies.decompress(body)}") for news_id, title, body in clicked]
+
+        query = self.query_vector(keywords)
+        if clicked:
+            history = self.query_vector([text for _, text in clicked], [CLICK_WEIGHT / len(clicked)] * len(clicked))
+            query.update(dict(history.most_common(MAX_CLICK_TERMS)))
+        return self.top_k(query, k, category=category, exclude={news_id for news_id, _ in clicked})
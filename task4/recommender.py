@@ -0,0 +1,157 @@
+import logging
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+
+import bodies
+import search
+from frontier import Frontier
+from store import NewsWriter, create_schema
+
+# Scraping and recommendation logic shared by the GUI (news.py) and the headless
+# CLI/daemon (cli.py). Importing this module does no network access and doesn't
+# load requests/newspaper/NumPy; those come in with the first crawl or ranking.
+
+# News sources
+NEWS_SOURCES = {
+    "Technology": ["https://www.theverge.com", "https://techcrunch.com"],
+    "Business": ["https://www.bbc.com/news/business", "https://www.cnn.com/business"],
+    "Sports": ["https://www.espn.com", "https://www.bbc.com/sport"],
+    "Entertainment": ["https://www.billboard.com", "https://variety.com"]
+}
+
+# Keywords for recommendations
+USER_PREFERENCES = {
+    "Technology": ["AI", "Machine Learning", "Cybersecurity", "Blockchain"],
+    "Business": ["Stock Market", "Economy", "Investing", "Startups"],
+    "Sports": ["Football", "Cricket", "Tennis", "Olympics"],
+    "Entertainment": ["Movies", "Music", "Celebrities", "Hollywood"]
+}
+
+# Minutes between scheduled crawls of a homepage; sources not listed use the default
+DEFAULT_CRAWL_INTERVAL = 30
+CRAWL_INTERVALS = {
+    "https://www.espn.com": 15,
+    "https://www.bbc.com/sport": 15,
+    "https://www.billboard.com": 60,
+    "https://variety.com": 60,
+}
+
+# Database setup
+DB_NAME = "news.db"
+
+RECOMMENDATIONS = 20
+# Recently opened articles are kept decompressed
+ARTICLE_CACHE_SIZE = 64
+
+_rankers = {}
+
+
+def setup_database(db_name=DB_NAME):
+    """Create the news table if it doesn't exist"""
+    conn = sqlite3.connect(db_name)
+    create_schema(conn)
+    conn.close()
+
+
+def scrape(sources=NEWS_SOURCES, db_name=DB_NAME, on_progress=None, on_error=print, **crawler_options):
+    """Crawl sources and store each new or changed article; returns (articles scraped, crawler)"""
+    from crawler import Crawler  # pulls in requests, newspaper and BeautifulSoup
+
+    setup_database(db_name)
+    conn = sqlite3.connect(db_name)
+    frontier = Frontier(conn)
+    conn.close()
+
+    crawler = Crawler(frontier=frontier, **crawler_options)
+    writer = NewsWriter(db_name, frontier=frontier)
+    scraped = 0
+    try:
+        for article in crawler.crawl(sources, on_error=on_error):
+            writer.put(article)
+            scraped += 1
+            if on_progress:
+                on_progress(scraped)
+    finally:
+        writer.close()
+    load_article.cache_clear()
+    return scraped, crawler
+
+
+def get_ranker(db_name=DB_NAME):
+    """The ranker for a database, built on first use"""
+    if db_name not in _rankers:
+        from ranking import TfidfRanker  # pulls in NumPy and SciPy
+        _rankers[db_name] = TfidfRanker(phrases=[keyword for keywords in USER_PREFERENCES.values()
+                                                 for keyword in keywords])
+    return _rankers[db_name]
+
+
+def recommend(category, db_name=DB_NAME, k=RECOMMENDATIONS, fts=False):
+    """(id, title, score) of the best articles in a category for this user, best first.
+
+    Articles are ranked by TF-IDF against the category keywords and the user's
+    clicks. With fts, or when NumPy or SciPy is missing, they come from a bm25
+    MATCH on the full-text index instead, which needs no in-memory index but
+    only knows the keywords.
+    """
+    conn = sqlite3.connect(db_name)
+    keywords = USER_PREFERENCES.get(category, [])
+    try:
+        ranker = None if fts else get_ranker(db_name)
+    except ImportError as e:
+        logging.info("Recommending from the full-text index: %s", e)
+        ranker = None
+    if ranker is None:
+        ranked = search.recommend(conn, category, keywords, limit=k)
+        conn.close()
+        return ranked
+    ranked = ranker.recommend(conn, category, keywords, k=k)
+    titles = dict(conn.execute(f"SELECT id, title FROM news WHERE id IN ({', '.join('?' * len(ranked))})",
+                               [news_id for news_id, _ in ranked]))
+    conn.close()
+    return [(news_id, titles[news_id], score) for news_id, score in ranked]
+
+
+def news_page(before=None, after=None, limit=100, db_name=DB_NAME):
+    """One page of (id, title, category) rows, newest first, older than `before` or newer than `after`"""
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    if after is not None:
+        cursor.execute("SELECT id, title, category FROM news WHERE id > ? ORDER BY id ASC LIMIT ?", (after, limit))
+        rows = cursor.fetchall()[::-1]
+    elif before is not None:
+        cursor.execute("SELECT id, title, category FROM news WHERE id < ? ORDER BY id DESC LIMIT ?", (before, limit))
+        rows = cursor.fetchall()
+    else:
+        cursor.execute("SELECT id, title, category FROM news ORDER BY id DESC LIMIT ?", (limit,))
+        rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+@lru_cache(maxsize=ARTICLE_CACHE_SIZE)
+def load_article(news_id, db_name=DB_NAME):
+    """Title, author, date and decompressed body of an article"""
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT title, author, published_date, body FROM news
+        LEFT JOIN news_body ON news_body.news_id = news.id
+        WHERE id=?
+    """, (news_id,))
+    article = cursor.fetchone()
+    conn.close()
+    if article is None:
+        return None
+    title, author, date, body = article
+    return title, author, date, bodies.decompress(body)
+
+
+def record_click(news_id, db_name=DB_NAME):
+    """Remember that the user opened an article, for their recommendation profile"""
+    conn = sqlite3.connect(db_name)
+    conn.execute("INSERT INTO clicks (news_id, clicked_at) VALUES (?, ?)",
+                 (news_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    conn.commit()
+    conn.close()
@@ -0,0 +1,58 @@
+# Full-text index over stored articles.
+#
+# news_fts is a contentless FTS5 table (the text already lives in news_body) keyed by
+# news.id. The writer keeps it in step with every batch it stores, so it never has
+# to be rebuilt, and a recommendation is a single ranked MATCH query. recommender.py
+# uses it for one-off lookups (cli.py recommend --fts) and when the TF-IDF ranker's
+# NumPy/SciPy aren't installed.
+
+import bodies
+
+# bm25 weights for the (category, title, content) columns; category is only a filter
+RANK_WEIGHTS = (0.0, 10.0, 1.0)
+
+
+def create_index(conn):
+    """Create the search index, filling it from existing articles the first time"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name='news_fts'").fetchone()
+    if exists:
+        return
+    conn.execute("CREATE VIRTUAL TABLE news_fts USING fts5(category, title, content, content='')")
+    index_articles(conn, ((news_id, category, title, bodies.decompress(body)) for news_id, category, title, body in
+                          conn.execute("SELECT id, category, title, body FROM news "
+                                       "LEFT JOIN news_body ON news_body.news_id = news.id").fetchall()))
+    conn.commit()
+
+
+def index_articles(conn, rows):
+    """Add (id, category, title, content) rows to the index (caller commits)"""
+    conn.executemany("INSERT INTO news_fts (rowid, category, title, content) VALUES (?, ?, ?, ?)", rows)
+
+
+def unindex_articles(conn, rows):
+    """Remove (id, category, title, content) rows, which must match what was indexed"""
+    conn.executemany(
+        "INSERT INTO news_fts (news_fts, rowid, category, title, content) VALUES ('delete', ?, ?, ?, ?)", rows)
+
+
+def quote(phrase):
+    return '"' + phrase.replace('"', '""') + '"'
+
+
+def match_query(category, keywords):
+    """FTS query for articles in category mentioning any of the keyword phrases"""
+    return f"category:{quote(category)} AND ({' OR '.join(quote(keyword) for keyword in keywords)})"
+
+
+def recommend(conn, category, keywords, limit=100):
+    """Return (id, title, score) of the best matching articles, best first"""
+    if not keywords:
+        return []
+    # bm25() is lower for better matches
+    return conn.execute(f"""
+        SELECT news.id, news.title, -bm25(news_fts, {", ".join(map(str, RANK_WEIGHTS))}) AS score FROM news_fts
+        JOIN news ON news.id = news_fts.rowid
+        WHERE news_fts MATCH ?
+        ORDER BY score DESC
+        LIMIT ?
+    """, (match_query(category, keywords), limit)).fetchall()
@@ -0,0 +1,222 @@
+import queue
+import sqlite3
+import threading
+import time
+
+import bodies
+import search
+from dedup import MAX_DISTANCE, discard_index, distance, get_index, simhash
+
+# Applied to every writer connection: WAL lets the GUI read while a crawl writes,
+# and synchronous=NORMAL only fsyncs at checkpoints instead of every commit
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Bodies go to news_body (see bodies.py), so content stays NULL
+INSERT_ARTICLE = """
+    INSERT INTO news (title, author, published_date, source, category, url) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(url) DO UPDATE SET title=excluded.title, author=excluded.author,
+        published_date=excluded.published_date
+"""
+
+
+def create_schema(conn):
+    """Create the news table if it doesn't exist"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS news (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            author TEXT,
+            published_date TEXT,
+            content TEXT,
+            source TEXT,
+            category TEXT,
+            url TEXT
+        )
+    """)
+    # Older databases predate the url column
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(news)")]
+    if "url" not in columns:
+        cursor.execute("ALTER TABLE news ADD COLUMN url TEXT")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_news_url ON news(url)")
+    # Articles the user opened, which feed the recommendation profile
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS clicks (
+            news_id INTEGER,
+            clicked_at TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_clicks_news ON clicks(news_id)")
+    conn.commit()
+    bodies.create_table(conn)
+    search.create_index(conn)
+
+
+def connect(db_name):
+    """Open a connection tuned for bulk writes"""
+    conn = sqlite3.connect(db_name, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class NewsWriter:
+    """Writer stage that batches parsed articles into news.db.
+
+    Articles passed to put() are buffered and written with executemany in one
+    transaction once batch_size articles are waiting or max_delay seconds have
+    passed since the first of them arrived. close() flushes whatever is left.
+    When a frontier is given, the validators of each article are committed in
+    the same transaction as the article itself. The search index is updated in
+    that transaction too.
+
+    With detect_duplicates, an article whose SimHash is within a few bits of one
+    already stored is not stored again but recorded against that canonical row.
+    """
+
+    def __init__(self, db_name, frontier=None, batch_size=500, max_delay=1.0, max_pending=10000,
+                 detect_duplicates=True):
+        self.db_name = db_name
+        self.frontier = frontier
+        self.detect_duplicates = detect_duplicates
+        self.dedup = None
+        self.duplicates = 0
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.written = 0
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put(self, article):
+        """Queue an article for writing (blocks when the writer falls behind)"""
+        if self._error:
+            raise self._error
+        self._queue.put(article)
+
+    def close(self):
+        """Flush buffered articles and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join()
+        if self._error:
+            raise self._error
+
+    def _run(self):
+        conn = connect(self.db_name)
+        try:
+            create_schema(conn)
+            if self.detect_duplicates:
+                self.dedup = get_index(conn, self.db_name)
+            batch = []
+            deadline = None
+            stopping = False
+            while not stopping:
+                timeout = None if deadline is None else max(0, deadline - time.monotonic())
+                try:
+                    article = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    article = False
+                stopping = article is None
+
+                if article:
+                    if not batch:
+                        deadline = time.monotonic() + self.max_delay
+                    batch.append(article)
+
+                # Homepage validators may be waiting even when no article is
+                if (batch and (not article or len(batch) >= self.batch_size)) or (stopping and self.frontier):
+                    self._flush(conn, batch)
+                    batch = []
+                    deadline = None
+        except Exception as e:
+            self._error = e
+            # The rolled-back batch may already be in the index
+            if self.dedup is not None:
+                discard_index(self.db_name)
+            # Keep draining so producers blocked in put() can finish
+            while not stopping:
+                stopping = self._queue.get() is None
+        finally:
+            conn.close()
+
+    def _split_duplicates(self, batch, existing):
+        """Separate articles to store from near-duplicates of stored (or earlier batch) articles.
+
+        Returns (kept, duplicates) where each duplicate is (article, canonical) and
+        canonical is either a news id or the url of a kept article in this batch.
+        """
+        kept, duplicates, fresh = [], [], []
+        for a in batch:
+            # A re-stored article is an update of itself, not a duplicate
+            if self.dedup is None or a["url"] in existing:
+                kept.append(a)
+                continue
+            if "simhash" not in a:
+                a["simhash"] = simhash(a["content"])
+            canonical = self.dedup.find(a["simhash"])
+            if canonical is None and a["simhash"] is not None:
+                canonical = next((b["url"] for b in fresh
+                                  if b["simhash"] is not None and distance(a["simhash"], b["simhash"]) <= MAX_DISTANCE),
+                                 None)
+            if canonical is None:
+                kept.append(a)
+                fresh.append(a)
+            else:
+                duplicates.append((a, canonical))
+        return kept, duplicates
+
+    def _flush(self, conn, batch):
+        urls = [a["url"] for a in batch]
+        placeholders = ", ".join("?" * len(urls))
+        with conn:
+            # Articles being re-stored must leave the search index with their old text
+            existing = conn.execute(f"""
+                SELECT news.id, news.category, news.title, news_body.body, news.url FROM news
+                LEFT JOIN news_body ON news_body.news_id = news.id
+                WHERE news.url IN ({placeholders})
+            """, urls).fetchall()
+            search.unindex_articles(conn, [(news_id, category, title, bodies.decompress(body))
+                                           for news_id, category, title, body, _ in existing])
+            kept, duplicates = self._split_duplicates(batch, {row[4] for row in existing})
+
+            conn.executemany(INSERT_ARTICLE, [
+                (a["title"], a["author"], a["published_date"], a["source"], a["category"], a["url"])
+                for a in kept])
+            articles = {a["url"]: a for a in kept}
+            stored = conn.execute(f"SELECT id, category, url FROM news WHERE url IN ({placeholders})", urls).fetchall()
+            conn.executemany("INSERT OR REPLACE INTO news_body (news_id, body) VALUES (?, ?)", [
+                (news_id, articles[url].get("body") or bodies.compress(articles[url]["content"]))
+                for news_id, _, url in stored])
+            search.index_articles(conn, [
+                (news_id, category, articles[url]["title"], articles[url]["content"])
+                for news_id, category, url in stored])
+
+            if self.dedup is not None:
+                ids = {url: news_id for news_id, _, url in stored}
+                self.dedup.add(conn, [(ids[url], a["simhash"] if "simhash" in a else simhash(a["content"]))
+                                      for url, a in articles.items()])
+                self.dedup.record_duplicates(conn, [
+                    (a["url"], ids.get(canonical, canonical), a["title"], a["source"], a["simhash"])
+                    for a, canonical in duplicates])
+
+            if self.frontier is not None:
+                for a in batch:
+                    if a.get("content_hash"):
+                        self.frontier.record(a["url"], a["etag"], a["last_modified"], a["content_hash"])
+                self.frontier.save(conn)
+        self.written += len(kept)
+        self.duplicates += len(duplicates)